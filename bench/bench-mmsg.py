@@ -0,0 +1,95 @@
+# Compare loopback datagram throughput using one system call per
+# datagram against the batched recvmmsg/sendmmsg path in coapy.mmsg,
+# both for raw sockets and for an EndPoint draining with
+# process_batch.
+#
+#    python bench/bench-mmsg.py [-n messages] [-b burst]
+
+import sys
+import getopt
+import time
+import socket
+import coapy.connection
+import coapy.mmsg
+
+messages = 50000
+burst = 256
+
+try:
+    opts, args = getopt.getopt(sys.argv[1:], 'n:b:', [ 'messages=', 'burst=' ])
+    for (o, a) in opts:
+        if o in ('-n', '--messages'):
+            messages = int(a)
+        elif o in ('-b', '--burst'):
+            burst = int(a)
+except getopt.GetoptError, e:
+    print 'Option error: %s' % (e,)
+    sys.exit(1)
+
+if not coapy.mmsg.available:
+    print 'recvmmsg/sendmmsg not available on this host'
+    sys.exit(1)
+
+packet = coapy.connection.Message(coapy.connection.Message.NON, code=coapy.GET, uri_path='sensor')._pack(0x1234)
+
+def sockets ():
+    rfd = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    rfd.bind(('127.0.0.1', 0))
+    rfd.setblocking(0)
+    sfd = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    return (rfd, sfd)
+
+def raw_single ():
+    (rfd, sfd) = sockets()
+    address = rfd.getsockname()
+    start = time.time()
+    done = 0
+    while done < messages:
+        for _ in xrange(burst):
+            sfd.sendto(packet, address)
+        for _ in xrange(burst):
+            rfd.recvfrom(8192)
+        done += burst
+    return time.time() - start
+
+def raw_batch ():
+    (rfd, sfd) = sockets()
+    address = rfd.getsockname()
+    sender = coapy.mmsg.BatchSender(sfd)
+    receiver = coapy.mmsg.BatchReceiver(rfd)
+    packets = [ (packet, address) ] * burst
+    start = time.time()
+    done = 0
+    while done < messages:
+        sender.send(packets)
+        received = 0
+        while received < burst:
+            received += len(receiver.receive())
+        done += burst
+    return time.time() - start
+
+def end_point (batch_io):
+    ep = coapy.connection.EndPoint(batch_io=batch_io)
+    ep.bind(('127.0.0.1', 0))
+    address = ep.socket.getsockname()
+    sfd = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sender = coapy.mmsg.BatchSender(sfd)
+    packets = [ (packet, address) ] * burst
+    elapsed = 0.0
+    done = 0
+    while done < messages:
+        sender.send(packets)
+        start = time.time()
+        received = 0
+        while received < burst:
+            received += len(ep.process_batch(1000))
+        elapsed += time.time() - start
+        done += burst
+    return elapsed
+
+print '%-28s %12s' % ('path', 'msgs/sec')
+for (name, fn) in ( ('sendto/recvfrom', raw_single),
+                    ('sendmmsg/recvmmsg', raw_batch),
+                    ('EndPoint recvfrom', lambda: end_point(False)),
+                    ('EndPoint recvmmsg', lambda: end_point(True)) ):
+    print '%-28s %12.0f' % (name, messages / fn())
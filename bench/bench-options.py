@@ -0,0 +1,63 @@
+# Measure the cost of locating and decoding packed options followed
+# by a 64-octet body, for 1, 10 and 50 options, using
+# coapy.options.scan and coapy.options.decode.  Where the options fit
+# in a message header (at most 15) Message.decode is measured too,
+# both eagerly and lazily.  Repeated Uri-Path options make up the
+# numbers.
+#
+#    python bench/bench-options.py [-n packets]
+
+import sys
+import getopt
+import struct
+import time
+import coapy.options
+import coapy.connection
+
+packets = 20000
+
+try:
+    opts, args = getopt.getopt(sys.argv[1:], 'n:', [ 'packets=' ])
+    for (o, a) in opts:
+        if o in ('-n', '--packets'):
+            packets = int(a)
+except getopt.GetoptError, e:
+    print 'Option error: %s' % (e,)
+    sys.exit(1)
+
+body = 'x' * 64
+
+def build_options (num_options):
+    """Return a list of *num_options* options for a request to a path
+    with many segments.  On its own the Uri-Query needs a fencepost
+    before it."""
+    options = [ coapy.options.UriQuery('unit=C') ]
+    if 1 < num_options:
+        options.append(coapy.options.UriHost('sensor.example.com'))
+        options.append(coapy.options.MaxAge(30))
+    for segment in xrange(num_options - len(options)):
+        options.append(coapy.options.UriPath('s%d' % (segment,)))
+    return options
+
+def run (function, *args):
+    start = time.time()
+    for _ in xrange(packets):
+        function(*args)
+    return time.time() - start
+
+def report (name, elapsed):
+    print '  %-8s %8.2f us/packet' % (name, 1e6 * elapsed / packets)
+
+for num_options in (1, 10, 50):
+    (wire_options, packed) = coapy.options.encode(build_options(num_options))
+    packed += body
+    print '%d options (%d octets, %d with fenceposts):' % (num_options, len(packed), wire_options)
+    report('scan', run(coapy.options.scan, wire_options, packed))
+    report('decode', run(coapy.options.decode, wire_options, packed))
+    report('view', run(coapy.options.decode, wire_options, memoryview(packed)))
+    if 0x0F < wire_options:
+        continue
+    packed = struct.pack('!BBH', 0x40 + wire_options, coapy.GET, 0x1234) + packed
+    Message = coapy.connection.Message
+    report('message', run(Message.decode, packed))
+    report('lazy', run(Message.decode, packed, True))
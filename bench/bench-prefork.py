@@ -0,0 +1,100 @@
+# Measure server throughput over loopback as the number of prefork
+# worker processes grows.
+#
+#    python bench/bench-prefork.py [-w max-workers] [-d seconds] [-l load-processes] [--pin-cpus]
+#
+# For each worker count from 1 to max-workers, a coapy.prefork
+# Supervisor serves a port while load processes flood it with
+# non-confirmable requests from many source ports.  The rate is the
+# number of messages the workers report as received, per second.
+# Load processes compete with workers for processors, so scaling is
+# only meaningful when there are processors to spare for both.
+
+import sys
+import getopt
+import time
+import os
+import signal
+import socket
+import coapy.connection
+import coapy.prefork
+
+max_workers = coapy.prefork.cpu_count()
+duration = 3.0
+load_processes = 2
+pin_cpus = False
+
+try:
+    opts, args = getopt.getopt(sys.argv[1:], 'w:d:l:', [ 'workers=', 'duration=', 'load=', 'pin-cpus' ])
+    for (o, a) in opts:
+        if o in ('-w', '--workers'):
+            max_workers = int(a)
+        elif o in ('-d', '--duration'):
+            duration = float(a)
+        elif o in ('-l', '--load'):
+            load_processes = int(a)
+        elif o in ('--pin-cpus',):
+            pin_cpus = True
+except getopt.GetoptError, e:
+    print 'Option error: %s' % (e,)
+    sys.exit(1)
+
+def handle (rx_record):
+    pass
+
+def flood (address):
+    packets = [ coapy.connection.Message(coapy.connection.Message.NON, code=coapy.GET, uri_path='sensor')._pack(_x)
+                for _x in xrange(256) ]
+    sockets = [ socket.socket(socket.AF_INET, socket.SOCK_DGRAM) for _i in xrange(32) ]
+    while True:
+        for sfd in sockets:
+            for pkt in packets[:8]:
+                try:
+                    sfd.sendto(pkt, address)
+                except socket.error:
+                    pass
+
+def run (workers, address):
+    supervisor = coapy.prefork.Supervisor(handle, address, workers=workers, pin_cpus=pin_cpus)
+    supervisor.REPORT_INTERVAL_MS = 100
+    supervisor.start()
+    loaders = []
+    for i in xrange(load_processes):
+        pid = os.fork()
+        if 0 == pid:
+            try:
+                flood(address)
+            finally:
+                os._exit(0)
+        loaders.append(pid)
+    try:
+        # Let the workers settle, then measure
+        end_time = time.time() + 0.5
+        while time.time() < end_time:
+            supervisor.poll(100)
+        start = supervisor.statistics.get('received', 0)
+        start_time = time.time()
+        end_time = start_time + duration
+        while time.time() < end_time:
+            supervisor.poll(100)
+        received = supervisor.statistics.get('received', 0) - start
+        elapsed = time.time() - start_time
+    finally:
+        for pid in loaders:
+            os.kill(pid, signal.SIGKILL)
+            os.waitpid(pid, 0)
+        supervisor.stop()
+    return received / elapsed
+
+sfd = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+sfd.bind(('127.0.0.1', 0))
+address = sfd.getsockname()
+sfd.close()
+
+print '%d processors, %d load processes' % (coapy.prefork.cpu_count(), load_processes)
+base = None
+for workers in xrange(1, max_workers + 1):
+    rate = run(workers, address)
+    if base is None:
+        base = rate
+    print '%2d workers: %9.0f msg/s (%.2fx)' % (workers, rate, rate / base)
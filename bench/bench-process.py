@@ -0,0 +1,52 @@
+# Measure the cost of an idle pass through EndPoint.process as the
+# number of pending transmissions grows.
+#
+#    python bench/bench-process.py [-i iterations] [-n 10,100,1000]
+#
+# Each pending record is a confirmable message whose next
+# retransmission is not yet due, so an ideal pass does no work
+# proportional to the number of records.  The messages are spread
+# over many remotes, since each remote has only 65536 transaction IDs,
+# and the end-point's nstart is raised so that none is held back.
+
+import sys
+import getopt
+import time
+import socket
+import coapy.connection
+
+iterations = 1000
+counts = [ 10, 100, 1000, 10000, 100000 ]
+
+try:
+    opts, args = getopt.getopt(sys.argv[1:], 'i:n:', [ 'iterations=', 'counts=' ])
+    for (o, a) in opts:
+        if o in ('-i', '--iterations'):
+            iterations = int(a)
+        elif o in ('-n', '--counts'):
+            counts = [ int(_n) for _n in a.split(',') ]
+except getopt.GetoptError, e:
+    print 'Option error: %s' % (e,)
+    sys.exit(1)
+
+def _discard_sendto (message, address):
+    return len(message)
+
+remotes = [ ('127.0.0.1', 10000 + _p) for _p in xrange(1000) ]
+print '%8s %12s' % ('pending', 'usec/pass')
+for count in counts:
+    ep = coapy.connection.EndPoint(nstart=1 + count // len(remotes))
+    ep.bind(('127.0.0.1', 0))
+    ep.socket.sendto = _discard_sendto
+    for n in xrange(count):
+        ep.send(coapy.connection.Message(code=coapy.GET, uri_path='sensor'), remotes[n % len(remotes)])
+    # First pass transmits everything; the retransmissions are then a
+    # full RESPONSE_TIMEOUT away.
+    ep.process(0)
+    assert count == ep.statistics['transmitted']
+    start = time.time()
+    for _ in xrange(iterations):
+        ep.process(0)
+    elapsed = time.time() - start
+    print '%8d %12.2f' % (count, 1e6 * elapsed / iterations)
+    ep.socket.close()
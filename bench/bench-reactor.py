@@ -0,0 +1,76 @@
+# Compare serving many end-points from one Reactor with polling each
+# end-point in turn with process(0).
+#
+#    python bench/bench-reactor.py [-e end-points] [-r rounds]
+#
+# In each round one non-confirmable message is sent to every
+# end-point, and the time to receive all of them is measured.  The
+# per-message costs are similar; the difference is that the reactor
+# blocks when there is no activity, while round-robin polling spins.
+
+import sys
+import getopt
+import time
+import socket
+import coapy.connection
+import coapy.reactor
+
+end_points = 200
+rounds = 50
+
+try:
+    opts, args = getopt.getopt(sys.argv[1:], 'e:r:', [ 'end-points=', 'rounds=' ])
+    for (o, a) in opts:
+        if o in ('-e', '--end-points'):
+            end_points = int(a)
+        elif o in ('-r', '--rounds'):
+            rounds = int(a)
+except getopt.GetoptError, e:
+    print 'Option error: %s' % (e,)
+    sys.exit(1)
+
+packet = coapy.connection.Message(coapy.connection.Message.NON, code=coapy.GET, uri_path='sensor')._pack(1)
+
+def run (eps, receive):
+    sfd = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    addresses = [ _ep.socket.getsockname() for _ep in eps ]
+    elapsed = 0.0
+    for r in xrange(rounds):
+        for address in addresses:
+            sfd.sendto(packet, address)
+        start = time.time()
+        receive(eps)
+        elapsed += time.time() - start
+    sfd.close()
+    for ep in eps:
+        ep.socket.close()
+    return elapsed
+
+def round_robin (eps):
+    pending = set(eps)
+    while pending:
+        for ep in list(pending):
+            if ep.process(0) is not None:
+                pending.remove(ep)
+
+def create_endpoints (factory):
+    eps = [ factory() for _i in xrange(end_points) ]
+    for ep in eps:
+        ep.bind(('127.0.0.1', 0))
+    return eps
+
+eps = create_endpoints(coapy.connection.EndPoint)
+rr = run(eps, round_robin)
+
+reactor = coapy.reactor.Reactor()
+def via_reactor (eps):
+    received = 0
+    while received < len(eps):
+        received += len(reactor.process(1000))
+eps = create_endpoints(reactor.createEndPoint)
+rx = run(eps, via_reactor)
+
+total = end_points * rounds
+print '%d end-points, %d messages' % (end_points, total)
+print 'round-robin process(0): %.1f us/msg' % (1e6 * rr / total,)
+print 'reactor:                %.1f us/msg' % (1e6 * rx / total,)
@@ -0,0 +1,63 @@
+# Measure the per-message cost of receiving a burst of datagrams over
+# loopback with EndPoint.process and EndPoint.process_batch.
+#
+#    python bench/bench-receive.py [-n messages] [-b burst]
+#
+# Messages are sent in bursts small enough to fit in the socket
+# receive buffer; each burst is then drained by the end-point.
+
+import sys
+import getopt
+import time
+import socket
+import coapy.connection
+
+messages = 20000
+burst = 200
+
+try:
+    opts, args = getopt.getopt(sys.argv[1:], 'n:b:', [ 'messages=', 'burst=' ])
+    for (o, a) in opts:
+        if o in ('-n', '--messages'):
+            messages = int(a)
+        elif o in ('-b', '--burst'):
+            burst = int(a)
+except getopt.GetoptError, e:
+    print 'Option error: %s' % (e,)
+    sys.exit(1)
+
+packets = [ coapy.connection.Message(coapy.connection.Message.NON, code=coapy.GET, uri_path='sensor')._pack(_x & 0xFFFF)
+            for _x in xrange(burst) ]
+
+def drain_single (ep, count):
+    received = 0
+    while received < count:
+        if ep.process(1000) is not None:
+            received += 1
+
+def drain_batch (ep, count):
+    received = 0
+    while received < count:
+        received += len(ep.process_batch(1000))
+
+def run (drain):
+    ep = coapy.connection.EndPoint()
+    ep.bind(('127.0.0.1', 0))
+    address = ep.socket.getsockname()
+    sfd = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    elapsed = 0.0
+    sent = 0
+    while sent < messages:
+        for pkt in packets:
+            sfd.sendto(pkt, address)
+        start = time.time()
+        drain(ep, len(packets))
+        elapsed += time.time() - start
+        sent += len(packets)
+    sfd.close()
+    ep.socket.close()
+    return elapsed
+
+print '%-14s %12s' % ('method', 'usec/msg')
+for (name, drain) in ( ('process', drain_single), ('process_batch', drain_batch) ):
+    print '%-14s %12.2f' % (name, 1e6 * run(drain) / messages)
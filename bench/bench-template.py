@@ -0,0 +1,55 @@
+# Compare the cost of producing the datagram for a repeated GET by
+# constructing a Message with keyword options each time, by packing
+# one Message repeatedly, and by filling in a RequestTemplate.
+#
+#    python bench/bench-template.py [-n requests]
+
+import sys
+import getopt
+import time
+import coapy.connection
+
+requests = 100000
+
+try:
+    opts, args = getopt.getopt(sys.argv[1:], 'n:', [ 'requests=' ])
+    for (o, a) in opts:
+        if o in ('-n', '--requests'):
+            requests = int(a)
+except getopt.GetoptError, e:
+    print 'Option error: %s' % (e,)
+    sys.exit(1)
+
+options = { 'uri_host' : 'sensor.example.com',
+            'uri_port' : 61616,
+            'uri_path' : 'building/3/floor/2/temperature',
+            'uri_query' : 'unit=C' }
+uri = coapy.connection.Message(**options).build_uri()
+template = coapy.connection.RequestTemplate(uri)
+
+def construct ():
+    Message = coapy.connection.Message
+    start = time.time()
+    for xid in xrange(requests):
+        Message(Message.CON, code=coapy.GET, **options)._pack(xid & 0xFFFF)
+    return time.time() - start
+
+def repack ():
+    message = template.message
+    start = time.time()
+    for xid in xrange(requests):
+        message._pack(xid & 0xFFFF)
+    return time.time() - start
+
+def fill ():
+    packet = template.packet
+    start = time.time()
+    for xid in xrange(requests):
+        packet(xid & 0xFFFF)
+    return time.time() - start
+
+assert template.packet(7) == coapy.connection.Message(coapy.connection.Message.CON, code=coapy.GET, **options)._pack(7)
+print 'URI: %s' % (uri,)
+for (name, fn) in (('construct Message', construct), ('repack Message', repack), ('RequestTemplate', fill)):
+    elapsed = fn()
+    print '%-18s %8.3f s  %10.0f req/s  %6.2f us/req' % (name, elapsed, requests / elapsed, 1e6 * elapsed / requests)
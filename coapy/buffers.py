@@ -0,0 +1,98 @@
+# Copyright (c) 2010 People Power Co.
+# All rights reserved.
+# 
+# This open source code was developed with funding from People Power Company
+# 
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+# - Redistributions of source code must retain the above copyright
+#   notice, this list of conditions and the following disclaimer.
+# - Redistributions in binary form must reproduce the above copyright
+#   notice, this list of conditions and the following disclaimer in the
+#   documentation and/or other materials provided with the
+#   distribution.
+# - Neither the name of the People Power Corporation nor the names of
+#   its contributors may be used to endorse or promote products derived
+#   from this software without specific prior written permission.
+# 
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# ``AS IS'' AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED.  IN NO EVENT SHALL THE
+# PEOPLE POWER CO. OR ITS CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT,
+# STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED
+# OF THE POSSIBILITY OF SUCH DAMAGE
+# 
+
+"""Reusable buffers for receiving datagrams.
+"""
+
+class BufferPool (object):
+    """A pool of fixed-size :class:`bytearray` buffers.
+
+    Buffers obtained with :meth:`acquire` may be filled in place (for
+    example with :meth:`socket.socket.recvfrom_into`) and returned with
+    :meth:`release` once nothing refers to their content.  At most
+    :attr:`capacity` idle buffers are retained; a buffer that is never
+    released is simply reclaimed by the garbage collector.
+    """
+
+    __free = None
+    __bufferSize = None
+    __capacity = None
+
+    def __init__ (self, buffer_size=8192, capacity=64):
+        """
+        :param buffer_size: The size, in octets, of each buffer.
+
+        :param capacity: The maximum number of idle buffers retained
+          for reuse.
+        """
+        if 0 >= buffer_size:
+            raise ValueError(buffer_size)
+        self.__free = []
+        self.__bufferSize = buffer_size
+        self.__capacity = capacity
+
+    buffer_size = property(lambda _s: _s.__bufferSize, None, None, "The size of each buffer, in octets.")
+    capacity = property(lambda _s: _s.__capacity, None, None, "The maximum number of idle buffers retained.")
+
+    __allocated = 0
+    def _get_allocated (self):
+        """The number of buffers created by :meth:`acquire`."""
+        return self.__allocated
+    allocated = property(_get_allocated)
+
+    __reused = 0
+    def _get_reused (self):
+        """The number of :meth:`acquire` calls satisfied from the pool."""
+        return self.__reused
+    reused = property(_get_reused)
+
+    def __len__ (self):
+        return len(self.__free)
+
+    def acquire (self):
+        """Return a buffer of :attr:`buffer_size` octets.
+
+        The content of a reused buffer is whatever was last stored in
+        it."""
+        if self.__free:
+            self.__reused += 1
+            return self.__free.pop()
+        self.__allocated += 1
+        return bytearray(self.__bufferSize)
+
+    def release (self, buffer):
+        """Return *buffer* to the pool.
+
+        The caller must not retain any reference to, or view of, the
+        buffer content after this call."""
+        if (len(self.__free) < self.__capacity) and (len(buffer) == self.__bufferSize):
+            self.__free.append(buffer)
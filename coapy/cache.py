@@ -0,0 +1,155 @@
+# Copyright (c) 2010 People Power Co.
+# All rights reserved.
+# 
+# This open source code was developed with funding from People Power Company
+# 
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+# - Redistributions of source code must retain the above copyright
+#   notice, this list of conditions and the following disclaimer.
+# - Redistributions in binary form must reproduce the above copyright
+#   notice, this list of conditions and the following disclaimer in the
+#   documentation and/or other materials provided with the
+#   distribution.
+# - Neither the name of the People Power Corporation nor the names of
+#   its contributors may be used to endorse or promote products derived
+#   from this software without specific prior written permission.
+# 
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# ``AS IS'' AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED.  IN NO EVENT SHALL THE
+# PEOPLE POWER CO. OR ITS CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT,
+# STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED
+# OF THE POSSIBILITY OF SUCH DAMAGE
+# 
+
+"""Bounded caches with least-recently-used and time-to-live eviction.
+"""
+
+import collections
+import time
+
+class LRUCache (object):
+    """A mapping with a limited capacity and optional entry lifetime.
+
+    When the cache is full, adding a new entry evicts the entry that
+    was least recently stored or retrieved.  If a lifetime is
+    provided, entries older than that are treated as absent.
+
+    Lookups through :meth:`get` are counted as :attr:`hits` or
+    :attr:`misses`.
+    """
+
+    __entries = None
+    __capacity = None
+    __ttl = None
+    __clock = None
+
+    def __init__ (self, capacity, ttl=None, clock=time.time):
+        """
+        :param capacity: The maximum number of entries retained.
+
+        :param ttl: The time, in seconds, after which an entry
+          expires.  ``None`` indicates entries do not expire.
+
+        :param clock: A function returning the current time, in
+          seconds.
+        """
+        if 0 >= capacity:
+            raise ValueError(capacity)
+        self.__entries = collections.OrderedDict()
+        self.__capacity = capacity
+        self.__ttl = ttl
+        self.__clock = clock
+
+    capacity = property(lambda _s: _s.__capacity, None, None, "The maximum number of entries retained.")
+    ttl = property(lambda _s: _s.__ttl, None, None, "The lifetime of an entry, in seconds, or ``None``.")
+
+    __hits = 0
+    def _get_hits (self):
+        """The number of :meth:`get` calls that found an entry."""
+        return self.__hits
+    hits = property(_get_hits)
+
+    __misses = 0
+    def _get_misses (self):
+        """The number of :meth:`get` calls that did not find an entry."""
+        return self.__misses
+    misses = property(_get_misses)
+
+    __evictions = 0
+    def _get_evictions (self):
+        """The number of entries discarded to make room for new ones."""
+        return self.__evictions
+    evictions = property(_get_evictions)
+
+    def __len__ (self):
+        return len(self.__entries)
+
+    def __contains__ (self, key):
+        entry = self.__entries.get(key)
+        if entry is None:
+            return False
+        if (entry[1] is not None) and (entry[1] <= self.__clock()):
+            del self.__entries[key]
+            return False
+        return True
+
+    def get (self, key, default=None):
+        """Return the value stored for *key*, or *default* if there is
+        no unexpired entry.
+
+        A successful lookup marks the entry as most recently used."""
+        entry = self.__entries.pop(key, None)
+        if (entry is not None) and ((entry[1] is None) or (entry[1] > self.__clock())):
+            self.__entries[key] = entry
+            self.__hits += 1
+            return entry[0]
+        self.__misses += 1
+        return default
+
+    def put (self, key, value):
+        """Store *value* for *key*, replacing any previous value.
+
+        The entry becomes the most recently used, and its lifetime
+        starts anew.  If the cache is full, the least recently used
+        entry is evicted unless it has already expired."""
+        now = self.__clock()
+        expires = None
+        if self.__ttl is not None:
+            expires = now + self.__ttl
+        entries = self.__entries
+        entries.pop(key, None)
+        while len(entries) >= self.__capacity:
+            (_, entry) = entries.popitem(last=False)
+            if (entry[1] is None) or (entry[1] > now):
+                self.__evictions += 1
+        entries[key] = (value, expires)
+
+    def pop (self, key, default=None):
+        """Remove the entry for *key*, returning its value or *default*."""
+        entry = self.__entries.pop(key, None)
+        if entry is None:
+            return default
+        return entry[0]
+
+    def purge (self, now=None):
+        """Remove all expired entries."""
+        if self.__ttl is None:
+            return
+        if now is None:
+            now = self.__clock()
+        expired = [ _k for (_k, _e) in self.__entries.iteritems() if _e[1] <= now ]
+        for key in expired:
+            del self.__entries[key]
+
+    def clear (self):
+        """Remove all entries."""
+        self.__entries.clear()
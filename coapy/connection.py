@@ -31,14 +31,26 @@
 # 
 
 import coapy.options
+import coapy.scheduler
+import coapy.cache
+import coapy.rtt
+import coapy.mmsg
+import coapy.buffers
+import coapy.poller
 import socket
 import struct
 import binascii
 import fcntl
+import array
 import random
-import select
 import time
 import os
+import collections
+import errno
+import itertools
+import threading
+import urlparse
+import urllib
 
 class Message (object):
     """Represent the components of a CoAP message.
@@ -123,7 +135,7 @@ class Message (object):
             raise ValueError()
         self.__transactionType = transaction_type
         self.__code = code
-        self.__options = {}
+        self.__options = coapy.options.OptionList()
         self.__payload  = payload
         for (k, v) in kw.iteritems():
             kw_type = self.OptionKeywords.get(k)
@@ -135,30 +147,86 @@ class Message (object):
         """A tuple containing the :mod:`options <coapy.options>`
         associated with the message.
 
-        The options are sorted in increasing value of option type.
+        The options are held in increasing value of option type (see
+        :class:`coapy.options.OptionList`), so no sorting is done
+        here.  Repeated options appear in the order they were added.
         """
-        return tuple(sorted(self.__options.itervalues(), lambda _a,_b: cmp(_a.Type, _b.Type)))
+        if self.__optionSpans:
+            self._unpackOptions()
+        return tuple(self.__options)
     options = property(_get_options)
 
+    __optionSpans = None
+    __packed = None
+    def _unpackSpans (self, type_val):
+        """Create the option instances for the spans of one option type
+        recorded by a lazy :meth:`decode`, and return them as a
+        list."""
+        created = []
+        for (_, offset, length) in self.__optionSpans[type_val]:
+            value = self.__packed[offset:offset + length]
+            if not isinstance(value, str):
+                value = value.tobytes()
+            created.append(coapy.options.Registry[type_val].unpack(value))
+        for opt in created:
+            self.__options.add(opt)
+        self._dropSpans(type_val)
+        return created
+
+    def _unpackOptions (self):
+        """Create the option instances for all spans recorded by a
+        lazy :meth:`decode`."""
+        while self.__optionSpans:
+            self._unpackSpans(iter(self.__optionSpans).next())
+
+    def _dropSpans (self, type_val):
+        """Discard any undecoded spans for the option type.
+
+        :return: ``True`` iff there were any."""
+        if not self.__optionSpans:
+            return False
+        if self.__optionSpans.pop(type_val, None) is None:
+            return False
+        if not self.__optionSpans:
+            self.__optionSpans = self.__packed = None
+        return True
+
+    def _detach (self):
+        """Copy out any part of the message that refers to the buffer
+        it was decoded from.
+
+        Undecoded options remain undecoded: only the packet itself is
+        copied, so the recorded spans stay valid."""
+        if (self.__packed is not None) and not isinstance(self.__packed, str):
+            self.__packed = self.__packed.tobytes()
+        self.payload
+
     def addOption (self, opt):
         """Add a new option instance.
 
-        If the option can appear multiple times, this method is
-        intended to add the new value to the existing ones.
-
-        :warning: Currently multi-valued options are not supported and
-                  this is equivalent to :meth:`.replaceOption`.
+        If the option is :attr:`repeatable
+        <coapy.options._Base.Repeatable>` (e.g.
+        :class:`coapy.options.UriPath`), the new value is added after
+        any existing ones; otherwise this is equivalent to
+        :meth:`.replaceOption`.
         """
-        self.__options[type(opt)] = opt
+        if not opt.Repeatable:
+            return self.replaceOption(opt)
+        if self.__optionSpans and (opt.Type in self.__optionSpans):
+            self._unpackSpans(opt.Type)
+        self.__options.add(opt)
+        self.__wire = None
         return self
 
     def replaceOption (self, opt):
         """Add a new option instance.
 
         If the option is already present in message, its previous
-        value is replaced by the new one.
+        value (or values) are replaced by the new one.
         """
-        self.__options[type(opt)] = opt
+        self._dropSpans(opt.Type)
+        self.__options.replace(opt)
+        self.__wire = None
         return self
 
     def _classForOption (self, opt):
@@ -171,22 +239,47 @@ class Message (object):
         return opt
 
     def deleteOption (self, opt):
-        """Remove the option from the message.
+        """Remove the option, and any repetitions of it, from the message.
 
         :param opt: An option, specified as an option instance, an
           option class, or the type code of an option.
+        :raises: :exc:`KeyError` if the message has no such option.
         """
-        self.__options.pop(self._classForOption(opt))
+        opt_class = self._classForOption(opt)
+        self.__wire = None
+        dropped = self._dropSpans(opt_class.Type)
+        if (0 == self.__options.remove(opt_class.Type)) and not dropped:
+            raise KeyError(opt_class)
 
     def findOption (self, opt):
         """Locate the given option within the message.
 
-        Returns ``None`` if no matching option can be found.
+        Returns ``None`` if no matching option can be found.  If the
+        option is repeated, the first instance is returned; see
+        :meth:`.findOptions`.
+
+        For a message decoded with *lazy* set, only the requested
+        option is converted to an instance.
+
+        :param opt: An option, specified as an option instance, an
+          option class, or the type code of an option.
+        """
+        type_val = self._classForOption(opt).Type
+        if self.__optionSpans and (type_val in self.__optionSpans):
+            self._unpackSpans(type_val)
+        return self.__options.find(type_val)
+
+    def findOptions (self, opt):
+        """Return a list of all instances of the given option within
+        the message, in order.
 
         :param opt: An option, specified as an option instance, an
           option class, or the type code of an option.
         """
-        return self.__options.get(self._classForOption(opt))
+        type_val = self._classForOption(opt).Type
+        if self.__optionSpans and (type_val in self.__optionSpans):
+            self._unpackSpans(type_val)
+        return self.__options.findAll(type_val)
 
     __transactionType = None
     def _get_transaction_type (self):
@@ -211,19 +304,37 @@ class Message (object):
         If this is not an empty string, there should be a
         corresponding :class:`coapy.options.ContentType` option
         present that defines its format (if the default value of
-        ``text/plain`` is not appropriate)."""
+        ``text/plain`` is not appropriate).
+
+        For a decoded message the payload may be held as a view into
+        the receive buffer; it is copied out on first access.  Use
+        :attr:`payload_view` to examine it without copying."""
+        if not isinstance(self.__payload, str):
+            self.__payload = self.__payload.tobytes()
         return self.__payload
     def _set_payload (self, payload):
         if not isinstance(payload, str):
             raise ValueError()
         self.__payload = payload
+        self.__wire = None
     payload = property(_get_payload, _set_payload)
 
+    def _get_payload_view (self):
+        """The payload of the message as a :class:`memoryview`.
+
+        For a decoded message that has not had its :attr:`payload`
+        accessed this is a view into the buffer the message was
+        received into, and is only valid until that buffer is
+        released (see :meth:`ReceptionRecord.release` and
+        :attr:`EndPoint.zero_copy`)."""
+        return memoryview(self.__payload)
+    payload_view = property(_get_payload_view)
+
     def build_uri (self, explicit=False):
         uri_host = self.findOption(coapy.options.UriHost)
         uri_port = self.findOption(coapy.options.UriPort)
-        uri_path = self.findOption(coapy.options.UriPath)
-        uri_query = self.findOption(coapy.options.UriQuery)
+        uri_path = self.findOptions(coapy.options.UriPath)
+        uri_query = self.findOptions(coapy.options.UriQuery)
         resp = []
         val = None
         if uri_host is None:
@@ -242,12 +353,12 @@ class Message (object):
             resp.append('%d'%val)
         val = None
         val = coapy.options.UriPath.Default
-        if uri_path is not None:
-            val = uri_path.value
+        if uri_path:
+            val = '/'.join([ _o.value for _o in uri_path ])
         resp.append('/%s' % (val,))
         val = None
-        if uri_query is not None:
-            val = uri_query.value
+        if uri_query:
+            val = '&'.join([ _o.value for _o in uri_query ])
             resp.append('?%s'%val)
         return ''.join(resp)
 
@@ -261,30 +372,55 @@ class Message (object):
             resp.append(uri)
         return ' '.join(resp)
 
+    __wire = None
+    def _wire (self):
+        """Return the encoded message as a triple (*prefix*, *body*,
+        *values*), where *prefix* is the first two octets of the
+        header, *body* is everything after the transaction ID, and
+        *values* pairs each option with the value that was encoded.
+
+        The encoding is cached, so sending the same message many
+        times encodes its options once.  The cache is discarded when
+        options are added, replaced, or deleted, or the payload is
+        assigned.  Each packing also compares the option values with
+        those that were encoded, so an option instance whose value is
+        changed in place is still packed correctly."""
+        wire = self.__wire
+        if wire is not None:
+            for (opt, value) in wire[2]:
+                if opt.value != value:
+                    wire = None
+                    break
+        if wire is None:
+            if self.__optionSpans:
+                self._unpackOptions()
+            (num_options, option_encoding) = coapy.options.encode(self.__options, presorted=True)
+            assert isinstance(option_encoding, str)
+            if 0x0F < num_options:
+                raise ValueError('Message has %d options; at most 15 can be encoded' % (num_options,))
+            prefix = chr((self.version << 6) + ((self.__transactionType & 0x03) << 4) + (num_options & 0x0F)) + chr(self.__code)
+            body = option_encoding
+            if (0 != self.__code) and self.__payload:
+                body += self.payload
+            values = tuple([ (_o, _o.value) for _o in self.__options ])
+            wire = self.__wire = (prefix, body, values)
+        return wire
+
     def _pack (self, transaction_id):
         """Return the message as an octet sequence.
 
+        Only the transaction ID is encoded afresh; the rest of the
+        message is cached (see :meth:`_wire`).
+
         :param transaction_id: The transaction ID to be encoded into the sequence
         :rtype: :class:`str`
         """
 
-        data = []
-        if self.__options is None:
-            num_options = 0
-            option_encoding = ''
-        else:
-            (num_options, option_encoding) = coapy.options.encode(self.__options.itervalues())
-        assert isinstance(option_encoding, str)
-        data.append(chr((self.version << 6) + ((self.__transactionType & 0x03) << 4) + (num_options & 0x0F)))
-        data.append(struct.pack('!BH', self.__code, transaction_id))
-        if 0 < num_options:
-            data.append(option_encoding)
-        if (0 != self.__code) and self.__payload:
-            data.append(self.__payload)
-        return ''.join(data)
+        (prefix, body, _) = self._wire()
+        return prefix + struct.pack('!H', transaction_id) + body
 
     @classmethod
-    def decode (cls, packed):
+    def decode (cls, packed, lazy=False):
         """Create a Message instance from a payload.
 
         This method decodes the payload, and returns a pair (*xid*,
@@ -293,7 +429,19 @@ class Message (object):
         :class:`Message` initialized to the decoded components of the
         data.
 
+        If *packed* is a :class:`memoryview` the message is decoded
+        without copying it, and the payload of the resulting message
+        refers to the same buffer.
+
+        If *lazy* is ``True`` the options are only located (see
+        :func:`coapy.options.scan`); each option instance is created
+        when :meth:`findOption` or :attr:`options` first asks for it.
+        Invalid option values are then not detected until that time.
+        The message refers to *packed* until all its options have been
+        created.
+
         :param payload: A sequence of octets comprising a complete CoAP packet
+        :param lazy: Defer creating option instances until they are used.
         :rtype: (:class:`int`, :class:`Message`)
         """
         
@@ -302,13 +450,211 @@ class Message (object):
             raise Exception()
         transaction_type = 0x03 & (vtoc >> 4)
         num_options = (vtoc & 0x0F)
-        (code, transaction_id) = struct.unpack('!BH', packed[1:4])
-        (options, packed) = coapy.options.decode(num_options, packed[4:])
+        (code, transaction_id) = struct.unpack_from('!BH', packed, 1)
+        if lazy:
+            (spans, offset) = coapy.options.scan(num_options, packed, 4)
+            instance = cls(transaction_type=transaction_type, code=code, payload=packed[offset:])
+            if spans:
+                instance.__packed = packed
+                option_spans = instance.__optionSpans = { }
+                for span in spans:
+                    option_spans.setdefault(span[0], []).append(span)
+            return (transaction_id, instance)
+        (options, packed) = coapy.options.decode(num_options, packed, 4)
         instance = cls(transaction_type=transaction_type, code=code, payload=packed)
         for opt in options:
-            instance.__options[type(opt)] = opt
+            instance.__options.add(opt)
         return (transaction_id, instance)
 
+class RequestTemplate (object):
+    """A request that is sent repeatedly to the same resource.
+
+    The template is built once from a ``coap://`` URI, the inverse of
+    :meth:`Message.build_uri`, together with any fixed options.  The
+    message is encoded at construction, and :meth:`packet` produces
+    the datagram for a transaction ID by inserting it into the
+    pre-encoded octets, without creating or sorting options.
+
+    - :attr:`.message`
+    - :attr:`.remote`
+    """
+
+    def __init__ (self, uri, code=coapy.GET, transaction_type=Message.CON, payload='', options=()):
+        """
+        :param uri: A ``coap://`` URI identifying the resource.  The
+          host, an explicit port, the path, and the query become the
+          :class:`UriHost <coapy.options.UriHost>`, :class:`UriPort
+          <coapy.options.UriPort>`, :class:`UriPath
+          <coapy.options.UriPath>`, and :class:`UriQuery
+          <coapy.options.UriQuery>` options.  The path and the query
+          are each percent-decoded into a single option, as for the
+          ``uri_path`` and ``uri_query`` keywords of :class:`Message`.
+
+        :param code: The request method code.
+
+        :param transaction_type: :attr:`Message.CON` or
+          :attr:`Message.NON`.
+
+        :param payload: The request payload.
+
+        :param options: Additional option instances to include.
+
+        :raises: :exc:`ValueError` if *uri* is not a ``coap://`` URI
+          with a host.
+        """
+        parts = urlparse.urlsplit(uri)
+        if ('coap' != parts.scheme) or not parts.hostname:
+            raise ValueError(uri)
+        message = Message(transaction_type, code=code, payload=payload)
+        message.addOption(coapy.options.UriHost(parts.hostname))
+        port = parts.port
+        if port is not None:
+            message.addOption(coapy.options.UriPort(port))
+        else:
+            port = coapy.COAP_PORT
+        # As with the uri_path and uri_query keywords of Message, the
+        # whole path and the whole query are each a single option.
+        uri_path = urllib.unquote(parts.path.lstrip('/'))
+        if uri_path:
+            message.addOption(coapy.options.UriPath(uri_path))
+        uri_query = urllib.unquote(parts.query)
+        if uri_query:
+            message.addOption(coapy.options.UriQuery(uri_query))
+        for opt in options:
+            message.addOption(opt)
+        self.__message = message
+        if ':' in parts.hostname:
+            self.__remote = (parts.hostname, port, 0, 0)
+        else:
+            self.__remote = (parts.hostname, port)
+        (self.__prefix, self.__body, _) = message._wire()
+
+    __message = None
+    def _get_message (self):
+        """The :class:`Message` described by the template.
+
+        It may be passed to :meth:`EndPoint.send`; its encoding is
+        cached, so doing so repeatedly is also inexpensive.  It should
+        not be modified."""
+        return self.__message
+    message = property(_get_message)
+
+    __remote = None
+    def _get_remote (self):
+        """The socket address named by the URI, suitable for
+        :meth:`EndPoint.send`: (*host*, *port*), or (*host*, *port*,
+        0, 0) for an IPv6 literal host.  The port defaults to
+        :attr:`coapy.COAP_PORT`."""
+        return self.__remote
+    remote = property(_get_remote)
+
+    def packet (self, transaction_id):
+        """Return the datagram for the request with the given
+        transaction ID.
+
+        :rtype: :class:`str`
+        """
+        return self.__prefix + struct.pack('!H', transaction_id) + self.__body
+
+ADDRESS_CACHE_SIZE = 1024
+"""The number of socket addresses for which :func:`classify_address`
+retains the result."""
+
+ADDRESS_CACHE_TTL = 300
+"""The time, in seconds, for which :func:`classify_address` retains a
+result.  This bounds how long a host name continues to map to an
+address after the name service has changed it."""
+
+address_cache = coapy.cache.LRUCache(ADDRESS_CACHE_SIZE, ADDRESS_CACHE_TTL)
+"""The :class:`coapy.cache.LRUCache` used by :func:`classify_address`,
+mapping socket addresses as provided by applications to their
+(*normalized*, *is_multicast*) pairs.  It is shared by all
+end-points and threads, so access is serialized by
+:data:`_addressCacheLock`."""
+
+_addressCacheLock = threading.Lock()
+
+def _classifyAddress (address):
+    if 2 == len(address):
+        family = socket.AF_INET
+    elif 4 == len(address):
+        family = socket.AF_INET6
+    else:
+        raise ValueError()
+    (host, port) = address[:2]
+    scopeid = None
+    inaddr = None
+    if isinstance(port, int):
+        try:
+            inaddr = socket.inet_pton(family, host)
+        except (socket.error, TypeError):
+            pass
+    if inaddr is None:
+        sockaddr = socket.getaddrinfo(host, port, family, socket.SOCK_DGRAM)[0][4]
+        (host, port) = sockaddr[:2]
+        inaddr = socket.inet_pton(family, host)
+        if socket.AF_INET6 == family:
+            scopeid = sockaddr[3]
+    else:
+        host = socket.inet_ntop(family, inaddr)
+    if socket.AF_INET == family:
+        return ((host, port), 0xE0 == (0xF0 & ord(inaddr[0])))
+    if 0 != address[3]:
+        scopeid = address[3]
+    elif scopeid is None:
+        scopeid = 0
+    return ((host, port, address[2], scopeid), 0xFF == ord(inaddr[0]))
+
+def classify_address (address):
+    """Return the pair (*normalized*, *is_multicast*) for a socket address.
+
+    *normalized* is the form in which the socket layer reports the
+    address, as returned by :func:`normalize_address`; *is_multicast*
+    is as returned by :func:`is_multicast`.
+
+    Hosts given as numeric addresses are converted without consulting
+    the name service.  Results are retained in :data:`address_cache`,
+    so an application that repeatedly provides the same address pays
+    for the conversion once.
+
+    :param address: An IPv4 or IPv6 socket address tuple.
+    """
+
+    _addressCacheLock.acquire()
+    try:
+        entry = address_cache.get(address)
+    finally:
+        _addressCacheLock.release()
+    if entry is None:
+        # Resolve without holding the lock, since the name service
+        # may block
+        entry = _classifyAddress(address)
+        _addressCacheLock.acquire()
+        try:
+            address_cache.put(address, entry)
+            if entry[0] != address:
+                address_cache.put(entry[0], entry)
+        finally:
+            _addressCacheLock.release()
+    return entry
+
+def normalize_address (address):
+    """Return the numeric form of a socket address.
+
+    Responses are matched to transmissions by the address from which
+    they are received, which the socket layer reports in numeric form.
+    Remote addresses provided by applications are converted to the
+    same form so they can be compared.
+
+    :param address: A socket address as supported by the Python socket
+        functions.  Addresses that are not IP addresses (e.g.,
+        Unix-domain file system paths) are returned unchanged.
+    """
+
+    if not isinstance(address, tuple):
+        return address
+    return classify_address(address)[0]
+
 def is_multicast (address):
     """Return ``True`` iff address is a multicast address.
 
@@ -326,21 +672,255 @@ def is_multicast (address):
         return False
     if not isinstance(address, tuple):
         raise ValueError()
-    if 2 == len(address):
-        family = socket.AF_INET
-        (host, port) = address
-    elif 4 == len(address):
-        family = socket.AF_INET6
-        (host, port, flowinfo, scopeid) = address
-    else:
-        raise ValueError()
-    for (_, _, _, _, sockaddr) in socket.getaddrinfo(host, port, family):
-        inaddr = socket.inet_pton(family, sockaddr[0])
-        if socket.AF_INET == family:
-            return 0xE0 == (0xF0 & ord(inaddr[0]))
-        elif socket.AF_INET6 == family:
-            return 0xFF == ord(inaddr[0])
-    return False
+    return classify_address(address)[1]
+
+class ResetError (Exception):
+    """Raised when a confirmable request is answered with a
+    :attr:`Message.RST`."""
+
+    rx_record = None
+    """The :class:`ReceptionRecord` for the reset message."""
+
+    def __init__ (self, rx_record):
+        self.rx_record = rx_record
+        super(ResetError, self).__init__()
+
+    def __str__ (self):
+        return '%s: %s reset %s' % (self.__class__.__name__, self.rx_record.remote, self.rx_record.pertains_to)
+
+class ResponseTimeout (Exception):
+    """Raised when no response to a confirmable request is received
+    after the last retransmission."""
+
+    tx_record = None
+    """The :class:`TransmissionRecord` for the request."""
+
+    def __init__ (self, tx_record):
+        self.tx_record = tx_record
+        super(ResponseTimeout, self).__init__()
+
+    def __str__ (self):
+        return '%s: %s to %s' % (self.__class__.__name__, self.tx_record, self.tx_record.remote)
+
+class Future (object):
+    """The eventual outcome of a confirmable request.
+
+    A future is obtained from :meth:`EndPoint.request`, and is
+    completed by the end-point as it processes network activity:
+
+    - when an :attr:`Message.ACK` pertaining to the request is
+      received, the result is its :class:`ReceptionRecord`;
+
+    - when an :attr:`Message.RST` is received, the exception is a
+      :exc:`ResetError`;
+
+    - when the last retransmission goes unacknowledged, the exception
+      is a :exc:`ResponseTimeout`.
+
+    Note that an acknowledgement with a code of ``0`` indicates that
+    the response will follow in a separate confirmable message.
+    """
+
+    def __init__ (self, tx_record):
+        self.__txRecord = tx_record
+        self.__callbacks = []
+
+    __txRecord = None
+    def _get_tx_record (self):
+        """The :class:`TransmissionRecord` for the request."""
+        return self.__txRecord
+    tx_record = property(_get_tx_record)
+
+    __done = False
+    def done (self):
+        """Return ``True`` iff the future has been completed."""
+        return self.__done
+
+    __result = None
+    def result (self):
+        """Return the :class:`ReceptionRecord` for the response.
+
+        :raises: the exception with which the future completed, or
+          :exc:`Exception` if it has not completed."""
+        if not self.__done:
+            raise Exception('Future has not completed')
+        if self.__exception is not None:
+            raise self.__exception
+        return self.__result
+
+    __exception = None
+    def exception (self):
+        """Return the exception with which the future completed, or
+        ``None`` if it completed with a result.
+
+        :raises: :exc:`Exception` if the future has not completed."""
+        if not self.__done:
+            raise Exception('Future has not completed')
+        return self.__exception
+
+    __callbacks = None
+    def add_done_callback (self, fn):
+        """Arrange for *fn* to be invoked with this future as its
+        argument when the future completes.
+
+        If the future has already completed, *fn* is invoked
+        immediately."""
+        if self.__done:
+            fn(self)
+        else:
+            self.__callbacks.append(fn)
+
+    def _complete (self, result=None, exception=None):
+        if self.__done:
+            return
+        self.__done = True
+        self.__result = result
+        self.__exception = exception
+        (callbacks, self.__callbacks) = (self.__callbacks, None)
+        for fn in callbacks:
+            fn(self)
+
+class GroupRequest (object):
+    """The responses to a message sent to a multicast address.
+
+    A group request is obtained from :meth:`EndPoint.groupRequest`.
+    Iterating over it processes network activity on the end-point
+    until the collection window closes, yielding the
+    :class:`ReceptionRecord` of the first response (an acknowledgement
+    or a reset) from each remote as it arrives.  Later responses from a remote that has already
+    answered are counted as :attr:`duplicates` and discarded.
+
+    At most :attr:`max_responses` records are yielded; when that many
+    remotes have answered the window closes early.  Once the window
+    closes the transmission is removed from the end-point, so that
+    late responses are no longer matched to it.
+
+    Messages received during the window that do not pertain to the
+    request are collected in :attr:`unrelated` so that the
+    application may respond to them.  Only the most recent
+    :attr:`MAX_UNRELATED` are kept.
+    """
+
+    MAX_RESPONSES = 1024
+    """The default limit on the number of responses collected."""
+
+    MAX_UNRELATED = 64
+    """The maximum number of records retained in :attr:`unrelated`."""
+
+    def __init__ (self, tx_record, window_ms, max_responses=None):
+        """
+        :param tx_record: The :class:`TransmissionRecord` for the
+          message sent to the group.
+
+        :param window_ms: The time, in milliseconds, for which
+          responses are collected.
+
+        :param max_responses: The maximum number of responses
+          collected.  ``None`` selects :attr:`MAX_RESPONSES`.
+        """
+        if max_responses is None:
+            max_responses = self.MAX_RESPONSES
+        self.__txRecord = tx_record
+        self.__endTime = time.time() + window_ms / 1000.0
+        self.__maxResponses = max_responses
+        self.__remotes = set()
+        self.__pending = collections.deque()
+        self.__unrelated = collections.deque(maxlen=self.MAX_UNRELATED)
+        # Responses are delivered through iteration, so the record
+        # need only retain the first.
+        tx_record.response_limit = 1
+        # End-points answer discovery messages with a reset, so those
+        # count as responses too
+        tx_record.on_response = self._response
+        tx_record.on_reset = self._response
+
+    __txRecord = None
+    def _get_tx_record (self):
+        """The :class:`TransmissionRecord` for the message sent to the
+        group."""
+        return self.__txRecord
+    tx_record = property(_get_tx_record)
+
+    __maxResponses = None
+    def _get_max_responses (self):
+        """The maximum number of responses collected."""
+        return self.__maxResponses
+    max_responses = property(_get_max_responses)
+
+    __remotes = None
+    def _get_remotes (self):
+        """The set of remotes from which a response has been received."""
+        return self.__remotes
+    remotes = property(_get_remotes)
+
+    __duplicates = 0
+    def _get_duplicates (self):
+        """The number of responses discarded because their remote had
+        already answered."""
+        return self.__duplicates
+    duplicates = property(_get_duplicates)
+
+    __unrelated = None
+    def _get_unrelated (self):
+        """A :class:`collections.deque` of the :class:`ReceptionRecord`
+        instances received while collecting that do not pertain to the
+        request, oldest first.  When more than :attr:`MAX_UNRELATED`
+        arrive the oldest are discarded and counted in
+        :attr:`unrelated_discarded`."""
+        return self.__unrelated
+    unrelated = property(_get_unrelated)
+
+    __unrelatedDiscarded = 0
+    def _get_unrelated_discarded (self):
+        """The number of unrelated records discarded because
+        :attr:`unrelated` was full."""
+        return self.__unrelatedDiscarded
+    unrelated_discarded = property(_get_unrelated_discarded)
+
+    __closed = False
+    def _get_closed (self):
+        """``True`` once the collection window has closed."""
+        return self.__closed
+    closed = property(_get_closed)
+
+    def _response (self, tx_record, rx_record):
+        if self.__closed or (rx_record.remote in self.__remotes):
+            self.__duplicates += 1
+            rx_record.release()
+            return
+        self.__remotes.add(rx_record.remote)
+        self.__pending.append(rx_record)
+
+    def close (self):
+        """Close the collection window.
+
+        Responses already received but not yet yielded remain
+        available through iteration."""
+        if self.__closed:
+            return
+        self.__closed = True
+        tx_record = self.__txRecord
+        tx_record.on_response = tx_record.on_reset = None
+        tx_record.end_point._endGroupRequest(tx_record)
+
+    def __iter__ (self):
+        end_point = self.__txRecord.end_point
+        pending = self.__pending
+        while True:
+            while pending:
+                yield pending.popleft()
+            if self.__closed:
+                return
+            remaining_ms = 1000 * (self.__endTime - time.time())
+            if (0 >= remaining_ms) or (len(self.__remotes) >= self.__maxResponses):
+                self.close()
+                continue
+            rx_record = end_point.process(remaining_ms)
+            if (rx_record is not None) and (rx_record.pertains_to is not self.__txRecord):
+                unrelated = self.__unrelated
+                if len(unrelated) == unrelated.maxlen:
+                    self.__unrelatedDiscarded += 1
+                unrelated.append(rx_record)
 
 class TransmissionRecord (object):
     """Material related to a transmitted CoAP message.
@@ -351,11 +931,24 @@ class TransmissionRecord (object):
     - :attr:`.end_point`
     - :attr:`.packed`
 
+    The end-point reports the progress of the transmission through
+    optional callbacks, each invoked from :meth:`EndPoint.process`:
+
+    - :attr:`.on_response` with the record and each
+      :class:`ReceptionRecord` of a response other than a reset
+    - :attr:`.on_reset` with the record and the
+      :class:`ReceptionRecord` of a :attr:`Message.RST`
+    - :attr:`.on_timeout` with the record when the last transmission
+      of a confirmable message goes unacknowledged
+    - :attr:`.on_expire` with the record when it is removed from the
+      end-point transmission cache, after which no response can be
+      matched to it
     """
 
     __responseTimeout = None
+    __backoffFactor = None
 
-    def __init__ (self, end_point, message, remote):
+    def __init__ (self, end_point, message, remote, multicast=None):
         """
         :param end_point: The :class:`EndPoint` responsible for
           transmitting the message.
@@ -364,20 +957,29 @@ class TransmissionRecord (object):
           transmission content will be calculated
 
         :param remote: A Python :mod:`socket` address identifying the
-          destination of the transmission.
+          destination of the transmission.  This should be in the
+          form returned by :func:`normalize_address`.
+
+        :param multicast: The value of :func:`is_multicast` for
+          *remote*, if the caller already knows it.
         """
 
         self.__endPoint = end_point
         self.__message = message
-        self.__transactionId = self.__endPoint._nextTransactionId()
         self.__remote = remote
+        if multicast is None:
+            multicast = is_multicast(remote)
+        self.__isMulticast = multicast
+        self.__transactionId = self.__endPoint._nextTransactionId(remote)
 
         self.__packed = message._pack(self.__transactionId)
 
         self.__transmissionsLeft = 1
-        if (Message.CON == message.transaction_type) and (not is_multicast(remote)):
+        if (Message.CON == message.transaction_type) and (not self.__isMulticast):
             self.__transmissionsLeft = coapy.MAX_RETRANSMIT
-        self.__responseTimeout = coapy.RESPONSE_TIMEOUT
+        timeout = self.__endPoint.peer(remote).timeout
+        self.__responseTimeout = timeout.initialTimeout()
+        self.__backoffFactor = timeout.backoff_factor
         self.__nextEventTime = time.time()
         self.__allResponses = set()
         if Message.CON == message.transaction_type:
@@ -412,6 +1014,15 @@ class TransmissionRecord (object):
         return self.__remote
     remote = property(_get_remote)
 
+    __isMulticast = None
+    def _get_is_multicast (self):
+        """``True`` iff the transmission was sent to a multicast address.
+
+        Responses to such a transmission come from unicast addresses,
+        so are matched by transaction ID alone."""
+        return self.__isMulticast
+    is_multicast = property(_get_is_multicast)
+
     __packed = None
     def _get_packed (self):
         """The octet sequence representing the message."""
@@ -446,6 +1057,12 @@ class TransmissionRecord (object):
         return self.__transmissionsLeft
     transmissions_left = property(_get_transmissions_left)
 
+    __transmissionCount = 0
+    def _get_transmission_count (self):
+        """The number of times the message has been transmitted."""
+        return self.__transmissionCount
+    transmission_count = property(_get_transmission_count)
+
     __transmissionTime = None
     def _get_transmission_time (self):
         """The :meth:`time.time` at which the message was first transmitted."""
@@ -504,7 +1121,63 @@ class TransmissionRecord (object):
             self.__transmissionTime = let
         self.__nextEventTime = let + self.__responseTimeout
         self.__transmissionsLeft -= 1
-        self.__responseTimeout *= 2
+        self.__transmissionCount += 1
+        self.__responseTimeout *= self.__backoffFactor
+
+    __future = None
+    def _get_future (self):
+        """The :class:`Future` completed by the response to this
+        transmission, or ``None`` if the transmission was not
+        created by :meth:`EndPoint.request`."""
+        return self.__future
+    future = property(_get_future)
+
+    __onResponse = None
+    def _get_on_response (self):
+        """A callable invoked as ``on_response(tx_record, rx_record)``
+        for each response to the transmission other than a reset, or
+        ``None``."""
+        return self.__onResponse
+    def _set_on_response (self, on_response):
+        self.__onResponse = on_response
+    on_response = property(_get_on_response, _set_on_response)
+
+    __onReset = None
+    def _get_on_reset (self):
+        """A callable invoked as ``on_reset(tx_record, rx_record)``
+        when a :attr:`Message.RST` pertaining to the transmission is
+        received, or ``None``."""
+        return self.__onReset
+    def _set_on_reset (self, on_reset):
+        self.__onReset = on_reset
+    on_reset = property(_get_on_reset, _set_on_reset)
+
+    __onTimeout = None
+    def _get_on_timeout (self):
+        """A callable invoked as ``on_timeout(tx_record)`` when the
+        last transmission of a confirmable message goes
+        unacknowledged, or ``None``."""
+        return self.__onTimeout
+    def _set_on_timeout (self, on_timeout):
+        self.__onTimeout = on_timeout
+    on_timeout = property(_get_on_timeout, _set_on_timeout)
+
+    __onExpire = None
+    def _get_on_expire (self):
+        """A callable invoked as ``on_expire(tx_record)`` when the
+        record is removed from the end-point, or ``None``."""
+        return self.__onExpire
+    def _set_on_expire (self, on_expire):
+        self.__onExpire = on_expire
+    on_expire = property(_get_on_expire, _set_on_expire)
+
+    def _attachFuture (self):
+        """Create and return the :attr:`future` for this transmission.
+
+        :note: To be invoked only by an :class:`EndPoint`."""
+        if self.__future is None:
+            self.__future = Future(self)
+        return self.__future
 
     __responseRecord = None
     def _get_response (self):
@@ -516,10 +1189,24 @@ class TransmissionRecord (object):
     __allResponses = None
     def _get_responses (self):
         """A set containing all :class:`ReceptionRecords` that pertain
-        to this transmission."""
+        to this transmission, up to :attr:`response_limit`."""
         return self.__allResponses
     responses = property(_get_responses)
 
+    __responseLimit = None
+    def _get_response_limit (self):
+        """The maximum number of records retained in
+        :attr:`responses`, or ``None`` for no limit.
+
+        Later responses are still passed to :attr:`on_response`.
+        Limiting the set bounds the memory held by a transmission to
+        a multicast address, which may be answered by any number of
+        remotes."""
+        return self.__responseLimit
+    def _set_response_limit (self, response_limit):
+        self.__responseLimit = response_limit
+    response_limit = property(_get_response_limit, _set_response_limit)
+
     def _processResponse (self, rx_record):
         """Process a response to this transmission.
 
@@ -528,7 +1215,8 @@ class TransmissionRecord (object):
         :attr:`response` and record :attr:`response_type`.
 
         This counts as an event for the purposes of
-        :attr:`last_event_time`.
+        :attr:`last_event_time`.  The application is told of the
+        response separately, by :meth:`_notifyResponse`.
         """
         self.__lastEventTime = time.time()
         self.__nextEventTime = None
@@ -537,7 +1225,29 @@ class TransmissionRecord (object):
             self.__responseRecord = rx_record
         if self.__responseType is None:
             self.__responseType = rx_record.message.transaction_type
-        self.__allResponses.add(rx_record)
+        if (self.__responseLimit is None) or (len(self.__allResponses) < self.__responseLimit):
+            self.__allResponses.add(rx_record)
+
+    def _notifyResponse (self, rx_record):
+        """Complete any :attr:`future` and invoke :attr:`on_response`
+        or :attr:`on_reset` for a response.
+
+        The end-point calls this only once it has finished its own
+        bookkeeping for the response, so an exception raised by
+        application code cannot leave the transmission scheduled or
+        its exchange open."""
+        is_reset = Message.RST == rx_record.message.transaction_type
+        if self.__future is not None:
+            if is_reset:
+                self.__future._complete(exception=ResetError(rx_record))
+            else:
+                self.__future._complete(result=rx_record)
+        if is_reset:
+            callback = self.__onReset
+        else:
+            callback = self.__onResponse
+        if callback is not None:
+            callback(self, rx_record)
 
     def _is_unacknowledged (self):
         """Return ``True`` iff this was a confirmable transaction for
@@ -560,10 +1270,11 @@ class ReceptionRecord (object):
     - :attr:`.end_point`
     """
 
-    def __init__ (self, end_point, packed, remote):
+    def __init__ (self, end_point, packed, remote, buffer=None):
         self.__endPoint = end_point
-        (self.__transactionId, self.__message) = Message.decode(packed)
+        (self.__transactionId, self.__message) = Message.decode(packed, end_point.lazy_options)
         self.__remote = remote
+        self.__buffer = buffer
         if Message.CON == self.__message.transaction_type:
             self.__responseType = None
         else:
@@ -618,11 +1329,35 @@ class ReceptionRecord (object):
 
     has_responded = property(lambda _s: _s.__responseType is not None)
 
+    __buffer = None
+    def release (self):
+        """Return the buffer into which the message was received to
+        the end-point for reuse.
+
+        Until this is called the message :attr:`payload
+        <Message.payload>` refers to the receive buffer, and may be
+        examined without copying through :attr:`Message.payload_view`.
+        Releasing the record copies the payload, and any options not
+        yet decoded (see :attr:`EndPoint.lazy_options`), out of the
+        buffer, so the message remains valid, but any view previously
+        obtained must no longer be used.
+
+        Unless the end-point has :attr:`zero_copy <EndPoint.zero_copy>`
+        set, records are released before they are handed to the
+        application, and calling this has no effect.  Records that
+        are not released do not return their buffer to the pool."""
+        buffer = self.__buffer
+        if buffer is not None:
+            self.__buffer = None
+            self.__message._detach()
+            self.__endPoint._releaseBuffer(buffer)
+
     def _respond (self, response_msg):
         if self.has_responded:
             raise Exception()
         self.__responseType = response_msg.transaction_type
-        self.__endPoint.socket.sendto(response_msg._pack(self.transaction_id), self.__remote)
+        packed = response_msg._pack(self.transaction_id)
+        self.__endPoint._sendResponse(self, packed)
 
     def ack (self, response_msg=None):
         if response_msg is None:
@@ -635,6 +1370,62 @@ class ReceptionRecord (object):
     def __str__ (self):
         return '%s[%d]' % (str(self.__message), self.__transactionId)
 
+SIOCGIFCONF = 0x8912
+SIOCGIFINDEX = 0x8933
+
+_IFREQ_SIZE = 16 + struct.calcsize('@LLHBBB0L')
+"""The size of a Linux ``struct ifreq``: the interface name and the
+largest member of the request union."""
+
+_interfaceIndexes = { }
+"""A map from (*family*, *packed_address*) to the index of the local
+network interface with that address; see :func:`interface_index`."""
+
+def _loadInterfaceIndexes ():
+    indexes = { }
+    try:
+        for line in file('/proc/net/if_inet6').readlines():
+            fields = line.split()
+            indexes[(socket.AF_INET6, binascii.unhexlify(fields[0]))] = int(fields[1], 16)
+    except IOError:
+        pass
+    sfd = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        buf = array.array('B', '\0' * (64 * _IFREQ_SIZE))
+        ifconf = struct.pack('@iP', len(buf), buf.buffer_info()[0])
+        (length, _) = struct.unpack('@iP', fcntl.ioctl(sfd.fileno(), SIOCGIFCONF, ifconf))
+        ifreqs = buf.tostring()
+        for offset in xrange(0, length, _IFREQ_SIZE):
+            name = ifreqs[offset:offset+16].split('\0', 1)[0]
+            ifreq = struct.pack('16si', name, 0).ljust(_IFREQ_SIZE, '\0')
+            (index,) = struct.unpack_from('i', fcntl.ioctl(sfd.fileno(), SIOCGIFINDEX, ifreq), 16)
+            indexes[(socket.AF_INET, ifreqs[offset+20:offset+24])] = index
+    except IOError:
+        pass
+    finally:
+        sfd.close()
+    return indexes
+
+def interface_index (family, address):
+    """Return the index of the local network interface to which an IP
+    address is assigned, or ``None`` if no interface has it.
+
+    The interface table is read when first needed, and again when an
+    address is not found in it.
+
+    :note: This is only implemented for Linux.
+
+    :param family: :data:`socket.AF_INET` or :data:`socket.AF_INET6`.
+    :param address: An IP address in numeric form.
+    """
+    key = (family, socket.inet_pton(family, address))
+    index = _interfaceIndexes.get(key)
+    if index is None:
+        _interfaceIndexes.clear()
+        _interfaceIndexes.update(_loadInterfaceIndexes())
+        index = _interfaceIndexes.get(key)
+    return index
+
 def join_discovery (dfd, interface_address):
     """Join a socket to a multicast address for discovery.
 
@@ -660,17 +1451,15 @@ def join_discovery (dfd, interface_address):
     """
 
     print 'address %s' % (interface_address,)
-    rv = socket.getaddrinfo(interface_address, coapy.COAP_PORT, dfd.family, dfd.type, dfd.proto)
-    if_sockaddr = rv[0][4]
     if socket.AF_INET == dfd.family:
-        mc_address = '224.0.0.1'
+        if_sockaddr = (interface_address, coapy.COAP_PORT)
+        mc_sockaddr = ('224.0.0.1', coapy.COAP_PORT)
     elif socket.AF_INET6 == dfd.family:
-        mc_address = 'ff02::1'
+        if_sockaddr = (interface_address, coapy.COAP_PORT, 0, 0)
+        mc_sockaddr = ('ff02::1', coapy.COAP_PORT, 0, 0)
     else:
         raise Exception('Unsupported address family')
-
-    rv = socket.getaddrinfo(mc_address, coapy.COAP_PORT, dfd.family, dfd.type, dfd.proto)
-    mc_sockaddr = rv[0][4]
+    if_sockaddr = normalize_address(if_sockaddr)
 
     if_addr = if_sockaddr[0]
     if 2 == len(if_sockaddr):
@@ -679,17 +1468,11 @@ def join_discovery (dfd, interface_address):
         dfd.setsockopt(socket.SOL_IP, socket.IP_MULTICAST_IF, if_addr_packed)
         dfd.setsockopt(socket.SOL_IP, socket.IP_ADD_MEMBERSHIP, mc_addr_packed+if_addr_packed)
     elif 4 == len(if_sockaddr):
-        if_addr_packed = socket.inet_pton(socket.AF_INET6, if_addr)
         if_index = if_sockaddr[3]
         if 0 == if_index:
             # Interface address did not include scope id.  Try to find it.
-            # NB: This probably only works on Linux.
-            if_hexstr = binascii.hexlify(if_addr_packed)
-            for if6 in file('/proc/net/if_inet6').readlines():
-                if if6.startswith(if_hexstr):
-                    if_index = int(if6.split()[1], 16)
-                    if_sockaddr = if_sockaddr[:3] + (if_index,)
-                    break
+            if_index = interface_index(socket.AF_INET6, if_addr) or 0
+            if_sockaddr = if_sockaddr[:3] + (if_index,)
         if_index_packed = struct.pack('I', if_index)
         dfd.setsockopt(socket.IPPROTO_IPV6, socket.IPV6_MULTICAST_IF, if_index_packed)
         mc_sockaddr = mc_sockaddr[:3] + (if_index,)
@@ -700,17 +1483,215 @@ def join_discovery (dfd, interface_address):
 
     return (if_sockaddr, mc_sockaddr)
 
-class EndPoint (object):
+class Peer (object):
+    """State maintained by an :class:`EndPoint` for a remote with
+    which it communicates.
+
+    - :attr:`.remote`
+
+    - :attr:`.timeout`
+    - :attr:`.nstart`
+    - :attr:`.in_flight`
+    - :attr:`.queue_depth`
+
+    Each peer has its own transaction ID space.  At most :attr:`nstart`
+    (by default the end-point's :attr:`EndPoint.nstart`) confirmable
+    messages to the peer may await acknowledgement at any time;
+    further confirmable messages wait in a first-in first-out queue.
+    """
+
+    def __init__ (self, remote):
+        """
+        :param remote: The normalized Python :mod:`socket` address of
+          the remote.
+        """
+        self.__remote = remote
+        self.__transactionId = random.randint(0, 65535)
+        self.__timeout = coapy.rtt.AdaptiveTimeout()
+        self.__inFlight = set()
+        self.__queue = collections.deque()
+
+    __remote = None
+    def _get_remote (self):
+        """The Python :mod:`socket` address of the remote."""
+        return self.__remote
+    remote = property(_get_remote)
+
+    __timeout = None
+    def _get_timeout (self):
+        """The :class:`coapy.rtt.AdaptiveTimeout` that determines how
+        long to wait for acknowledgements from the remote."""
+        return self.__timeout
+    timeout = property(_get_timeout)
+
+    __nstart = None
+    def _get_nstart (self):
+        """The number of confirmable messages to the remote that may
+        await acknowledgement at the same time, or ``None`` to use the
+        end-point's :attr:`EndPoint.nstart`.
+
+        A peer with a value set here is not discarded when idle.  A
+        larger value takes effect for held messages as outstanding
+        ones complete."""
+        return self.__nstart
+    def _set_nstart (self, nstart):
+        if (nstart is not None) and (1 > nstart):
+            raise ValueError(nstart)
+        self.__nstart = nstart
+    nstart = property(_get_nstart, _set_nstart)
+
+    __inFlight = None
+    def _get_in_flight (self):
+        """The number of confirmable messages to the remote that are
+        awaiting acknowledgement."""
+        return len(self.__inFlight)
+    in_flight = property(_get_in_flight)
+
+    __queue = None
+    def _get_queue_depth (self):
+        """The number of confirmable messages to the remote that are
+        waiting to be transmitted for the first time."""
+        return len(self.__queue)
+    queue_depth = property(_get_queue_depth)
+
+    def _startExchange (self, tx_record, now, nstart):
+        """Start or queue the exchange for *tx_record*.
+
+        :param nstart: The limit to apply if :attr:`nstart` is not set.
+        :return: ``True`` iff the record may be transmitted now."""
+        if self.__nstart is not None:
+            nstart = self.__nstart
+        if self.__queue or (len(self.__inFlight) >= nstart):
+            self.__queue.append((now, tx_record))
+            return False
+        self.__inFlight.add(tx_record)
+        return True
+
+    def _endExchange (self, tx_record):
+        """Record that *tx_record* no longer awaits acknowledgement.
+
+        :return: ``True`` iff the record was in flight."""
+        if tx_record in self.__inFlight:
+            self.__inFlight.remove(tx_record)
+            return True
+        return False
+
+    def _releaseQueued (self, nstart):
+        """Remove and return queued records for which there is now
+        room in flight, as a list of (*queue_time*, *tx_record*)
+        pairs.
+
+        :param nstart: The limit to apply if :attr:`nstart` is not set."""
+        if self.__nstart is not None:
+            nstart = self.__nstart
+        released = []
+        while self.__queue and (len(self.__inFlight) < nstart):
+            entry = self.__queue.popleft()
+            self.__inFlight.add(entry[1])
+            released.append(entry)
+        return released
+
+    __used = True
+    def _markUsed (self):
+        """Record that the end-point has consulted the peer."""
+        self.__used = True
+
+    def _isExpired (self):
+        """Return ``True`` iff the peer has nothing in flight or
+        queued and has not been used since the previous call.
+
+        :note: The call clears the record of use."""
+        used = self.__used
+        self.__used = False
+        return not (used or self.__inFlight or self.__queue or (self.__nstart is not None))
+
     __transactionId = None
+    def _nextTransactionId (self):
+        """Return the next transaction identifier in this peer's
+        sequence.
+
+        :note: The caller is responsible for ensuring the value is
+               not in use."""
+        transaction_id = self.__transactionId
+        self.__transactionId = 0xFFFF & (1 + self.__transactionId)
+        return transaction_id
+
+class _NullLock (object):
+    """A stand-in for :class:`threading.RLock` used by end-points
+    that are only accessed from one thread."""
+    def acquire (self):
+        pass
+    def release (self):
+        pass
+
+class EndPoint (object):
+    __peers = None
+
+    MAX_PEER_IDLE_SEC = 60
+    """The time, in seconds, after which a :class:`Peer` with nothing
+    in flight or queued, and that has not otherwise been used, may be
+    discarded.  Peers are examined at this interval, so an idle peer
+    is discarded after between one and two intervals."""
+
+    __nextPeerExpiry = 0
 
     __pendingTransmissions = None
+    __multicastTransmissions = None
+    __eventQueue = None
+    __expiryQueue = None
 
     MAX_TX_HISTORY_SEC = 10
 
+    MAX_RX_HISTORY_SEC = 32
+    """The time, in seconds, for which the end-point remembers a
+    received confirmable message and the response sent to it.  This
+    should cover the span over which the sender may retransmit the
+    message."""
+
+    MAX_RX_HISTORY = 4096
+    """The maximum number of received confirmable messages for which
+    the end-point remembers the response."""
+
+    __responseCache = None
+    __discoveryHistory = None
+    __statistics = None
+
+    BATCH_SIZE = 64
+    """The maximum number of datagrams transferred per system call
+    when batched I/O is enabled."""
+
+    __batchIO = False
+    __receivers = None
+    __poller = None
+    __writeInterest = False
+    __responseQueue = None
+    __transmitQueue = None
+    __lock = _NullLock()
+    __wakeupFds = None
+    __polling = False
+    __sender = None
+
+    RECEIVE_BUFFER_SIZE = 8192
+    """The size, in octets, of the buffers into which datagrams are
+    received.  Longer datagrams are truncated."""
+
+    DISCOVERY_LEISURE_SEC = 0
+    """The default :attr:`discovery_leisure`."""
+
+    __leisureQueue = None
+    __leisureResponses = None
+
+    __bufferPool = None
+
     def __init__ (self,
                   address_family=socket.AF_INET,
                   socket_type=socket.SOCK_DGRAM,
-                  socket_proto=socket.IPPROTO_UDP):
+                  socket_proto=socket.IPPROTO_UDP,
+                  batch_io=False,
+                  poller=None,
+                  lazy_options=False,
+                  zero_copy=False,
+                  nstart=None):
         """Create a CoAP endpoint.
 
         A socket is created in the specified address family.  The
@@ -724,15 +1705,112 @@ class EndPoint (object):
         :meth:`.bindDiscovery` should be invoked providing each
         network interface on which the endpoint should listen for
         discovery messages.  
+
+        :param batch_io: If ``True`` and the host supports it (see
+          :data:`coapy.mmsg.available`), datagrams are received and
+          transmitted up to :attr:`BATCH_SIZE` at a time using
+          :mod:`coapy.mmsg`.  Otherwise one system call is made per
+          datagram.
+
+        :param poller: The object used to wait for socket events, as
+          provided by :mod:`coapy.poller`.  By default the result of
+          :func:`coapy.poller.create_poller` is used.
+
+        :param lazy_options: The initial value of :attr:`lazy_options`.
+
+        :param zero_copy: The initial value of :attr:`zero_copy`.
+
+        :param nstart: The initial value of :attr:`nstart`.  By
+          default :data:`coapy.NSTART` is used.
         """
 
-        self.__transactionId = random.randint(0, 65535)
+        self.__lazyOptions = lazy_options
+        self.__zeroCopy = zero_copy
+        if nstart is None:
+            nstart = coapy.NSTART
+        self.nstart = nstart
+        self.__batchIO = batch_io and coapy.mmsg.available
+        self.__receivers = { }
+        self.__bufferPool = coapy.buffers.BufferPool(self.RECEIVE_BUFFER_SIZE)
+        self.__peers = { }
         self.__filenoMap = { }
-        self.__discoverySockets = set()
-        self.__poller = select.poll()
+        self.__discoveryInterfaces = set()
+        if poller is None:
+            poller = coapy.poller.create_poller()
+        self.__poller = poller
         self.__pendingTransmissions = { }
+        self.__multicastTransmissions = { }
+        self.__responseCache = coapy.cache.LRUCache(self.MAX_RX_HISTORY, self.MAX_RX_HISTORY_SEC)
+        self.__discoveryHistory = coapy.cache.LRUCache(self.MAX_RX_HISTORY, self.MAX_RX_HISTORY_SEC)
+        self.__statistics = { 'received' : 0,
+                              'malformed' : 0,
+                              'duplicates' : 0,
+                              'transmitted' : 0,
+                              'responses' : 0,
+                              'blocked' : 0,
+                              'send_errors' : 0,
+                              'queued' : 0,
+                              'released' : 0,
+                              'queue_depth' : 0,
+                              'max_queue_depth' : 0,
+                              'total_queue_wait' : 0.0,
+                              'max_queue_wait' : 0.0,
+                              'discovery_received' : 0,
+                              'discovery_filtered' : 0,
+                              'discovery_suppressed' : 0,
+                              'discovery_delayed' : 0,
+                              'discovery_responses' : 0 }
+        self.__eventQueue = coapy.scheduler.Scheduler()
+        self.__leisureQueue = coapy.scheduler.Scheduler()
+        self.__leisureResponses = { }
+        self.__expiryQueue = coapy.scheduler.Scheduler()
+        self.__responseQueue = collections.deque()
+        self.__transmitQueue = collections.deque()
         self.__socket = socket.socket(address_family, socket_type, socket_proto)
         self.register(self.__socket)
+        if self.__batchIO:
+            self.__sender = coapy.mmsg.BatchSender(self.__socket, self.BATCH_SIZE)
+
+    __lazyOptions = False
+    def _get_lazy_options (self):
+        """``True`` iff received messages are decoded with *lazy*
+        set (see :meth:`Message.decode`), so option instances are only
+        created for the options the application examines."""
+        return self.__lazyOptions
+    def _set_lazy_options (self, lazy_options):
+        self.__lazyOptions = lazy_options
+    lazy_options = property(_get_lazy_options, _set_lazy_options)
+
+    __zeroCopy = False
+    def _get_zero_copy (self):
+        """``True`` iff received messages are handed to the
+        application still referring to the pooled buffer they were
+        received into.
+
+        The application must then call :meth:`ReceptionRecord.release`
+        on each record it receives, or the buffer is not reused.  By
+        default the payload (and any undecoded options) are copied out
+        and the buffer is returned to the pool before :meth:`process`
+        returns the record."""
+        return self.__zeroCopy
+    def _set_zero_copy (self, zero_copy):
+        self.__zeroCopy = zero_copy
+    zero_copy = property(_get_zero_copy, _set_zero_copy)
+
+    __nstart = None
+    def _get_nstart (self):
+        """The number of confirmable messages to a single unicast
+        remote that may await acknowledgement at the same time.
+
+        Further messages to the remote are held until an outstanding
+        one completes.  The limit may be overridden for a particular
+        remote through :attr:`Peer.nstart`."""
+        return self.__nstart
+    def _set_nstart (self, nstart):
+        if 1 > nstart:
+            raise ValueError(nstart)
+        self.__nstart = nstart
+    nstart = property(_get_nstart, _set_nstart)
 
     __address = None
     def bind (self, address):
@@ -748,6 +1826,23 @@ class EndPoint (object):
         return self.__address
     address = property(_get_address)
 
+    __discoveryLeisure = None
+    def _get_discovery_leisure (self):
+        """The time, in seconds, over which responses to discovery
+        messages are spread.
+
+        Each response is delayed by a time chosen uniformly at random
+        from this interval.  ``0`` responds immediately.  The value
+        defaults to :attr:`DISCOVERY_LEISURE_SEC`."""
+        if self.__discoveryLeisure is None:
+            return self.DISCOVERY_LEISURE_SEC
+        return self.__discoveryLeisure
+    def _set_discovery_leisure (self, leisure):
+        if 0 > leisure:
+            raise ValueError(leisure)
+        self.__discoveryLeisure = leisure
+    discovery_leisure = property(_get_discovery_leisure, _set_discovery_leisure)
+
     def bindDiscovery (self, interface_address):
         """Listen for CoAP discovery messages on the specified interface.
 
@@ -755,18 +1850,29 @@ class EndPoint (object):
         specified interface and accepting CoAP messages sent to the
         all-hosts multicast group on the default CoAP port.  If the
         standard endpoint socket meets those requirements, it is used;
-        otherwise a new socket is created.  In the latter case, if a
-        message is received on that socket a :attr:`Message.RST`
-        message is transmitted to the sender from the end-point
+        otherwise a discovery socket is created.  In the latter case, if a
+        :attr:`Message.CON` message is received on that socket a
+        :attr:`Message.RST` message is transmitted to the sender from the end-point
         socket, allowing the sender to locate the supported end-point.
 
+        One discovery socket serves every interface passed to this
+        method.  Where :data:`coapy.mmsg.pktinfo_available`, the
+        interface on which each message arrives and the address to
+        which it was sent are reported by the kernel, and messages
+        from other interfaces or not sent to the all-hosts group are
+        discarded.  The latter matters for IPv6, where the socket is
+        bound to the unspecified address.
+
+        A discovery message that arrives on more than one interface
+        is answered once.  If :attr:`discovery_leisure` is non-zero
+        the response is delayed by a random part of it, so that
+        responses from many end-points do not arrive at the
+        requester all at once.
+
         :todo: Something sensible if the end-point socket is bound to
           a specific interface which is not the same as
           *interface_address*.
 
-        :todo: Something to avoid multiple responses if we're listing
-          on different interfaces.
-
         :param interface_address: The host name or IP address string
           identifying a network interface on this host on which
           service discovery multicast messages should be received.
@@ -774,25 +1880,55 @@ class EndPoint (object):
 
         # If the endpoint's socket uses the standard port, we can just
         # join it to the multicast address.  If it listens on a
-        # different port, we need to create a new socket that listens
-        # on the standard port and join it.
+        # different port, we need a socket that listens on the
+        # standard port, created the first time through, and join
+        # that.
 
         ep_sockaddr = self.__socket.getsockname()
-        do_bind = (ep_sockaddr[1] != coapy.COAP_PORT)
-        if do_bind:
+        if ep_sockaddr[1] == coapy.COAP_PORT:
+            print 'Discovery on endpoint socket %s' % (self.__socket,)
+            join_discovery(self.__socket, interface_address)
+            return
+
+        dfd = self.__discoverySocket
+        if dfd is None:
             dfd = socket.socket(self.__socket.family, self.__socket.type, self.__socket.proto)
             dfd.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
             print 'Discovery on new socket %s' % (dfd,)
-        else:
-            dfd = self.__socket
-            print 'Discovery on endpoint socket %s' % (dfd,)
-
         (if_sockaddr, mc_sockaddr) = join_discovery(dfd, interface_address)
-        if do_bind:
-            dfd.bind(mc_sockaddr)
-            self.__discoverySockets.add(dfd)
+        if self.__discoverySocket is None:
+            if 4 == len(mc_sockaddr):
+                # Binding to a link-local group would restrict the
+                # socket to the interface in the scope id.
+                dfd.bind(('::', coapy.COAP_PORT, 0, 0))
+            else:
+                dfd.bind(mc_sockaddr)
+            if coapy.mmsg.pktinfo_available:
+                self.__discoveryReceiver = coapy.mmsg.PacketInfoReceiver(dfd, self.RECEIVE_BUFFER_SIZE)
+            self.__discoveryGroup = mc_sockaddr[0]
+            self.__discoverySocket = dfd
             self.register(dfd)
 
+        if 4 == len(if_sockaddr):
+            if_index = if_sockaddr[3]
+        else:
+            if_index = interface_index(dfd.family, if_sockaddr[0])
+        if (self.__discoveryInterfaces is not None) and if_index:
+            self.__discoveryInterfaces.add(if_index)
+        else:
+            # Without the index, arrivals cannot be filtered.
+            self.__discoveryInterfaces = None
+
+    __discoverySocket = None
+    __discoveryReceiver = None
+    __discoveryInterfaces = None
+    __discoveryGroup = None
+    def _get_discovery_socket (self):
+        """The socket created by :meth:`bindDiscovery` to receive
+        discovery messages, or ``None``."""
+        return self.__discoverySocket
+    discovery_socket = property(_get_discovery_socket)
+
     __socket = None
     def _get_socket (self):
         """Return a reference to the primary socket associated with the end-point.
@@ -814,17 +1950,121 @@ class EndPoint (object):
                received, any response will be transmitted from
                :attr:`socket`.
         """
+        if sfd.fileno() in self.__filenoMap:
+            return
         self.__filenoMap[sfd.fileno()] = sfd
         fcntl.fcntl(sfd, fcntl.F_SETFL, os.O_NONBLOCK | fcntl.fcntl(sfd, fcntl.F_GETFL))
-        self.__poller.register(sfd, select.POLLIN)
-
-    def _nextTransactionId (self):
-        """Reserve and return a new transaction identifier."""
-        transaction_id = self.__transactionId
-        self.__transactionId = 0xFFFF & (1 + self.__transactionId)
-        return transaction_id
-
-    def send (self, message, remote):
+        self.__poller.register(sfd, coapy.poller.READ)
+        if self.__batchIO and not (sfd.fileno() in self.__receivers):
+            self.__receivers[sfd.fileno()] = coapy.mmsg.BatchReceiver(sfd, self.BATCH_SIZE)
+
+    batch_io = property(lambda _s: _s.__batchIO, None, None, "``True`` iff the end-point uses batched I/O.")
+
+    def enableThreading (self):
+        """Allow the end-point to be used from threads other than the
+        one invoking :meth:`process`.
+
+        Once enabled, :meth:`send`, :meth:`request`, and the
+        :class:`ReceptionRecord` response methods may be invoked from
+        any thread while another thread is processing.  The end-point
+        state is protected by a lock that the processing thread
+        releases while it waits for network activity, and a wakeup
+        pipe ensures a wait in progress notices newly queued
+        messages.
+
+        Calling this more than once has no further effect."""
+        if self.__wakeupFds is not None:
+            return
+        (rfd, wfd) = os.pipe()
+        for fd in (rfd, wfd):
+            fcntl.fcntl(fd, fcntl.F_SETFL, os.O_NONBLOCK | fcntl.fcntl(fd, fcntl.F_GETFL))
+        self.__wakeupFds = (rfd, wfd)
+        self.__lock = threading.RLock()
+        self.__poller.register(rfd, coapy.poller.READ)
+
+    threading_enabled = property(lambda _s: _s.__wakeupFds is not None, None, None, "``True`` iff :meth:`enableThreading` has been invoked.")
+
+    __wakeupListener = None
+    def setWakeupListener (self, listener):
+        """Arrange for *listener* to be invoked with the end-point
+        when, outside of processing, a message is queued that may
+        change :attr:`next_deadline` or :attr:`wants_write`.
+
+        An external event loop driving the end-point (see
+        :meth:`on_timer`) uses this to re-examine it.  Pass ``None``
+        to remove the listener."""
+        self.__wakeupListener = listener
+
+    def _wakeup (self):
+        """Interrupt a wait for network activity in the processing
+        thread, so that it re-examines what is due.
+
+        The caller must hold the end-point lock."""
+        if self.__wakeupListener is not None:
+            self.__wakeupListener(self)
+        if self.__polling:
+            try:
+                os.write(self.__wakeupFds[1], '\0')
+            except OSError, e:
+                # A full pipe means a wakeup is already pending
+                if errno.EAGAIN != e.errno:
+                    raise
+
+    buffer_pool = property(lambda _s: _s.__bufferPool, None, None, "The :class:`coapy.buffers.BufferPool` supplying receive buffers.")
+
+    def _releaseBuffer (self, buffer):
+        """Return a receive buffer to the pool."""
+        self.__bufferPool.release(buffer)
+
+    def peer (self, remote):
+        """Return the :class:`Peer` for the given remote, creating it
+        if necessary.
+
+        Peers that stay idle are discarded (see
+        :attr:`MAX_PEER_IDLE_SEC`), so a later call may return a new
+        instance with fresh round-trip estimates.
+
+        :param remote: A Python :mod:`socket` address in the form
+          returned by :func:`normalize_address`.
+        """
+        peer = self.__peers.get(remote)
+        if peer is None:
+            peer = self.__peers[remote] = Peer(remote)
+        else:
+            peer._markUsed()
+        return peer
+
+    def _expirePeers (self, now):
+        """Discard peers that have been idle since the previous call,
+        and set the time of the next call."""
+        peers = self.__peers
+        for remote in [ _r for (_r, _p) in peers.iteritems() if _p._isExpired() ]:
+            del peers[remote]
+        self.__nextPeerExpiry = now + self.MAX_PEER_IDLE_SEC
+
+    def _nextTransactionId (self, remote):
+        """Reserve and return a new transaction identifier for a
+        transmission to *remote*.
+
+        Identifiers are allocated from a per-remote sequence, skipping
+        any that are still associated with a cached transmission.
+        Responses to multicast transmissions are matched by
+        transaction ID alone, from any remote, so identifiers held by
+        multicast transmissions are skipped for every remote.
+
+        :raises: :exc:`Exception` if all identifiers are in use
+        """
+        peer = self.peer(remote)
+        for _ in xrange(0x10000):
+            transaction_id = peer._nextTransactionId()
+            if (remote, transaction_id) in self.__pendingTransmissions:
+                continue
+            if transaction_id in self.__multicastTransmissions:
+                continue
+            return transaction_id
+        raise Exception('No transaction identifiers available for %s' % (remote,))
+
+    def send (self, message, remote, on_response=None, on_reset=None, on_timeout=None, on_expire=None):
         """Transmit a message to the remote.
 
         The message should have a code of either :attr:`Message.CON`
@@ -834,14 +2074,326 @@ class EndPoint (object):
         The :class:`TransmissionRecord` associated with the
         transmission is returned.
 
+        The remote is converted to the form returned by
+        :func:`normalize_address`, and that is what is recorded in the
+        transmission record.
+
+        The *on_response*, *on_reset*, *on_timeout*, and *on_expire*
+        parameters set the corresponding :class:`TransmissionRecord`
+        callbacks.
+
         :note: Invoking this does not actually transmit the message:
                it merely records it and queues it for transmission on
-               the next invocation of :meth:`.process`.
+               the next invocation of :meth:`.process`.  A confirmable
+               message to a unicast remote that already has
+               :attr:`nstart` messages awaiting acknowledgement is
+               held until one of those completes.
+        """
+        multicast = False
+        if isinstance(remote, tuple):
+            (remote, multicast) = classify_address(remote)
+        self.__lock.acquire()
+        try:
+            tx_record = TransmissionRecord(self, message, remote, multicast)
+            tx_record.on_response = on_response
+            tx_record.on_reset = on_reset
+            tx_record.on_timeout = on_timeout
+            tx_record.on_expire = on_expire
+            self.__pendingTransmissions[(tx_record.remote, tx_record.transaction_id)] = tx_record
+            if tx_record.is_multicast:
+                self.__multicastTransmissions[tx_record.transaction_id] = tx_record
+            if (Message.CON != message.transaction_type) or tx_record.is_multicast:
+                self.__eventQueue.schedule(tx_record.next_event_time, tx_record)
+                self._wakeup()
+            elif self.peer(tx_record.remote)._startExchange(tx_record, time.time(), self.__nstart):
+                self.__eventQueue.schedule(tx_record.next_event_time, tx_record)
+                self._wakeup()
+            else:
+                stats = self.__statistics
+                stats['queued'] += 1
+                stats['queue_depth'] += 1
+                if stats['queue_depth'] > stats['max_queue_depth']:
+                    stats['max_queue_depth'] = stats['queue_depth']
+            return tx_record
+        finally:
+            self.__lock.release()
+
+    def request (self, message, remote):
+        """Transmit a confirmable message to the remote, and return a
+        :class:`Future` for its response.
+
+        The future completes as a side effect of :meth:`process`; see
+        :meth:`wait`.  Any number of requests may be outstanding.
+
+        :param message: A :class:`Message` with transaction type
+          :attr:`Message.CON`.
+        :rtype: :class:`Future`
+        """
+        if Message.CON != message.transaction_type:
+            raise ValueError('Only confirmable messages have responses')
+        self.__lock.acquire()
+        try:
+            return self.send(message, remote)._attachFuture()
+        finally:
+            self.__lock.release()
+
+    def groupRequest (self, message, remote, window_ms=None, max_responses=None):
+        """Transmit a message to a multicast address, and return a
+        :class:`GroupRequest` that collects the responses.
+
+        The message is transmitted once.  Iterating over the result
+        processes network activity on this end-point until
+        *window_ms* elapses or *max_responses* remotes have
+        answered, yielding the first response from each remote as it
+        is received.
+
+        :param message: The :class:`Message` to transmit.
+        :param remote: A multicast socket address.
+        :param window_ms: The time, in milliseconds, for which
+          responses are collected.  ``None`` selects
+          :attr:`MAX_TX_HISTORY_SEC`, which is also the longest
+          window permitted, since the transmission record expires
+          after that time.
+        :param max_responses: The maximum number of responses
+          collected; see :attr:`GroupRequest.MAX_RESPONSES`.
+        :rtype: :class:`GroupRequest`
+        """
+        if not is_multicast(remote):
+            raise ValueError('Group requests require a multicast address')
+        max_window_ms = 1000 * self.MAX_TX_HISTORY_SEC
+        if window_ms is None:
+            window_ms = max_window_ms
+        elif window_ms > max_window_ms:
+            raise ValueError('Group request window exceeds MAX_TX_HISTORY_SEC')
+        self.__lock.acquire()
+        try:
+            return GroupRequest(self.send(message, remote), window_ms, max_responses)
+        finally:
+            self.__lock.release()
+
+    def _endGroupRequest (self, tx_record):
+        """Remove the transmission record of a closed
+        :class:`GroupRequest`, so late responses are not matched to
+        it."""
+        self.__lock.acquire()
+        try:
+            self._removeTransmission(tx_record)
+        finally:
+            self.__lock.release()
+
+    def wait (self, futures, timeout_ms=None):
+        """Process network activity until all the given futures have
+        completed.
+
+        Received messages that do not complete one of the futures are
+        returned so that the application may respond to them.
+
+        :param futures: An iterable of :class:`Future` instances.
+        :param timeout_ms: The maximum time, in milliseconds, that
+           this method should block.  ``None`` indicates no limit.
+        :return: A list of :class:`ReceptionRecord` instances.
+        """
+        futures = set(futures)
+        end_time = None
+        if timeout_ms is not None:
+            end_time = time.time() + timeout_ms / 1000.0
+        unrelated = []
+        while True:
+            futures = set([ _f for _f in futures if not _f.done() ])
+            if not futures:
+                break
+            remaining_ms = None
+            if end_time is not None:
+                remaining_ms = 1000 * (end_time - time.time())
+                if 0 >= remaining_ms:
+                    break
+            rx_record = self.process(remaining_ms)
+            if rx_record is None:
+                continue
+            tx_record = rx_record.pertains_to
+            if (tx_record is None) or not (tx_record.future in futures):
+                unrelated.append(rx_record)
+        return unrelated
+
+    def _get_statistics (self):
+        """A dictionary of counters describing end-point activity.
+
+        - ``received``: datagrams received
+        - ``malformed``: received datagrams discarded because they
+          could not be decoded
+        - ``duplicates``: received confirmable messages discarded as
+          retransmissions of ones already received
+        - ``transmitted``: message transmissions, including
+          retransmissions, of messages given to :meth:`send`
+        - ``responses``: responses sent to received messages; these
+          are not included in ``transmitted``
+        - ``blocked``: attempts to transmit that found the socket send
+          buffer full; the packet remains queued
+        - ``send_errors``: packets discarded because the socket
+          reported an error on transmission
+        - ``queued``: confirmable messages held because their remote
+          had :attr:`nstart` messages awaiting acknowledgement
+        - ``released``: held messages subsequently released for
+          transmission
+        - ``queue_depth``: messages currently held
+        - ``max_queue_depth``: the largest value of ``queue_depth``
+        - ``total_queue_wait``: the total time, in seconds, released
+          messages were held
+        - ``max_queue_wait``: the longest time, in seconds, a released
+          message was held
+        - ``discovery_received``: messages received on discovery
+          sockets
+        - ``discovery_filtered``: messages discarded by the discovery
+          socket because they arrived on an interface not passed to
+          :meth:`bindDiscovery` or were not sent to the discovery
+          multicast group
+        - ``discovery_suppressed``: discovery messages not answered
+          because the same message had already been received,
+          possibly through another interface, or because too many
+          responses were awaiting their :attr:`discovery_leisure`
+        - ``discovery_delayed``: discovery responses held for a
+          random part of the :attr:`discovery_leisure`
+        - ``discovery_responses``: discovery responses transmitted
+
+        Comparing ``discovery_responses`` across the nodes answering a
+        discovery with the number of responses the requester
+        collected measures the loss the requester sees.
+
+        The returned dictionary is a copy."""
+        return self.__statistics.copy()
+    statistics = property(_get_statistics)
+
+    def _endExchange (self, tx_record, now=None):
+        """Invoked when a confirmable transmission is no longer
+        awaiting acknowledgement, to release any messages held for
+        the remote."""
+        if tx_record.is_multicast:
+            return
+        peer = self.peer(tx_record.remote)
+        if not peer._endExchange(tx_record):
+            return
+        if now is None:
+            now = time.time()
+        stats = self.__statistics
+        for (queue_time, queued_record) in peer._releaseQueued(self.__nstart):
+            wait = now - queue_time
+            stats['released'] += 1
+            stats['queue_depth'] -= 1
+            stats['total_queue_wait'] += wait
+            if wait > stats['max_queue_wait']:
+                stats['max_queue_wait'] = wait
+            self.__eventQueue.schedule(now, queued_record)
+
+    def _scheduleEvent (self, tx_record):
+        """Queue the record for its next event.
+
+        If the record has no further events, it is instead queued to
+        be removed from the cache :attr:`MAX_TX_HISTORY_SEC` seconds
+        after its last event."""
+        event_time = tx_record.next_event_time
+        if event_time is None:
+            self.__eventQueue.cancel(tx_record)
+            self.__expiryQueue.schedule(tx_record.last_event_time + self.MAX_TX_HISTORY_SEC, tx_record)
+        else:
+            self.__expiryQueue.cancel(tx_record)
+            self.__eventQueue.schedule(event_time, tx_record)
+
+    def _get_response_cache (self):
+        """The :class:`coapy.cache.LRUCache` used to detect
+        retransmitted confirmable messages.
+
+        Entries are keyed by (*remote*, *transaction_id*).  The value
+        is the packed response sent to the message, or ``None`` if the
+        application has not yet responded.  The cache
+        :attr:`hits<coapy.cache.LRUCache.hits>` count the duplicate
+        messages suppressed."""
+        return self.__responseCache
+    response_cache = property(_get_response_cache)
+
+    def _isDuplicate (self, packed, remote):
+        """Check whether a received packet retransmits a confirmable
+        message that has already been received.
+
+        Only the message header is examined.  If the message is a
+        duplicate and a response has been sent to the original, the
+        response is sent again.  A new
+        confirmable message is recorded so its retransmissions can be
+        recognized.
+
+        :return: ``True`` iff the packet should be discarded.
         """
-        tx_record = TransmissionRecord(self, message, remote)
-        self.__pendingTransmissions[tx_record.transaction_id] = tx_record
+        if (4 > len(packed)) or (Message.CON != (0x03 & (ord(packed[0]) >> 4))):
+            return False
+        (transaction_id,) = struct.unpack_from('!H', packed, 2)
+        key = (remote, transaction_id)
+        response = self.__responseCache.get(key, self)
+        if response is self:
+            self.__responseCache.put(key, None)
+            return False
+        if response is not None:
+            self._queueResponse(response, remote)
+        return True
+
+    def _isDiscoveryDuplicate (self, packed, remote):
+        """Check whether a packet received on the discovery socket has
+        already been received, possibly through another interface.
+
+        Messages of every transaction type are recorded by remote and
+        transaction ID, so a non-confirmable discovery message is
+        answered only once.
+
+        :return: ``True`` iff the packet should be discarded.
+        """
+        if 4 > len(packed):
+            return False
+        (transaction_id,) = struct.unpack_from('!H', packed, 2)
+        key = (remote, transaction_id)
+        if key in self.__discoveryHistory:
+            return True
+        self.__discoveryHistory.put(key, None)
+        return False
+
+    def _sendResponse (self, rx_record, packed):
+        """Transmit the packed response to a received message."""
+        self.__lock.acquire()
+        try:
+            self._recordResponse(rx_record, packed)
+            self._queueResponse(packed, rx_record.remote)
+        finally:
+            self.__lock.release()
+
+    def _recordResponse (self, rx_record, packed):
+        """Remember the packed response to a received message, so it
+        can be retransmitted if the message is received again."""
+        self.__statistics['responses'] += 1
+        key = (rx_record.remote, rx_record.transaction_id)
+        if key in self.__responseCache:
+            self.__responseCache.put(key, packed)
+
+    def _findTransmission (self, rx_record):
+        """Return the cached :class:`TransmissionRecord` to which
+        *rx_record* is a response, or ``None``.
+
+        A response must come from the remote to which the message was
+        sent and carry its transaction ID, except that responses to
+        multicast transmissions may come from any remote."""
+        tx_record = self.__pendingTransmissions.get((rx_record.remote, rx_record.transaction_id))
+        if tx_record is None:
+            tx_record = self.__multicastTransmissions.get(rx_record.transaction_id)
         return tx_record
 
+    def _recordRoundTrip (self, tx_record, now=None):
+        """Update the remote's timeout estimate from the first
+        response to a transmission.
+
+        Multicast transmissions are ignored, as their responses do not
+        come from the address to which the message was sent."""
+        if tx_record.is_multicast or (tx_record.response is not None) or (tx_record.transmission_time is None):
+            return
+        if now is None:
+            now = time.time()
+        self.peer(tx_record.remote).timeout.update(now - tx_record.transmission_time, tx_record.transmission_count)
+
     def _markAsUnacknowledged (self, tx_record):
         """Invoked by the end-point when the last transmission for a
         message has gone unacknowledged.
@@ -849,6 +2401,12 @@ class EndPoint (object):
         Sub-classes may post-extend this to provide asynchronous
         notification of such an event."""
         tx_record._clear_next_event_time()
+        if tx_record.is_unacknowledged:
+            future = tx_record.future
+            if future is not None:
+                future._complete(exception=ResponseTimeout(tx_record))
+            if tx_record.on_timeout is not None:
+                tx_record.on_timeout(tx_record)
         return tx_record
 
     def _removeTransmission (self, tx_record):
@@ -857,7 +2415,16 @@ class EndPoint (object):
 
         Sub-classes may post-extend this to provide asynchronous
         notification of such an event."""
-        del self.__pendingTransmissions[tx_record.transaction_id]
+        key = (tx_record.remote, tx_record.transaction_id)
+        if self.__pendingTransmissions.get(key) is not tx_record:
+            return tx_record
+        del self.__pendingTransmissions[key]
+        if self.__multicastTransmissions.get(tx_record.transaction_id) is tx_record:
+            del self.__multicastTransmissions[tx_record.transaction_id]
+        self.__eventQueue.cancel(tx_record)
+        self.__expiryQueue.cancel(tx_record)
+        if tx_record.on_expire is not None:
+            tx_record.on_expire(tx_record)
         return tx_record
 
     def process (self, timeout_ms):
@@ -873,6 +2440,10 @@ class EndPoint (object):
         possible, associated with the transmission record to which
         they pertain.  A :class:`ReceptionRecord` is returned.
 
+        A confirmable message that repeats one received within
+        :attr:`MAX_RX_HISTORY_SEC` is not returned; instead, whatever
+        response the application sent to the original is sent again.
+
         :note: The infrastructure does not automatically acknowledge
           any incoming message; this is an application responsibility.
 
@@ -882,14 +2453,48 @@ class EndPoint (object):
         :return: *rx_record* or ``None``
         :rtype: :class:`ReceptionRecord`
         """
+        rx_records = self.process_batch(timeout_ms, 1)
+        if rx_records:
+            return rx_records[0]
+        return None
+
+    def process_batch (self, timeout_ms, max_messages=None):
+        """Process network activity, returning all messages that can
+        be received without further blocking.
+
+        This behaves as :meth:`process`, except that when a socket is
+        readable, datagrams are read from it until none remain or
+        *max_messages* records have been built.  All the resulting
+        :class:`ReceptionRecord` instances are returned together, so
+        under load the cost of the scheduling pass and the
+        :meth:`poll<select.poll.poll>` system call is amortized over
+        many messages.
+
+        :param timeout_ms: The maximum time, in milliseconds, that
+           this method should block.  A value of ``None`` indicates no
+           limit: the method will block forever if no activity occurs.
+        :param max_messages: The maximum number of records to return,
+           or ``None`` for no limit.
+        :return: A list of :class:`ReceptionRecord`, empty if the
+           timeout was reached without receiving a message.
+        """
+        self.__lock.acquire()
+        try:
+            return self._processBatch(timeout_ms, max_messages)
+        finally:
+            self.__lock.release()
+
+    def _processBatch (self, timeout_ms, max_messages):
+        """The body of :meth:`process_batch`, invoked with the
+        end-point lock held."""
 
         start_time = time.time()
         end_time = None
         if timeout_ms is not None:
             end_time = start_time + timeout_ms / 1000.0
-        rx_record = None
+        rx_records = []
         did_pass = False
-        while rx_record is None:
+        while not rx_records:
             now = time.time()
 
             # If we've been through at least once, and we're supposed
@@ -900,70 +2505,452 @@ class EndPoint (object):
                 if 0 >= end_in_ms:
                     break
 
-            # Figure out which records are outdated, which are due to
-            # be retransmitted, and when we need to wake up to do the
-            # next retransmission.
-            next_event_time = None
-            transmit_due = set()
-            expire_set = set()
-            for tx_record in self.__pendingTransmissions.itervalues():
-                event_time = tx_record.next_event_time
-                if (event_time is not None) and (event_time <= now):
-                    if 0 < tx_record.transmissions_left:
-                        transmit_due.add(tx_record)
-                    else:
-                        self._markAsUnacknowledged(tx_record)
-                        event_time = tx_record.next_event_time
-                if event_time is None:
-                    if now > (tx_record.last_event_time + self.MAX_TX_HISTORY_SEC):
-                        expire_set.add(tx_record)
+            self._runTimers(now)
+            self._updateWriteInterest()
+            next_event_time = self._nextDeadline()
+            if (end_time is not None) and ((next_event_time is None) or (end_time < next_event_time)):
+                next_event_time = end_time
+            poll_timeout_ms = None
+            if next_event_time is not None:
+                if next_event_time <= now:
+                    poll_timeout_ms = 0
                 else:
-                    if (next_event_time is None) or (event_time < next_event_time):
-                        next_event_time = event_time
-
-            # Flush the cache
-            for tx_record in expire_set:
-                self._removeTransmission(tx_record)
-
-            evt = select.POLLIN
-            if transmit_due:
-                evt += select.POLLOUT
-                poll_timeout_ms = 0
-            else:
-                if (end_time is not None) and ((next_event_time is None) or (end_time < next_event_time)):
-                    next_event_time = end_time
-                poll_timeout_ms = None
-                if next_event_time is not None:
-                    if next_event_time <= now:
-                        poll_timeout_ms = 0
-                    else:
-                        poll_timeout_ms = (next_event_time - now) * 1000
-            self.__poller.register(self.__socket, evt)
-
-            for (sfd, evt) in self.__poller.poll(poll_timeout_ms):
-                sock = self.__filenoMap.get(sfd)
-                if evt & select.POLLOUT:
-                    assert sock == self.__socket
-                    try:
-                        while transmit_due:
-                            tx_record = transmit_due.pop()
-                            self.__socket.sendto(tx_record.packed, tx_record.remote)
-                            tx_record._decrementTransmissions()
-                    except Exception, e:
-                        # On EAGAIN, just stop for now (filled output buffer).
-                        # On EINTR, could resume now or retry on another loop.
-                        # Others are errors.  Need test harness.
-                        print 'EndPoint sendto failed: %s' % (e,)
-                        raise
-                if evt & select.POLLIN:
-                    (msg, remote) = sock.recvfrom(8192)
-                    rx_record = ReceptionRecord(self, msg, remote)
-                    if rx_record.message.transaction_type in (Message.ACK, Message.RST):
-                        tx_record = self.__pendingTransmissions.get(rx_record.transaction_id)
-                        if tx_record is not None:
-                            rx_record._set_pertains_to(tx_record)
-                    if sock in self.__discoverySockets:
-                        rx_record.reset()
-                        rx_record = None
+                    poll_timeout_ms = (next_event_time - now) * 1000
+
+            # Other threads may use the end-point while we wait.
+            self.__polling = True
+            self.__lock.release()
+            try:
+                events = self.__poller.poll(poll_timeout_ms)
+            finally:
+                self.__lock.acquire()
+                self.__polling = False
+
+            for (sfd, evt) in events:
+                self._handleEvent(sfd, evt, rx_records, max_messages)
             did_pass = True
+        return rx_records
+
+    def fileno (self):
+        """Return the descriptor of the end-point socket.
+
+        This allows the end-point to be passed directly to
+        :func:`select.select`; use :meth:`filenos` to include any
+        other sockets registered with the end-point."""
+        return self.__socket.fileno()
+
+    def filenos (self):
+        """Return the descriptors that an external event loop must
+        watch for readability on behalf of the end-point.
+
+        These are the registered sockets and, if threading is enabled,
+        the wakeup pipe.  Each should be passed to :meth:`on_readable`
+        when readable."""
+        fds = self.__filenoMap.keys()
+        if self.__wakeupFds is not None:
+            fds.append(self.__wakeupFds[0])
+        return fds
+
+    def _get_wants_write (self):
+        """``True`` iff packets are waiting to be sent, in which case
+        an external event loop should call :meth:`on_writable` when
+        :meth:`fileno` is writable."""
+        return bool(self.__transmitQueue or self.__responseQueue)
+    wants_write = property(_get_wants_write)
+
+    def _get_next_deadline (self):
+        """The :meth:`time.time` at which :meth:`on_timer` should next
+        be called, or ``None`` if no timer is pending.
+
+        The value changes as the end-point processes activity; it
+        should be examined after each call to :meth:`on_readable`,
+        :meth:`on_writable`, or :meth:`on_timer`, and when the
+        listener set by :meth:`setWakeupListener` is invoked."""
+        return self._nextDeadline()
+    next_deadline = property(_get_next_deadline)
+
+    def on_readable (self, fd=None, max_messages=None):
+        """Receive the datagrams waiting on a readable descriptor,
+        without blocking.
+
+        This is the entry point for an external event loop.
+
+        :param fd: A descriptor from :meth:`filenos`, or ``None`` to
+          read from all of them.
+        :param max_messages: The maximum number of records to return,
+          or ``None`` for no limit.
+        :return: A list of :class:`ReceptionRecord`, as from
+          :meth:`process_batch`.
+        """
+        rx_records = []
+        self.__lock.acquire()
+        try:
+            if fd is None:
+                fds = self.filenos()
+            else:
+                fds = (fd,)
+            for fd in fds:
+                self._handleEvent(fd, coapy.poller.READ, rx_records, max_messages)
+        finally:
+            self.__lock.release()
+        return rx_records
+
+    def on_writable (self):
+        """Send queued packets until the socket would block.
+
+        This is the entry point for an external event loop.
+
+        :return: ``True`` iff nothing remains to be sent."""
+        self.__lock.acquire()
+        try:
+            return self._flush()
+        finally:
+            self.__lock.release()
+
+    def on_timer (self, now=None):
+        """Process the retransmissions, timeouts, and expirations due
+        at *now*.
+
+        This is the entry point for an external event loop, to be
+        invoked when :attr:`next_deadline` is reached.  Messages due
+        for transmission are queued, so :attr:`wants_write` should be
+        examined afterwards.
+
+        :param now: The current :meth:`time.time`, if known."""
+        if now is None:
+            now = time.time()
+        self.__lock.acquire()
+        try:
+            self._runTimers(now)
+        finally:
+            self.__lock.release()
+
+    def _runTimers (self, now):
+        """Process the transmission events due at *now*.
+
+        Records that are due to be retransmitted are moved to the
+        outbound queue, and those that have timed out are marked
+        unacknowledged.  Records whose history has expired are
+        removed.  Discovery responses whose leisure has elapsed are
+        queued.  Only records with events due are examined, except
+        that idle peers are discarded every :attr:`MAX_PEER_IDLE_SEC`."""
+        transmit_queue = self.__transmitQueue
+        for tx_record in self.__eventQueue.popDue(now):
+            if 0 < tx_record.transmissions_left:
+                transmit_queue.append(tx_record)
+            else:
+                self._markAsUnacknowledged(tx_record)
+                self._scheduleEvent(tx_record)
+                self._endExchange(tx_record, now)
+        for tx_record in self.__expiryQueue.popDue(now):
+            self._removeTransmission(tx_record)
+        self._sendLeisureResponses(now)
+        if now >= self.__nextPeerExpiry:
+            self._expirePeers(now)
+
+    def _nextDeadline (self):
+        """Return the :meth:`time.time` at which :meth:`_runTimers`
+        next has work to do, or ``None``."""
+        next_time = None
+        for queue in (self.__eventQueue, self.__expiryQueue, self.__leisureQueue):
+            queue_time = queue.nextTime()
+            if (next_time is None) or ((queue_time is not None) and (queue_time < next_time)):
+                next_time = queue_time
+        return next_time
+
+    def _updateWriteInterest (self):
+        """Register interest in the socket becoming writable iff
+        there is something in the outbound queue.
+
+        The socket is registered once; its write interest changes
+        only when the outbound queue becomes non-empty or is
+        drained."""
+        if bool(self.__transmitQueue or self.__responseQueue) != self.__writeInterest:
+            self.__writeInterest = not self.__writeInterest
+            events = coapy.poller.READ
+            if self.__writeInterest:
+                events |= coapy.poller.WRITE
+            self.__poller.modify(self.__socket, events)
+
+    def _handleEvent (self, fd, events, rx_records, max_messages=None):
+        """Act on readiness of one of the end-point's descriptors.
+
+        Queued packets are sent if the end-point socket is writable.
+        Datagrams received on a readable socket are appended to
+        *rx_records* as for :meth:`_receive`."""
+        sock = self.__filenoMap.get(fd)
+        if sock is None:
+            if (self.__wakeupFds is not None) and (fd == self.__wakeupFds[0]):
+                self._drainWakeup()
+            return
+        if events & coapy.poller.WRITE:
+            assert sock == self.__socket
+            self._flush()
+        if (events & coapy.poller.READ) and ((max_messages is None) or (len(rx_records) < max_messages)):
+            self._receive(sock, rx_records, max_messages)
+
+    def _drainWakeup (self):
+        """Discard the content of the wakeup pipe."""
+        try:
+            while os.read(self.__wakeupFds[0], 512):
+                pass
+        except OSError, e:
+            if errno.EAGAIN != e.errno:
+                raise
+
+    def _sendPacket (self, packed, remote, counter=None):
+        """Transmit a packet from the end-point socket.
+
+        Errors other than a full send buffer are counted in
+        :attr:`statistics` and otherwise treated as loss of the
+        packet.
+
+        :param counter: The :attr:`statistics` counter to increment if
+          the packet is sent, if any.
+
+        :return: ``False`` if the socket would block, ``True`` if the
+          packet was sent or discarded."""
+        while True:
+            try:
+                self.__socket.sendto(packed, remote)
+                if counter is not None:
+                    self.__statistics[counter] += 1
+                return True
+            except socket.error, e:
+                if errno.EINTR == e.errno:
+                    continue
+                if e.errno in (errno.EAGAIN, errno.EWOULDBLOCK):
+                    self.__statistics['blocked'] += 1
+                    return False
+                self.__statistics['send_errors'] += 1
+                return True
+
+    def _sendBatch (self, packets, counter=None):
+        """Transmit packets with the batch sender.
+
+        :param counter: As for :meth:`_sendPacket`.
+
+        :return: The number of leading packets sent or discarded."""
+        try:
+            sent = self.__sender.send(packets)
+        except socket.error, e:
+            self.__statistics['send_errors'] += 1
+            return 1
+        if counter is not None:
+            self.__statistics[counter] += sent
+        if sent < len(packets):
+            self.__statistics['blocked'] += 1
+        return sent
+
+    def _flush (self):
+        """Transmit queued packets until the outbound queue is empty or
+        the socket would block.
+
+        Responses are sent before (re-)transmissions.  Records in the
+        transmission queue that have been answered since they became
+        due are skipped.
+
+        :return: ``True`` iff the outbound queue is empty."""
+        responses = self.__responseQueue
+        transmissions = self.__transmitQueue
+        sender = self.__sender
+        while responses:
+            if sender is not None:
+                batch = list(itertools.islice(responses, sender.batch_size))
+                sent = self._sendBatch(batch)
+                for i in xrange(sent):
+                    responses.popleft()
+                if sent < len(batch):
+                    return False
+            elif self._sendPacket(*responses[0]):
+                responses.popleft()
+            else:
+                return False
+        while transmissions:
+            if 0 >= transmissions[0].transmissions_left:
+                transmissions.popleft()
+                continue
+            if sender is not None:
+                batch = [ _r for _r in itertools.islice(transmissions, sender.batch_size) if 0 < _r.transmissions_left ]
+                sent = self._sendBatch([ (_r.packed, _r.remote) for _r in batch ], 'transmitted')
+                sent_records = set(batch[:sent])
+                while sent_records:
+                    tx_record = transmissions.popleft()
+                    if tx_record in sent_records:
+                        sent_records.remove(tx_record)
+                        tx_record._decrementTransmissions()
+                        self._scheduleEvent(tx_record)
+                if sent < len(batch):
+                    return False
+            else:
+                tx_record = transmissions[0]
+                if not self._sendPacket(tx_record.packed, tx_record.remote, 'transmitted'):
+                    return False
+                transmissions.popleft()
+                tx_record._decrementTransmissions()
+                self._scheduleEvent(tx_record)
+        return True
+
+    def _queueResponse (self, packed, remote):
+        """Queue a response for transmission ahead of any other
+        outbound packet, and send it now if nothing else is waiting."""
+        self.__responseQueue.append((packed, remote))
+        if 1 == len(self.__responseQueue):
+            self._flush()
+        if self.__responseQueue:
+            self._wakeup()
+
+    def _get_outbound_depth (self):
+        """The number of packets waiting in the outbound queue for the
+        socket to become writable."""
+        return len(self.__responseQueue) + len(self.__transmitQueue)
+    outbound_depth = property(_get_outbound_depth)
+
+    def _receive (self, sock, rx_records, max_messages=None):
+        """Read datagrams from a readable socket until it would block
+        or *rx_records* holds *max_messages* records.
+
+        Each datagram is converted to a :class:`ReceptionRecord` and
+        matched to the transmission to which it responds, if any.
+        Duplicates and messages received on discovery sockets are
+        handled here and not added to *rx_records*.
+        """
+        is_discovery = sock is self.__discoverySocket
+        if is_discovery and (self.__discoveryReceiver is not None):
+            self._receiveDiscovery()
+            return
+        receiver = self.__receivers.get(sock.fileno())
+        pool = self.__bufferPool
+        buffer = None
+        while (max_messages is None) or (len(rx_records) < max_messages):
+            if receiver is not None:
+                limit = None
+                if max_messages is not None:
+                    limit = max_messages - len(rx_records)
+                datagrams = receiver.receive(limit)
+                if not datagrams:
+                    break
+            else:
+                buffer = pool.acquire()
+                try:
+                    (length, remote) = sock.recvfrom_into(buffer)
+                except socket.error, e:
+                    pool.release(buffer)
+                    if e.errno in (errno.EAGAIN, errno.EWOULDBLOCK):
+                        break
+                    if errno.EINTR == e.errno:
+                        continue
+                    raise
+                datagrams = ((memoryview(buffer)[:length], remote),)
+            for (msg, remote) in datagrams:
+                rx_record = self._handleDatagram(msg, remote, is_discovery, buffer)
+                if rx_record is not None:
+                    rx_records.append(rx_record)
+
+    def _receiveDiscovery (self):
+        """Read up to :attr:`BATCH_SIZE` datagrams from the discovery
+        socket, discarding those that arrived on interfaces not passed
+        to :meth:`bindDiscovery` or that were not sent to the
+        discovery multicast group."""
+        receiver = self.__discoveryReceiver
+        interfaces = self.__discoveryInterfaces
+        group = self.__discoveryGroup
+        for _ in xrange(self.BATCH_SIZE):
+            datagram = receiver.receive()
+            if datagram is None:
+                break
+            (msg, remote, if_index, destination) = datagram
+            if (destination is not None) and (destination != group):
+                self.__statistics['discovery_filtered'] += 1
+                continue
+            if (interfaces is not None) and (if_index is not None) and (if_index not in interfaces):
+                self.__statistics['discovery_filtered'] += 1
+                continue
+            self._handleDatagram(msg, remote, True)
+
+    def _handleDatagram (self, msg, remote, is_discovery=False, buffer=None):
+        """Convert a received datagram to a :class:`ReceptionRecord`.
+
+        :param buffer: The pooled buffer holding *msg*, if any.  It is
+          released if the datagram is consumed, and otherwise becomes
+          owned by the returned record.
+        :return: The record, or ``None`` if the datagram was consumed
+          by the end-point."""
+        stats = self.__statistics
+        stats['received'] += 1
+        if is_discovery:
+            stats['discovery_received'] += 1
+            duplicate = self._isDiscoveryDuplicate(msg, remote)
+        else:
+            duplicate = self._isDuplicate(msg, remote)
+        if duplicate:
+            if is_discovery:
+                stats['discovery_suppressed'] += 1
+            else:
+                stats['duplicates'] += 1
+            if buffer is not None:
+                self.__bufferPool.release(buffer)
+            return None
+        try:
+            rx_record = ReceptionRecord(self, msg, remote, buffer)
+        except Exception:
+            # Message.decode reports an invalid header, option, or
+            # option value in several ways; whatever the reason, the
+            # datagram is discarded without disturbing the others.
+            stats['malformed'] += 1
+            if buffer is not None:
+                self.__bufferPool.release(buffer)
+            return None
+        tx_record = None
+        if rx_record.message.transaction_type in (Message.ACK, Message.RST):
+            tx_record = self._findTransmission(rx_record)
+            if tx_record is not None:
+                self._recordRoundTrip(tx_record)
+                rx_record._set_pertains_to(tx_record)
+                self._scheduleEvent(tx_record)
+                self._endExchange(tx_record)
+        if is_discovery:
+            self._respondToDiscovery(rx_record)
+            rx_record.release()
+        elif not self.__zeroCopy:
+            rx_record.release()
+        if tx_record is not None:
+            tx_record._notifyResponse(rx_record)
+        if is_discovery:
+            return None
         return rx_record
+
+    def _respondToDiscovery (self, rx_record):
+        """Reset a confirmable message received on a discovery
+        socket, so the sender learns the end-point address.
+
+        Other message types get no response.  If
+        :attr:`discovery_leisure` is non-zero the reset is held until
+        a randomly chosen time within it."""
+        if Message.CON != rx_record.message.transaction_type:
+            return
+        stats = self.__statistics
+        leisure = self.discovery_leisure
+        if 0 >= leisure:
+            stats['discovery_responses'] += 1
+            rx_record.reset()
+            return
+        if len(self.__leisureResponses) >= self.MAX_RX_HISTORY:
+            stats['discovery_suppressed'] += 1
+            return
+        key = (rx_record.remote, rx_record.transaction_id)
+        packed = Message(Message.RST)._pack(rx_record.transaction_id)
+        self.__leisureResponses[key] = packed
+        self.__leisureQueue.schedule(time.time() + random.uniform(0, leisure), key)
+        stats['discovery_delayed'] += 1
+
+    def _sendLeisureResponses (self, now):
+        """Transmit the held discovery responses that are due at
+        *now*."""
+        stats = self.__statistics
+        for key in self.__leisureQueue.popDue(now):
+            packed = self.__leisureResponses.pop(key)
+            (remote, _) = key
+            stats['responses'] += 1
+            stats['discovery_responses'] += 1
+            self._queueResponse(packed, remote)
@@ -37,13 +37,27 @@ RESPONSE_TIMEOUT = 1
 """The time, in seconds, to wait for an acknowledgement of a
 confirmable message.
 
-The inter-transmission time doubles for each retransmission."""
+The inter-transmission time doubles for each retransmission.
+
+This is the initial value; the timeout for each remote is adapted to
+the round-trip times measured to it (see :mod:`coapy.rtt`)."""
+
+RESPONSE_RANDOM_FACTOR = 1.5
+"""The upper bound of the random factor applied to the timeout for the
+first transmission of a confirmable message, so that messages sent at
+the same time are not retransmitted at the same time."""
 
 MAX_RETRANSMIT = 5
 """The number of retransmissions of confirmable messages to
 non-multicast endpoints before the infrastructure assumes no
 acknowledgement will be received."""
 
+NSTART = 1
+"""The default number of confirmable messages to a single unicast
+remote that may await acknowledgement at the same time.  Each
+:class:`coapy.connection.EndPoint` takes its own limit from this when
+it is created (see :attr:`coapy.connection.EndPoint.nstart`)."""
+
 codes = { 1: 'GET',
           2: 'POST',
           3: 'PUT',
@@ -0,0 +1,254 @@
+# Copyright (c) 2010 People Power Co.
+# All rights reserved.
+# 
+# This open source code was developed with funding from People Power Company
+# 
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+# - Redistributions of source code must retain the above copyright
+#   notice, this list of conditions and the following disclaimer.
+# - Redistributions in binary form must reproduce the above copyright
+#   notice, this list of conditions and the following disclaimer in the
+#   documentation and/or other materials provided with the
+#   distribution.
+# - Neither the name of the People Power Corporation nor the names of
+#   its contributors may be used to endorse or promote products derived
+#   from this software without specific prior written permission.
+# 
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# ``AS IS'' AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED.  IN NO EVENT SHALL THE
+# PEOPLE POWER CO. OR ITS CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT,
+# STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED
+# OF THE POSSIBILITY OF SUCH DAMAGE
+# 
+
+"""Run request handlers in a pool of threads.
+
+A handler that blocks inside the loop driving an
+:class:`coapy.connection.EndPoint` delays every other exchange on
+that end-point, including retransmissions.  A :class:`Dispatcher`
+receives messages in one thread and passes each
+:class:`coapy.connection.ReceptionRecord` to a handler invoked in one
+of a fixed number of worker threads.  Handlers may respond to the
+record and transmit new messages through the end-point while the
+loop continues.
+
+Handlers run in threads rather than processes because a record
+refers to the end-point and its socket, which cannot be shared with
+another process.  Work that is CPU-bound in Python is better spread
+with :mod:`coapy.prefork`.
+"""
+
+import Queue
+import threading
+import sys
+import time
+
+class Dispatcher (object):
+    """Receive messages on an end-point and handle them in worker threads.
+
+    The end-point is placed in threaded mode (see
+    :meth:`coapy.connection.EndPoint.enableThreading`).  At most
+    *max_queue* records wait for a worker; records arriving when the
+    queue is full are rejected, and a confirmable message that is
+    rejected is answered with a reset unless *drop_when_full* is set,
+    in which case it is ignored and the sender will retransmit it.
+
+    If a handler raises an exception and has not responded to the
+    record, a confirmable message is answered with a reset.  The
+    failure is counted in :attr:`statistics` and passed to *on_error*,
+    if one was provided.
+    """
+
+    __endPoint = None
+    __handler = None
+    __onError = None
+    __queue = None
+    __threads = None
+    __statistics = None
+    __statisticsLock = None
+
+    def __init__ (self, end_point, handler, workers=4, max_queue=1024, drop_when_full=False, on_error=None):
+        """
+        :param end_point: The :class:`coapy.connection.EndPoint` from
+          which messages are received.
+
+        :param handler: A callable invoked in a worker thread with
+          each received :class:`coapy.connection.ReceptionRecord`.
+
+        :param workers: The number of worker threads.
+
+        :param max_queue: The maximum number of records awaiting a
+          worker.
+
+        :param drop_when_full: If ``True``, rejected messages are
+          discarded without a response.
+
+        :param on_error: A callable invoked in the worker thread with
+          the :class:`coapy.connection.ReceptionRecord` and the
+          :func:`sys.exc_info` triple when *handler* raises an
+          exception.  Exceptions it raises are ignored.
+        """
+        if 0 >= workers:
+            raise ValueError(workers)
+        end_point.enableThreading()
+        self.__endPoint = end_point
+        self.__handler = handler
+        self.__onError = on_error
+        self.__dropWhenFull = drop_when_full
+        self.__queue = Queue.Queue(max_queue)
+        self.__statisticsLock = threading.Lock()
+        self.__statistics = { 'dispatched' : 0,
+                              'rejected' : 0,
+                              'handled' : 0,
+                              'errors' : 0,
+                              'max_queue_depth' : 0,
+                              'total_queue_wait' : 0.0,
+                              'max_queue_wait' : 0.0,
+                              'total_handler_time' : 0.0,
+                              'max_handler_time' : 0.0 }
+        self.__threads = []
+        for i in xrange(workers):
+            thread = threading.Thread(target=self._work, name='coapy-dispatch-%d' % (i,))
+            thread.daemon = True
+            thread.start()
+            self.__threads.append(thread)
+
+    end_point = property(lambda _s: _s.__endPoint, None, None, "The end-point from which messages are received.")
+
+    def _get_queue_depth (self):
+        """The number of records currently awaiting a worker."""
+        return self.__queue.qsize()
+    queue_depth = property(_get_queue_depth)
+
+    def _get_statistics (self):
+        """A dictionary of counters describing dispatcher activity.
+
+        - ``dispatched``: records passed to the queue
+        - ``rejected``: records refused because the queue was full
+        - ``handled``: records for which the handler has returned
+        - ``errors``: handler invocations that raised an exception
+        - ``queue_depth``: records currently awaiting a worker
+        - ``max_queue_depth``: the largest observed ``queue_depth``
+        - ``total_queue_wait``, ``max_queue_wait``: the time, in
+          seconds, handled records waited for a worker
+        - ``total_handler_time``, ``max_handler_time``: the time, in
+          seconds, spent in the handler
+
+        The returned dictionary is a copy."""
+        self.__statisticsLock.acquire()
+        try:
+            stats = self.__statistics.copy()
+        finally:
+            self.__statisticsLock.release()
+        stats['queue_depth'] = self.__queue.qsize()
+        return stats
+    statistics = property(_get_statistics)
+
+    def dispatch (self, rx_record):
+        """Queue a received record for a worker.
+
+        :return: ``True`` if the record was queued, ``False`` if it
+          was rejected."""
+        try:
+            self.__queue.put_nowait((time.time(), rx_record))
+        except Queue.Full:
+            self.__statisticsLock.acquire()
+            try:
+                self.__statistics['rejected'] += 1
+            finally:
+                self.__statisticsLock.release()
+            if not (self.__dropWhenFull or rx_record.has_responded):
+                rx_record.reset()
+            return False
+        depth = self.__queue.qsize()
+        self.__statisticsLock.acquire()
+        try:
+            stats = self.__statistics
+            stats['dispatched'] += 1
+            if depth > stats['max_queue_depth']:
+                stats['max_queue_depth'] = depth
+        finally:
+            self.__statisticsLock.release()
+        return True
+
+    def process (self, timeout_ms):
+        """Process end-point activity and dispatch each received
+        record.
+
+        :param timeout_ms: As for
+          :meth:`coapy.connection.EndPoint.process_batch`.
+        :return: The number of records received."""
+        rx_records = self.__endPoint.process_batch(timeout_ms)
+        for rx_record in rx_records:
+            self.dispatch(rx_record)
+        return len(rx_records)
+
+    def run (self):
+        """Dispatch received records until interrupted."""
+        while True:
+            self.process(None)
+
+    def join (self):
+        """Wait until every dispatched record has been handled."""
+        self.__queue.join()
+
+    def stop (self):
+        """Stop the worker threads once queued records have been
+        handled."""
+        for thread in self.__threads:
+            self.__queue.put(None)
+        for thread in self.__threads:
+            thread.join()
+        self.__threads = []
+
+    def _work (self):
+        queue = self.__queue
+        while True:
+            item = queue.get()
+            try:
+                if item is None:
+                    return
+                self._handle(*item)
+            finally:
+                queue.task_done()
+
+    def _handle (self, queue_time, rx_record):
+        start = time.time()
+        failed = False
+        try:
+            self.__handler(rx_record)
+        except Exception:
+            failed = True
+            if self.__onError is not None:
+                try:
+                    self.__onError(rx_record, sys.exc_info())
+                except Exception:
+                    pass
+            if not rx_record.has_responded:
+                rx_record.reset()
+        end = time.time()
+        wait = start - queue_time
+        elapsed = end - start
+        self.__statisticsLock.acquire()
+        try:
+            stats = self.__statistics
+            stats['handled'] += 1
+            if failed:
+                stats['errors'] += 1
+            stats['total_queue_wait'] += wait
+            if wait > stats['max_queue_wait']:
+                stats['max_queue_wait'] = wait
+            stats['total_handler_time'] += elapsed
+            if elapsed > stats['max_handler_time']:
+                stats['max_handler_time'] = elapsed
+        finally:
+            self.__statisticsLock.release()
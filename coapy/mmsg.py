@@ -0,0 +1,446 @@
+# Copyright (c) 2010 People Power Co.
+# All rights reserved.
+# 
+# This open source code was developed with funding from People Power Company
+# 
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+# - Redistributions of source code must retain the above copyright
+#   notice, this list of conditions and the following disclaimer.
+# - Redistributions in binary form must reproduce the above copyright
+#   notice, this list of conditions and the following disclaimer in the
+#   documentation and/or other materials provided with the
+#   distribution.
+# - Neither the name of the People Power Corporation nor the names of
+#   its contributors may be used to endorse or promote products derived
+#   from this software without specific prior written permission.
+# 
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# ``AS IS'' AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED.  IN NO EVENT SHALL THE
+# PEOPLE POWER CO. OR ITS CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT,
+# STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED
+# OF THE POSSIBILITY OF SUCH DAMAGE
+# 
+
+"""Batched datagram I/O using the Linux :manpage:`recvmmsg(2)` and
+:manpage:`sendmmsg(2)` system calls.
+
+These calls transfer many datagrams per system call, which matters at
+high packet rates.  They are accessed through :mod:`ctypes`; where
+they are not available, :data:`available` is ``False`` and callers
+should use the standard :mod:`socket` methods.
+
+The module also provides :class:`PacketInfoReceiver`, which uses
+:manpage:`recvmsg(2)` to learn the network interface on which each
+datagram arrived and the address to which it was sent.  It is usable when :data:`pktinfo_available` is
+``True``.
+"""
+
+import ctypes
+import ctypes.util
+import errno
+import socket
+import struct
+import sys
+
+MSG_DONTWAIT = 0x40
+
+IP_PKTINFO = getattr(socket, 'IP_PKTINFO', 8)
+IPV6_RECVPKTINFO = getattr(socket, 'IPV6_RECVPKTINFO', 49)
+IPV6_PKTINFO = getattr(socket, 'IPV6_PKTINFO', 50)
+
+class _iovec (ctypes.Structure):
+    _fields_ = [ ('iov_base', ctypes.c_void_p),
+                 ('iov_len', ctypes.c_size_t) ]
+
+class _msghdr (ctypes.Structure):
+    _fields_ = [ ('msg_name', ctypes.c_void_p),
+                 ('msg_namelen', ctypes.c_uint32),
+                 ('msg_iov', ctypes.POINTER(_iovec)),
+                 ('msg_iovlen', ctypes.c_size_t),
+                 ('msg_control', ctypes.c_void_p),
+                 ('msg_controllen', ctypes.c_size_t),
+                 ('msg_flags', ctypes.c_int) ]
+
+class _mmsghdr (ctypes.Structure):
+    _fields_ = [ ('msg_hdr', _msghdr),
+                 ('msg_len', ctypes.c_uint) ]
+
+_SOCKADDR_SIZE = 128
+"""The size of a ``struct sockaddr_storage``."""
+
+_libc = None
+_recvmmsg = None
+_sendmmsg = None
+_recvmsg = None
+if sys.platform.startswith('linux'):
+    try:
+        _libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        _recvmmsg = _libc.recvmmsg
+        _recvmmsg.argtypes = [ ctypes.c_int, ctypes.POINTER(_mmsghdr), ctypes.c_uint, ctypes.c_int, ctypes.c_void_p ]
+        _recvmmsg.restype = ctypes.c_int
+        _sendmmsg = _libc.sendmmsg
+        _sendmmsg.argtypes = [ ctypes.c_int, ctypes.POINTER(_mmsghdr), ctypes.c_uint, ctypes.c_int ]
+        _sendmmsg.restype = ctypes.c_int
+    except (OSError, AttributeError):
+        _recvmmsg = _sendmmsg = None
+    if _libc is not None:
+        try:
+            _recvmsg = _libc.recvmsg
+            _recvmsg.argtypes = [ ctypes.c_int, ctypes.POINTER(_msghdr), ctypes.c_int ]
+            _recvmsg.restype = ctypes.c_ssize_t
+        except AttributeError:
+            _recvmsg = None
+
+available = (_recvmmsg is not None) and (_sendmmsg is not None)
+"""``True`` iff batched I/O is supported on this host."""
+
+pktinfo_available = _recvmsg is not None
+"""``True`` iff :class:`PacketInfoReceiver` is supported on this host."""
+
+def decode_sockaddr (raw, length):
+    """Convert a packed ``struct sockaddr`` to a Python socket address.
+
+    :param raw: A string holding the packed address.
+    :param length: The number of significant octets in *raw*.
+    """
+    (family,) = struct.unpack('=H', raw[:2])
+    if socket.AF_INET == family:
+        (port,) = struct.unpack('!H', raw[2:4])
+        return (socket.inet_ntop(socket.AF_INET, raw[4:8]), port)
+    if socket.AF_INET6 == family:
+        (port, flowinfo) = struct.unpack('!HI', raw[2:8])
+        (scope_id,) = struct.unpack('=I', raw[24:28])
+        return (socket.inet_ntop(socket.AF_INET6, raw[8:24]), port, flowinfo, scope_id)
+    if socket.AF_UNIX == family:
+        path = raw[2:length]
+        if path and ('\0' != path[0]):
+            path = path.split('\0', 1)[0]
+        return path
+    raise ValueError('Unsupported address family %d' % (family,))
+
+def encode_sockaddr (family, address):
+    """Convert a Python socket address to a packed ``struct sockaddr``.
+
+    IP addresses must be in numeric form.
+
+    :return: The packed address.
+    :rtype: :class:`str`
+    """
+    if socket.AF_INET == family:
+        (host, port) = address
+        return struct.pack('=H', family) + struct.pack('!H', port) + socket.inet_pton(family, host) + '\0' * 8
+    if socket.AF_INET6 == family:
+        (host, port, flowinfo, scope_id) = address
+        return struct.pack('=H', family) + struct.pack('!HI', port, flowinfo) + socket.inet_pton(family, host) + struct.pack('=I', scope_id)
+    if socket.AF_UNIX == family:
+        return struct.pack('=H', family) + address
+    raise ValueError('Unsupported address family %d' % (family,))
+
+def _raise_errno ():
+    err = ctypes.get_errno()
+    raise socket.error(err, errno.errorcode.get(err, str(err)))
+
+_HEADER_SIZE = ctypes.sizeof(_mmsghdr)
+_NAME_OFFSET = _mmsghdr.msg_hdr.offset + _msghdr.msg_name.offset
+_NAMELEN_OFFSET = _mmsghdr.msg_hdr.offset + _msghdr.msg_namelen.offset
+_LEN_OFFSET = _mmsghdr.msg_len.offset
+_IOVEC_SIZE = ctypes.sizeof(_iovec)
+_LENGTHS = struct.Struct('=I%dxI' % (_LEN_OFFSET - _NAMELEN_OFFSET - 4,))
+"""Extracts the address length and datagram length from a
+``struct mmsghdr``, starting at the address length."""
+
+class BatchReceiver (object):
+    """Receive datagrams from a socket in batches.
+
+    The message headers, address structures, and data buffers are
+    allocated once and reused for every call.
+    """
+
+    def __init__ (self, sock, batch_size=64, buffer_size=8192):
+        """
+        :param sock: A datagram socket.
+        :param batch_size: The maximum number of datagrams received
+          per call.
+        :param buffer_size: The maximum size of a datagram.
+        """
+        if not available:
+            raise Exception('Batched I/O is not available')
+        self.__socket = sock
+        self.__batchSize = batch_size
+        self.__bufferSize = buffer_size
+        self.__buffers = ctypes.create_string_buffer(batch_size * buffer_size)
+        self.__names = ctypes.create_string_buffer(batch_size * _SOCKADDR_SIZE)
+        self.__iovecs = (_iovec * batch_size)()
+        self.__headers = (_mmsghdr * batch_size)()
+        base = ctypes.addressof(self.__buffers)
+        name_base = ctypes.addressof(self.__names)
+        for i in xrange(batch_size):
+            self.__iovecs[i].iov_base = base + i * buffer_size
+            self.__iovecs[i].iov_len = buffer_size
+            hdr = self.__headers[i].msg_hdr
+            hdr.msg_name = name_base + i * _SOCKADDR_SIZE
+            hdr.msg_namelen = _SOCKADDR_SIZE
+            hdr.msg_iov = ctypes.pointer(self.__iovecs[i])
+            hdr.msg_iovlen = 1
+        # The kernel updates the name lengths; this restores them.
+        self.__template = ctypes.string_at(ctypes.addressof(self.__headers), ctypes.sizeof(self.__headers))
+        self.__addresses = { }
+
+    batch_size = property(lambda _s: _s.__batchSize, None, None, "The maximum number of datagrams received per call.")
+
+    def _decodeName (self, raw):
+        address = self.__addresses.get(raw)
+        if address is None:
+            if 1024 <= len(self.__addresses):
+                self.__addresses.clear()
+            address = self.__addresses[raw] = decode_sockaddr(raw, len(raw))
+        return address
+
+    def receive (self, max_messages=None):
+        """Receive the datagrams that are available without blocking.
+
+        :param max_messages: The maximum number of datagrams to
+          return; it is limited to :attr:`batch_size`.
+        :return: A list of (*data*, *address*) pairs, empty if no
+          datagram is available.
+        :raises: :exc:`socket.error` on failure.
+        """
+        count = self.__batchSize
+        if (max_messages is not None) and (max_messages < count):
+            count = max_messages
+        headers = self.__headers
+        ctypes.memmove(headers, self.__template, count * _HEADER_SIZE)
+        while True:
+            received = _recvmmsg(self.__socket.fileno(), headers, count, MSG_DONTWAIT, None)
+            if 0 <= received:
+                break
+            err = ctypes.get_errno()
+            if errno.EINTR == err:
+                continue
+            if err in (errno.EAGAIN, errno.EWOULDBLOCK):
+                return []
+            _raise_errno()
+        raw = ctypes.string_at(ctypes.addressof(headers), received * _HEADER_SIZE)
+        names = ctypes.string_at(ctypes.addressof(self.__names), received * _SOCKADDR_SIZE)
+        base = ctypes.addressof(self.__buffers)
+        buffer_size = self.__bufferSize
+        unpack_lengths = _LENGTHS.unpack_from
+        string_at = ctypes.string_at
+        addresses = self.__addresses
+        result = []
+        for i in xrange(received):
+            (namelen, length) = unpack_lengths(raw, i * _HEADER_SIZE + _NAMELEN_OFFSET)
+            name_offset = i * _SOCKADDR_SIZE
+            name = names[name_offset:name_offset + namelen]
+            address = addresses.get(name)
+            if address is None:
+                address = self._decodeName(name)
+            result.append((string_at(base + i * buffer_size, length), address))
+        return result
+
+class BatchSender (object):
+    """Send datagrams through a socket in batches."""
+
+    def __init__ (self, sock, batch_size=64):
+        """
+        :param sock: A datagram socket.
+        :param batch_size: The maximum number of datagrams transferred
+          per system call.
+        """
+        if not available:
+            raise Exception('Batched I/O is not available')
+        self.__socket = sock
+        self.__batchSize = batch_size
+        self.__iovecs = (_iovec * batch_size)()
+        self.__headers = (_mmsghdr * batch_size)()
+        for i in xrange(batch_size):
+            hdr = self.__headers[i].msg_hdr
+            hdr.msg_iov = ctypes.pointer(self.__iovecs[i])
+            hdr.msg_iovlen = 1
+        self.__data = ctypes.create_string_buffer(batch_size * 256)
+        self.__names = { }
+
+    batch_size = property(lambda _s: _s.__batchSize, None, None, "The maximum number of datagrams transferred per system call.")
+
+    def _encodeName (self, address):
+        """Return (*buffer*, *buffer_address*, *length*) for the
+        encoded socket address.  The caller must hold a reference to
+        *buffer* for as long as *buffer_address* is in use."""
+        entry = self.__names.get(address)
+        if entry is None:
+            name = encode_sockaddr(self.__socket.family, address)
+            name_buffer = ctypes.create_string_buffer(name, len(name))
+            entry = self.__names[address] = (name_buffer, ctypes.addressof(name_buffer), len(name))
+        return entry
+
+    def send (self, packets):
+        """Transmit as many of the packets as the socket will accept
+        without blocking.
+
+        :param packets: A sequence of (*data*, *address*) pairs.
+        :return: The number of leading packets that were transmitted.
+        :raises: :exc:`socket.error` if the first packet could not be
+          sent for a reason other than a full send buffer.
+        """
+        sent = 0
+        total = len(packets)
+        headers = self.__headers
+        iovecs = self.__iovecs
+        pack_into = struct.pack_into
+        while sent < total:
+            # Evict cached names only between batches: headers built
+            # for this batch refer to the name buffers by address.
+            if 1024 <= len(self.__names):
+                self.__names.clear()
+            names = []
+            batch = packets[sent:sent + self.__batchSize]
+            count = len(batch)
+            blob = ''.join([ _p[0] for _p in batch ])
+            if len(blob) > ctypes.sizeof(self.__data):
+                self.__data = ctypes.create_string_buffer(2 * len(blob))
+            ctypes.memmove(self.__data, blob, len(blob))
+            data_address = ctypes.addressof(self.__data)
+            for i in xrange(count):
+                (data, address) = batch[i]
+                entry = self._encodeName(address)
+                names.append(entry)
+                (_, name_address, namelen) = entry
+                pack_into('@PL', iovecs, i * _IOVEC_SIZE, data_address, len(data))
+                pack_into('@PI', headers, i * _HEADER_SIZE + _NAME_OFFSET, name_address, namelen)
+                data_address += len(data)
+            while True:
+                rv = _sendmmsg(self.__socket.fileno(), headers, count, MSG_DONTWAIT)
+                if (0 <= rv) or (errno.EINTR != ctypes.get_errno()):
+                    break
+            if 0 > rv:
+                if (ctypes.get_errno() in (errno.EAGAIN, errno.EWOULDBLOCK)) or (0 < sent):
+                    break
+                _raise_errno()
+            sent += rv
+            if rv < count:
+                break
+        return sent
+
+_CMSGHDR = struct.Struct('@Lii')
+"""The ``struct cmsghdr`` header: length, level, and type."""
+
+_CMSG_ALIGNMENT = ctypes.sizeof(ctypes.c_size_t)
+"""The alignment of ancillary data, as for the C ``CMSG_ALIGN`` macro."""
+
+def _cmsg_align (length):
+    return (length + _CMSG_ALIGNMENT - 1) & ~(_CMSG_ALIGNMENT - 1)
+
+def enable_pktinfo (sock):
+    """Ask the kernel to report the arrival interface and destination
+    address of datagrams received on an IPv4 or IPv6 socket."""
+    if socket.AF_INET == sock.family:
+        sock.setsockopt(socket.SOL_IP, IP_PKTINFO, 1)
+    elif socket.AF_INET6 == sock.family:
+        sock.setsockopt(socket.IPPROTO_IPV6, IPV6_RECVPKTINFO, 1)
+    else:
+        raise ValueError('Unsupported address family %d' % (sock.family,))
+
+def decode_pktinfo (control, length):
+    """Decode the ``IP_PKTINFO`` or ``IPV6_PKTINFO`` message in packed
+    ancillary data.
+
+    :param control: A string holding the ancillary data.
+    :param length: The number of significant octets in *control*.
+    :return: A pair (*if_index*, *destination*) giving the index of
+      the arrival interface and the destination address of the
+      datagram as a string, or ``None`` if there is no such message.
+    """
+    offset = 0
+    while offset + _CMSGHDR.size <= length:
+        (cmsg_len, level, cmsg_type) = _CMSGHDR.unpack_from(control, offset)
+        if _CMSGHDR.size > cmsg_len:
+            break
+        data_offset = offset + _cmsg_align(_CMSGHDR.size)
+        if (socket.SOL_IP == level) and (IP_PKTINFO == cmsg_type):
+            # struct in_pktinfo: ifindex, local address, destination
+            if_index = struct.unpack_from('=i', control, data_offset)[0]
+            destination = control[data_offset + 8:data_offset + 12]
+            return (if_index, socket.inet_ntop(socket.AF_INET, destination))
+        if (socket.IPPROTO_IPV6 == level) and (IPV6_PKTINFO == cmsg_type):
+            # struct in6_pktinfo: destination, ifindex
+            if_index = struct.unpack_from('=I', control, data_offset + 16)[0]
+            destination = control[data_offset:data_offset + 16]
+            return (if_index, socket.inet_ntop(socket.AF_INET6, destination))
+        offset += _cmsg_align(cmsg_len)
+    return None
+
+class PacketInfoReceiver (object):
+    """Receive datagrams from a socket along with the index of the
+    network interface on which each arrived and the address to which
+    each was sent.
+
+    Constructing the receiver enables the socket option that makes
+    the kernel report these.  The buffers are allocated once
+    and reused for every call.
+    """
+
+    _CONTROL_SIZE = 256
+
+    def __init__ (self, sock, buffer_size=8192):
+        """
+        :param sock: An IPv4 or IPv6 datagram socket.
+        :param buffer_size: The maximum size of a datagram.
+        """
+        if not pktinfo_available:
+            raise Exception('recvmsg is not available')
+        enable_pktinfo(sock)
+        self.__socket = sock
+        self.__buffer = ctypes.create_string_buffer(buffer_size)
+        self.__name = ctypes.create_string_buffer(_SOCKADDR_SIZE)
+        self.__control = ctypes.create_string_buffer(self._CONTROL_SIZE)
+        self.__iovec = _iovec(ctypes.addressof(self.__buffer), buffer_size)
+        self.__header = _msghdr()
+        self.__header.msg_name = ctypes.addressof(self.__name)
+        self.__header.msg_iov = ctypes.pointer(self.__iovec)
+        self.__header.msg_iovlen = 1
+        self.__header.msg_control = ctypes.addressof(self.__control)
+        self.__addresses = { }
+
+    def receive (self):
+        """Receive a datagram if one is available without blocking.
+
+        :return: A tuple (*data*, *address*, *if_index*,
+          *destination*), or ``None`` if no datagram is available.
+          *destination* is the address string to which the datagram
+          was sent.  *if_index* and *destination* are ``None`` if the
+          kernel did not report them.
+        :raises: :exc:`socket.error` on failure.
+        """
+        header = self.__header
+        while True:
+            header.msg_namelen = _SOCKADDR_SIZE
+            header.msg_controllen = self._CONTROL_SIZE
+            header.msg_flags = 0
+            received = _recvmsg(self.__socket.fileno(), ctypes.byref(header), MSG_DONTWAIT)
+            if 0 <= received:
+                break
+            err = ctypes.get_errno()
+            if errno.EINTR == err:
+                continue
+            if err in (errno.EAGAIN, errno.EWOULDBLOCK):
+                return None
+            _raise_errno()
+        name = self.__name.raw[:header.msg_namelen]
+        address = self.__addresses.get(name)
+        if address is None:
+            if 1024 <= len(self.__addresses):
+                self.__addresses.clear()
+            address = self.__addresses[name] = decode_sockaddr(name, len(name))
+        pktinfo = decode_pktinfo(self.__control.raw, header.msg_controllen)
+        if pktinfo is None:
+            pktinfo = (None, None)
+        return (ctypes.string_at(self.__buffer, received), address) + pktinfo
@@ -36,6 +36,7 @@ import coapy.constants
 import types
 import struct
 import binascii
+import bisect
 
 def length_of_vlint (value):
     """
@@ -113,6 +114,13 @@ class _Base (object):
            CoAP option with a default value.
     """
 
+    Repeatable = False
+    """``True`` iff the option may appear more than once in a message.
+
+    :note: This value is overridden in each class that implements a
+           repeatable CoAP option.
+    """
+
     value = property()
     """The option value.
 
@@ -373,6 +381,7 @@ class UriPath (_UriPath_mixin, _Base):
     Type = 9
     Name = 'Uri-Path'
     Default = ''
+    Repeatable = True
     """By default, the URI path is ``/``, represented as an empty string."""
 
     _value = Default
@@ -383,6 +392,7 @@ class UriQuery (_StringValue_mixin, _Base):
     Type = 15
     Name = 'Uri-Query'
     Default = ''
+    Repeatable = True
     '''Key-value pairs of parameters for intended resource. By default it is
     empty'''
 
@@ -416,6 +426,7 @@ class Location (_UriPath_mixin, _Base):
     Type = 6
     Name = 'Location'
     Default = None
+    Repeatable = True
 
 class Block (_Base):
     """Support block-wise transfers of large resources.
@@ -499,24 +510,91 @@ class UnrecognizedOptionError (Exception):
     def __str__ (self):
         return '%s: type=%d, value=%s' % (self.__class__.__name__, self.option_type, binascii.hexlify(self.option_value))
 
-def encode (options, ignore_if_default=True):
+class OptionList (object):
+    """A sequence of option instances kept in increasing order of
+    option type.
+
+    Insertion uses :mod:`bisect`, so the options never need sorting
+    before they are encoded or listed.  Several options of the same
+    type are held in the order they were added.
+    """
+
+    def __init__ (self, options=()):
+        """
+        :param options: An iterable of option instances to add.
+        """
+        self.__types = []
+        self.__options = []
+        for opt in options:
+            self.add(opt)
+
+    def add (self, opt):
+        """Add *opt* after any options with the same type."""
+        index = bisect.bisect_right(self.__types, opt.Type)
+        self.__types.insert(index, opt.Type)
+        self.__options.insert(index, opt)
+
+    def replace (self, opt):
+        """Remove any options with the same type as *opt*, then add it."""
+        self.remove(opt.Type)
+        self.add(opt)
+
+    def remove (self, type_val):
+        """Remove all options of the given type.
+
+        :return: The number of options removed."""
+        start = bisect.bisect_left(self.__types, type_val)
+        end = bisect.bisect_right(self.__types, type_val, start)
+        del self.__types[start:end]
+        del self.__options[start:end]
+        return end - start
+
+    def find (self, type_val):
+        """Return the first option of the given type, or ``None``."""
+        index = bisect.bisect_left(self.__types, type_val)
+        if (index < len(self.__types)) and (type_val == self.__types[index]):
+            return self.__options[index]
+        return None
+
+    def findAll (self, type_val):
+        """Return a list of the options of the given type, in the
+        order they were added."""
+        start = bisect.bisect_left(self.__types, type_val)
+        end = bisect.bisect_right(self.__types, type_val, start)
+        return self.__options[start:end]
+
+    def __len__ (self):
+        return len(self.__options)
+
+    def __iter__ (self):
+        return iter(self.__options)
+
+def encode (options, ignore_if_default=True, presorted=False):
     """Encode a set of CoAP options for transmission.
 
     The options are sorted as required by CoAP.  The return value is a
     pair (*num_options*, *packed*) where *num_options* is the number
     of options that were encoded, and *packed* is the octet sequence
-    encoding those options.
+    encoding those options.  Several options of the same type are
+    encoded in the order they are provided.
 
     :param options: An iterable of option instances
 
     :param ignore_if_default: If ``True``, any option instance that
         has the default value for the option is excluded from the packed
         representation.
+
+    :param presorted: If ``True``, *options* is already in increasing
+        order of option type (as is an :class:`OptionList`) and is not
+        sorted again.
     :return: (*num_options*, *packed_options*)
     :rtype: (:class:`int`, :class:`str`)
     :raises: :exc:`Exception` if a packed option exceeds the representable option length
     """
-    option_list = sorted(options, lambda _a,_b: cmp(_a.Type, _b.Type))
+    if presorted:
+        option_list = options
+    else:
+        option_list = sorted(options, key=lambda _o: _o.Type)
     packed_pieces = []
     type_val = 0
     MAX_DELTA = 14
@@ -527,7 +605,7 @@ def encode (options, ignore_if_default=True):
             continue
         delta = opt.Type - type_val
         while MAX_DELTA < delta:
-            fencepost = OPTION_TYPE_FENCEPOST * int((opt.Type + OPTION_TYPE_FENCEPOST - 1) / OPTION_TYPE_FENCEPOST)
+            fencepost = OPTION_TYPE_FENCEPOST * int((type_val + OPTION_TYPE_FENCEPOST) / OPTION_TYPE_FENCEPOST)
             fp_delta = fencepost - type_val
             packed_pieces.append(chr(fp_delta << 4))
             num_options += 1
@@ -546,7 +624,7 @@ def encode (options, ignore_if_default=True):
         num_options += 1
     return (num_options, ''.join(packed_pieces))
 
-def decode (num_options, payload):
+def decode (num_options, payload, offset=0):
     """Decode a set of CoAP options and extract a message body.
 
     The specified number of options are pulled from the initial octets
@@ -556,33 +634,79 @@ def decode (num_options, payload):
     of appearance and *body* is the remainder of the payload after
     options have been stripped.
 
+    The payload is walked by offset (see :func:`scan`) rather than
+    re-sliced after each option; only the option values are copied.
+    If *payload* is a :class:`memoryview`, the options are copied out
+    of it in one piece, and the returned *body* is a view into the
+    same buffer, so no copy of the message body is made.
+
     :param num_options: The number of options to be extracted.
     :param payload: The packed options followed by an optional message body.
+    :param offset: The index within *payload* at which the options begin.
     :return: (*options*, *body*)
-    :rtype: (:class:`list`, :class:`str`)
+    :rtype: (:class:`list`, :class:`str` or :class:`memoryview`)
     :raises: :exc:`Exception` if an unrecognized critical option is encountered
     """
 
+    options = []
+    (spans, body_offset) = scan(num_options, payload, offset)
+    if isinstance(payload, memoryview):
+        packed = payload[offset:body_offset].tobytes()
+    else:
+        (packed, offset) = (payload, 0)
+    for (type_val, value_offset, length) in spans:
+        value_offset -= offset
+        options.append(Registry[type_val].unpack(packed[value_offset:value_offset + length]))
+    return (options, payload[body_offset:])
+
+def scan (num_options, payload, offset=0):
+    """Locate CoAP options within a packet without decoding them.
+
+    The return value is a pair (*spans*, *body_offset*) where *spans*
+    is a list of (*type*, *offset*, *length*) triples locating the
+    value of each recognized option within *payload*, in their order
+    of appearance, and *body_offset* is the index at which the
+    message body begins.  Fenceposts and unrecognized elective options
+    are omitted.  No option instances are created and no part of
+    *payload* is copied.
+
+    :param num_options: The number of options to be located.
+    :param payload: The packed options followed by an optional message body.
+    :param offset: The index within *payload* at which the options begin.
+    :return: (*spans*, *body_offset*)
+    :rtype: (:class:`list`, :class:`int`)
+    :raises: :exc:`UnrecognizedOptionError` if an unrecognized critical option is encountered
+    :raises: :exc:`ValueError` if the options extend beyond the end of *payload*
+    """
+
     type_val = 0
-    options = set()
+    spans = []
+    end = len(payload)
     while 0 < num_options:
         num_options -= 1
-        value_start_index = 1
-        odl = ord(payload[0])
+        if end <= offset:
+            raise ValueError('Missing option header')
+        odl = ord(payload[offset])
+        offset += 1
         type_val += (odl >> 4)
         length = odl & 0x0F
         if 15 == length:
-            length += ord(payload[value_start_index])
-            value_start_index += 1
-        value_end_index = value_start_index + length
+            if end <= offset:
+                raise ValueError('Missing option length')
+            length += ord(payload[offset])
+            offset += 1
+        if end < offset + length:
+            raise ValueError('Option type %d overruns packet' % (type_val,))
         if 0 != (type_val % OPTION_TYPE_FENCEPOST):
-            option_class = Registry.get(type_val)
-            if option_class is not None:
-                options.add(option_class.unpack(payload[value_start_index:value_end_index]))
+            if type_val in Registry:
+                spans.append((type_val, offset, length))
             elif not option_type_is_elective(type_val):
-                raise UnrecognizedOptionError(type_val, payload[value_start_index:value_end_index])
-        payload = payload[value_end_index:]
-    return (options, payload)
+                value = payload[offset:offset + length]
+                if isinstance(value, memoryview):
+                    value = value.tobytes()
+                raise UnrecognizedOptionError(type_val, value)
+        offset += length
+    return (spans, offset)
 
 Registry = { }
 """A map from integral option types to the Python class that implements the option."""
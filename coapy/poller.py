@@ -0,0 +1,169 @@
+# Copyright (c) 2010 People Power Co.
+# All rights reserved.
+# 
+# This open source code was developed with funding from People Power Company
+# 
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+# - Redistributions of source code must retain the above copyright
+#   notice, this list of conditions and the following disclaimer.
+# - Redistributions in binary form must reproduce the above copyright
+#   notice, this list of conditions and the following disclaimer in the
+#   documentation and/or other materials provided with the
+#   distribution.
+# - Neither the name of the People Power Corporation nor the names of
+#   its contributors may be used to endorse or promote products derived
+#   from this software without specific prior written permission.
+# 
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# ``AS IS'' AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED.  IN NO EVENT SHALL THE
+# PEOPLE POWER CO. OR ITS CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT,
+# STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED
+# OF THE POSSIBILITY OF SUCH DAMAGE
+# 
+
+"""Readiness notification for the sockets of an end-point.
+
+A poller tracks a set of file descriptors and the events of interest
+for each.  :class:`PollPoller` uses :func:`select.poll` and is
+available everywhere the end-point runs; :class:`EpollPoller` uses
+:func:`select.epoll` where the host provides it.  Use
+:func:`create_poller` to obtain the best available implementation.
+
+Events are expressed with :data:`READ` and :data:`WRITE`, which have
+the values of :data:`select.POLLIN` and :data:`select.POLLOUT`.
+"""
+
+import select
+
+READ = select.POLLIN
+"""Interest in, or notification of, a readable descriptor."""
+
+WRITE = select.POLLOUT
+"""Interest in, or notification of, a writable descriptor."""
+
+class PollPoller (object):
+    """A poller based on :func:`select.poll`."""
+
+    __poll = None
+
+    def __init__ (self):
+        self.__poll = select.poll()
+
+    def register (self, fd, events):
+        """Start watching *fd* for *events*.
+
+        Registering a descriptor that is already registered replaces
+        its events.
+
+        :param fd: A file descriptor or object with a ``fileno`` method.
+        :param events: A combination of :data:`READ` and :data:`WRITE`.
+        """
+        self.__poll.register(fd, events)
+
+    def modify (self, fd, events):
+        """Change the events of interest for a registered descriptor."""
+        self.__poll.modify(fd, events)
+
+    def unregister (self, fd):
+        """Stop watching *fd*."""
+        self.__poll.unregister(fd)
+
+    def poll (self, timeout_ms=None):
+        """Wait for events.
+
+        :param timeout_ms: The maximum time to wait, in milliseconds,
+          or ``None`` to wait indefinitely.
+        :return: A list of (*fileno*, *events*) pairs.
+        """
+        return self.__poll.poll(timeout_ms)
+
+    def close (self):
+        """Release any resources held by the poller."""
+        pass
+
+class EpollPoller (object):
+    """A poller based on :func:`select.epoll`.
+
+    Registrations persist in the kernel, so the cost of a call to
+    :meth:`poll` does not depend on the number of descriptors watched.
+    Descriptors are level-triggered: an end-point may stop reading a
+    socket before it is drained, and must be told again on the next
+    pass that data remains.
+    """
+
+    __epoll = None
+
+    def __init__ (self):
+        self.__epoll = select.epoll()
+
+    def register (self, fd, events):
+        """Start watching *fd* for *events*.
+
+        Registering a descriptor that is already registered replaces
+        its events.
+
+        :param fd: A file descriptor or object with a ``fileno`` method.
+        :param events: A combination of :data:`READ` and :data:`WRITE`.
+        """
+        try:
+            self.__epoll.register(fd, self._toEpoll(events))
+        except IOError:
+            self.__epoll.modify(fd, self._toEpoll(events))
+
+    def modify (self, fd, events):
+        """Change the events of interest for a registered descriptor."""
+        self.__epoll.modify(fd, self._toEpoll(events))
+
+    def unregister (self, fd):
+        """Stop watching *fd*."""
+        self.__epoll.unregister(fd)
+
+    def poll (self, timeout_ms=None):
+        """Wait for events.
+
+        :param timeout_ms: The maximum time to wait, in milliseconds,
+          or ``None`` to wait indefinitely.
+        :return: A list of (*fileno*, *events*) pairs.
+        """
+        timeout = -1
+        if timeout_ms is not None:
+            timeout = timeout_ms / 1000.0
+        return [ (_fd, self._fromEpoll(_e)) for (_fd, _e) in self.__epoll.poll(timeout) ]
+
+    def close (self):
+        """Release the epoll descriptor."""
+        self.__epoll.close()
+
+    @staticmethod
+    def _toEpoll (events):
+        epoll_events = 0
+        if events & READ:
+            epoll_events |= select.EPOLLIN
+        if events & WRITE:
+            epoll_events |= select.EPOLLOUT
+        return epoll_events
+
+    @staticmethod
+    def _fromEpoll (epoll_events):
+        events = 0
+        if epoll_events & select.EPOLLIN:
+            events |= READ
+        if epoll_events & select.EPOLLOUT:
+            events |= WRITE
+        return events
+
+def create_poller ():
+    """Return an :class:`EpollPoller` if the host supports epoll,
+    otherwise a :class:`PollPoller`."""
+    if hasattr(select, 'epoll'):
+        return EpollPoller()
+    return PollPoller()
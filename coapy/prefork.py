@@ -0,0 +1,378 @@
+# Copyright (c) 2010 People Power Co.
+# All rights reserved.
+# 
+# This open source code was developed with funding from People Power Company
+# 
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+# - Redistributions of source code must retain the above copyright
+#   notice, this list of conditions and the following disclaimer.
+# - Redistributions in binary form must reproduce the above copyright
+#   notice, this list of conditions and the following disclaimer in the
+#   documentation and/or other materials provided with the
+#   distribution.
+# - Neither the name of the People Power Corporation nor the names of
+#   its contributors may be used to endorse or promote products derived
+#   from this software without specific prior written permission.
+# 
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# ``AS IS'' AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED.  IN NO EVENT SHALL THE
+# PEOPLE POWER CO. OR ITS CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT,
+# STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED
+# OF THE POSSIBILITY OF SUCH DAMAGE
+# 
+
+"""Serve one CoAP port from several processes.
+
+A :class:`Supervisor` forks a number of worker processes, each of
+which creates its own :class:`coapy.connection.EndPoint` bound to the
+same address with ``SO_REUSEPORT``.  The kernel distributes incoming
+datagrams among the workers by source address, so all messages from a
+given remote are handled by the same worker and the per-remote state
+kept by an end-point remains consistent.
+
+Workers periodically report their end-point
+:attr:`statistics<coapy.connection.EndPoint.statistics>` to the
+supervisor, which restarts any worker that exits and aggregates the
+reports in :attr:`Supervisor.statistics`.
+
+``SO_REUSEPORT`` distribution is supported by Linux 3.9 and later.
+"""
+
+import coapy.connection
+import ctypes
+import ctypes.util
+import errno
+import fcntl
+import json
+import os
+import select
+import signal
+import socket
+import sys
+import time
+
+SO_REUSEPORT = getattr(socket, 'SO_REUSEPORT', None)
+if (SO_REUSEPORT is None) and sys.platform.startswith('linux'):
+    SO_REUSEPORT = 15
+"""The socket option allowing several sockets to bind the same port.
+Python 2 does not export it, so on Linux the value used by Linux is
+supplied.  Elsewhere it is ``None`` unless :mod:`socket` provides it,
+and a :class:`Supervisor` cannot be created."""
+
+_sched_setaffinity = None
+if sys.platform.startswith('linux'):
+    try:
+        _libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        _sched_setaffinity = _libc.sched_setaffinity
+        _sched_setaffinity.argtypes = [ ctypes.c_int, ctypes.c_size_t, ctypes.c_void_p ]
+        _sched_setaffinity.restype = ctypes.c_int
+    except (OSError, AttributeError):
+        _sched_setaffinity = None
+
+def cpu_count ():
+    """Return the number of processors online."""
+    try:
+        return max(1, os.sysconf('SC_NPROCESSORS_ONLN'))
+    except (ValueError, OSError):
+        return 1
+
+def set_cpu_affinity (cpu, pid=0):
+    """Restrict a process to run on a single processor.
+
+    :param cpu: The index of the processor.
+    :param pid: The process to restrict; by default, the caller.
+    :return: ``True`` if the affinity was set, ``False`` if the host
+      does not support it.
+    :raises: :exc:`OSError` if the system call fails.
+    """
+    if _sched_setaffinity is None:
+        return False
+    mask = (ctypes.c_ulong * 16)()
+    bits = 8 * ctypes.sizeof(ctypes.c_ulong)
+    mask[cpu // bits] = 1 << (cpu % bits)
+    if 0 != _sched_setaffinity(pid, ctypes.sizeof(mask), mask):
+        e = ctypes.get_errno()
+        raise OSError(e, os.strerror(e))
+    return True
+
+def aggregate_statistics (reports):
+    """Combine end-point statistics from several workers.
+
+    Counters are summed; entries named ``max_*`` take the largest
+    value reported.
+
+    :param reports: An iterable of dictionaries as returned by
+      :attr:`coapy.connection.EndPoint.statistics`.
+    :rtype: :class:`dict`
+    """
+    total = { }
+    for report in reports:
+        for (key, value) in report.iteritems():
+            if key.startswith('max_'):
+                total[key] = max(value, total.get(key, value))
+            else:
+                total[key] = total.get(key, 0) + value
+    return total
+
+class Worker (object):
+    """The supervisor's record of a worker process."""
+
+    def __init__ (self, index, pid, fd):
+        self.__index = index
+        self.__pid = pid
+        self.__fd = fd
+        self.__pending = ''
+        self.__statistics = { }
+
+    index = property(lambda _s: _s.__index, None, None, "The position of the worker, from zero.")
+    pid = property(lambda _s: _s.__pid, None, None, "The process identifier of the worker.")
+    fd = property(lambda _s: _s.__fd, None, None, "The descriptor on which the worker reports statistics.")
+    statistics = property(lambda _s: _s.__statistics, None, None, "The most recent statistics reported by the worker.")
+
+    def _read (self):
+        """Consume reports available on :attr:`fd`.
+
+        :return: ``False`` once the worker has closed its end."""
+        try:
+            data = os.read(self.__fd, 65536)
+        except OSError, e:
+            if e.errno in (errno.EAGAIN, errno.EINTR):
+                return True
+            raise
+        if not data:
+            return False
+        lines = (self.__pending + data).split('\n')
+        self.__pending = lines.pop()
+        if lines:
+            self.__statistics = json.loads(lines[-1])
+        return True
+
+class Supervisor (object):
+    """Run and monitor a set of end-point worker processes.
+
+    Each worker binds an end-point to *address* and passes every
+    received :class:`coapy.connection.ReceptionRecord` to *handler*.
+    """
+
+    REPORT_INTERVAL_MS = 1000
+    """The interval, in milliseconds, at which workers report statistics."""
+
+    RESTART_DELAY = 1.0
+    """The minimum time, in seconds, between starts of the same worker."""
+
+    def __init__ (self, handler, address,
+                  workers=None,
+                  address_family=socket.AF_INET,
+                  pin_cpus=False,
+                  restart=True,
+                  end_point_kw=None):
+        """
+        :param handler: A callable invoked in the worker with each
+          received :class:`coapy.connection.ReceptionRecord`.
+
+        :param address: The address to which each worker binds.
+
+        :param workers: The number of worker processes.  By default,
+          one per processor.
+
+        :param address_family: The address family of the end-points.
+
+        :param pin_cpus: If ``True``, worker *i* is restricted to
+          processor *i* modulo the number of processors.
+
+        :param restart: If ``True``, workers that exit are started
+          again.
+
+        :param end_point_kw: Additional keyword arguments for the
+          :class:`coapy.connection.EndPoint` constructor.
+
+        :raises: :exc:`Exception` if :data:`SO_REUSEPORT` is not known
+          on this platform.
+        """
+        if SO_REUSEPORT is None:
+            raise Exception('SO_REUSEPORT is not available on %s' % (sys.platform,))
+        if workers is None:
+            workers = cpu_count()
+        if 0 >= workers:
+            raise ValueError(workers)
+        self.__handler = handler
+        self.__address = address
+        self.__numWorkers = workers
+        self.__addressFamily = address_family
+        self.__pinCpus = pin_cpus
+        self.__restart = restart
+        self.__endPointKw = end_point_kw or { }
+        self.__workers = { }
+        self.__startTimes = { }
+        self.__retired = { }
+        self.__restarts = 0
+        self.__running = False
+
+    workers = property(lambda _s: _s.__workers.values(), None, None, "The :class:`Worker` records for running workers.")
+
+    __restarts = 0
+    def _get_restarts (self):
+        """The number of times a worker has been restarted."""
+        return self.__restarts
+    restarts = property(_get_restarts)
+
+    def _get_statistics (self):
+        """The end-point statistics of all workers, combined with
+        :func:`aggregate_statistics`.
+
+        Workers that have exited contribute their final report."""
+        reports = [ _w.statistics for _w in self.__workers.itervalues() ]
+        reports.append(self.__retired)
+        return aggregate_statistics(reports)
+    statistics = property(_get_statistics)
+
+    def createEndPoint (self):
+        """Create and bind the end-point for a worker.
+
+        This is invoked in the worker process."""
+        ep = coapy.connection.EndPoint(address_family=self.__addressFamily, **self.__endPointKw)
+        ep.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        ep.socket.setsockopt(socket.SOL_SOCKET, SO_REUSEPORT, 1)
+        ep.bind(self.__address)
+        return ep
+
+    def _serve (self, index, fd):
+        """The body of a worker process."""
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        if self.__pinCpus:
+            set_cpu_affinity(index % cpu_count())
+        ep = self.createEndPoint()
+        handler = self.__handler
+        interval = self.REPORT_INTERVAL_MS / 1000.0
+        next_report = time.time()
+        while True:
+            now = time.time()
+            if now >= next_report:
+                os.write(fd, json.dumps(ep.statistics) + '\n')
+                next_report = now + interval
+            for rx_record in ep.process_batch(int(1000 * (next_report - now)) + 1):
+                handler(rx_record)
+
+    def _startWorker (self, index):
+        (rfd, wfd) = os.pipe()
+        pid = os.fork()
+        if 0 == pid:
+            status = 0
+            try:
+                try:
+                    os.close(rfd)
+                    for worker in self.__workers.itervalues():
+                        os.close(worker.fd)
+                    self._serve(index, wfd)
+                except KeyboardInterrupt:
+                    pass
+                except:
+                    import traceback
+                    traceback.print_exc()
+                    status = 1
+            finally:
+                os._exit(status)
+        os.close(wfd)
+        fcntl.fcntl(rfd, fcntl.F_SETFL, os.O_NONBLOCK | fcntl.fcntl(rfd, fcntl.F_GETFL))
+        self.__workers[pid] = Worker(index, pid, rfd)
+        self.__startTimes[index] = time.time()
+
+    def start (self):
+        """Start the worker processes."""
+        self.__running = True
+        for index in xrange(self.__numWorkers):
+            self._startWorker(index)
+
+    def poll (self, timeout_ms=None):
+        """Collect worker reports and restart workers that have exited.
+
+        :param timeout_ms: The maximum time to wait for a report, in
+          milliseconds, or ``None`` to wait indefinitely.
+        """
+        by_fd = dict([ (_w.fd, _w) for _w in self.__workers.itervalues() ])
+        if not by_fd:
+            return
+        timeout = None
+        if timeout_ms is not None:
+            timeout = timeout_ms / 1000.0
+        try:
+            (readable, _, _) = select.select(by_fd.keys(), [], [], timeout)
+        except select.error, e:
+            if errno.EINTR != e.args[0]:
+                raise
+            readable = []
+        for fd in readable:
+            by_fd[fd]._read()
+        self._reap()
+
+    def _reap (self):
+        while self.__workers:
+            try:
+                (pid, status) = os.waitpid(-1, os.WNOHANG)
+            except OSError, e:
+                if errno.ECHILD == e.errno:
+                    break
+                raise
+            if 0 == pid:
+                break
+            worker = self.__workers.pop(pid, None)
+            if worker is None:
+                continue
+            worker._read()
+            os.close(worker.fd)
+            self.__retired = aggregate_statistics([self.__retired, worker.statistics])
+            if self.__running and self.__restart:
+                delay = self.__startTimes[worker.index] + self.RESTART_DELAY - time.time()
+                if 0 < delay:
+                    time.sleep(delay)
+                self.__restarts += 1
+                self._startWorker(worker.index)
+
+    def stop (self):
+        """Terminate the worker processes and wait for them to exit.
+
+        Activity since each worker's last report is not included in
+        :attr:`statistics`."""
+        self.__running = False
+        for pid in self.__workers.keys():
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except OSError, e:
+                if errno.ESRCH != e.errno:
+                    raise
+        while self.__workers:
+            try:
+                (pid, status) = os.waitpid(-1, 0)
+            except OSError, e:
+                if errno.EINTR == e.errno:
+                    continue
+                if errno.ECHILD != e.errno:
+                    raise
+                # Every child has already been reaped; retire the
+                # workers that remain.
+                pid = iter(self.__workers).next()
+            worker = self.__workers.pop(pid, None)
+            if worker is not None:
+                worker._read()
+                os.close(worker.fd)
+                self.__retired = aggregate_statistics([self.__retired, worker.statistics])
+
+    def run (self):
+        """Start the workers and supervise them until interrupted or
+        until none remain."""
+        self.start()
+        try:
+            while self.__workers:
+                self.poll()
+        finally:
+            self.stop()
@@ -0,0 +1,219 @@
+# Copyright (c) 2010 People Power Co.
+# All rights reserved.
+# 
+# This open source code was developed with funding from People Power Company
+# 
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+# - Redistributions of source code must retain the above copyright
+#   notice, this list of conditions and the following disclaimer.
+# - Redistributions in binary form must reproduce the above copyright
+#   notice, this list of conditions and the following disclaimer in the
+#   documentation and/or other materials provided with the
+#   distribution.
+# - Neither the name of the People Power Corporation nor the names of
+#   its contributors may be used to endorse or promote products derived
+#   from this software without specific prior written permission.
+# 
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# ``AS IS'' AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED.  IN NO EVENT SHALL THE
+# PEOPLE POWER CO. OR ITS CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT,
+# STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED
+# OF THE POSSIBILITY OF SUCH DAMAGE
+# 
+
+"""Drive many end-points from a single event loop.
+
+Each :class:`coapy.connection.EndPoint` normally waits for its own
+sockets in :meth:`process<coapy.connection.EndPoint.process>`.  A
+:class:`Reactor` instead owns one poller and one timer schedule
+shared by all the end-points it creates, so that hundreds of
+end-points (on different ports or address families) can be served by
+one thread with one wait.
+
+End-points created by a reactor must only be driven through it:
+invoking their own :meth:`process<coapy.connection.EndPoint.process>`
+raises an exception.
+"""
+
+import coapy.connection
+import coapy.poller
+import coapy.scheduler
+import numbers
+import time
+
+class _ReactorPoller (object):
+    """The poller given to each end-point a :class:`Reactor`
+    creates.  It registers the end-point's descriptors with the
+    reactor's poller and notes which end-point owns each.  Write
+    interest is managed by the reactor."""
+
+    end_point = None
+
+    def __init__ (self, poller, owners):
+        self.__poller = poller
+        self.__owners = owners
+
+    @staticmethod
+    def _fileno (fd):
+        if isinstance(fd, numbers.Integral):
+            return fd
+        return fd.fileno()
+
+    def register (self, fd, events):
+        self.__owners[self._fileno(fd)] = self
+        self.__poller.register(fd, events)
+
+    def modify (self, fd, events):
+        pass
+
+    def unregister (self, fd):
+        self.__owners.pop(self._fileno(fd), None)
+        self.__poller.unregister(fd)
+
+    def poll (self, timeout_ms=None):
+        raise Exception('End-point is driven by a reactor')
+
+class Reactor (object):
+    """Multiplex the network activity and timers of many end-points.
+    """
+
+    __poller = None
+    __owners = None
+    __timers = None
+    __endPoints = None
+    __writing = None
+
+    def __init__ (self, poller=None):
+        """
+        :param poller: The poller shared by all end-points, as
+          provided by :mod:`coapy.poller`.  By default the result of
+          :func:`coapy.poller.create_poller` is used.
+        """
+        if poller is None:
+            poller = coapy.poller.create_poller()
+        self.__poller = poller
+        self.__owners = { }
+        self.__timers = coapy.scheduler.Scheduler()
+        self.__endPoints = set()
+        self.__writing = set()
+
+    end_points = property(lambda _s: frozenset(_s.__endPoints), None, None, "The end-points driven by the reactor.")
+
+    def createEndPoint (self, **kw):
+        """Create an end-point driven by this reactor.
+
+        :param kw: Keyword arguments for the
+          :class:`coapy.connection.EndPoint` constructor, other than
+          ``poller``.
+        :rtype: :class:`coapy.connection.EndPoint`
+        """
+        proxy = _ReactorPoller(self.__poller, self.__owners)
+        end_point = coapy.connection.EndPoint(poller=proxy, **kw)
+        proxy.end_point = end_point
+        end_point.setWakeupListener(self._reschedule)
+        self.__endPoints.add(end_point)
+        return end_point
+
+    def remove (self, end_point):
+        """Stop driving *end_point*.
+
+        Its descriptors are unregistered; the end-point cannot be
+        used afterwards."""
+        for (fd, proxy) in self.__owners.items():
+            if proxy.end_point is end_point:
+                proxy.unregister(fd)
+        self.__timers.cancel(end_point)
+        end_point.setWakeupListener(None)
+        self.__endPoints.discard(end_point)
+        self.__writing.discard(end_point)
+
+    def _reschedule (self, end_point):
+        """Update the timer schedule and write interest of an
+        end-point after its state may have changed."""
+        wants_write = end_point.wants_write
+        if wants_write != (end_point in self.__writing):
+            events = coapy.poller.READ
+            if wants_write:
+                events |= coapy.poller.WRITE
+                self.__writing.add(end_point)
+            else:
+                self.__writing.discard(end_point)
+            self.__poller.modify(end_point.fileno(), events)
+        when = end_point.next_deadline
+        if when is None:
+            self.__timers.cancel(end_point)
+        else:
+            self.__timers.schedule(when, end_point)
+
+    def process (self, timeout_ms, max_messages=None):
+        """Process network activity for all end-points.
+
+        This behaves as
+        :meth:`coapy.connection.EndPoint.process_batch`, returning the
+        messages received by any of the end-points; each record's
+        :attr:`end_point<coapy.connection.ReceptionRecord.end_point>`
+        identifies where it arrived.  Retransmissions, timeouts and
+        callbacks are handled for every end-point, examining only
+        those with activity or timers due.
+
+        :param timeout_ms: The maximum time, in milliseconds, that
+           this method should block.  ``None`` indicates no limit.
+        :param max_messages: The maximum number of records to return,
+           or ``None`` for no limit.
+        :return: A list of :class:`coapy.connection.ReceptionRecord`.
+        """
+        end_time = None
+        if timeout_ms is not None:
+            end_time = time.time() + timeout_ms / 1000.0
+        rx_records = []
+        did_pass = False
+        while not rx_records:
+            now = time.time()
+            if did_pass and (end_time is not None) and (0 >= int(1000 * (end_time - now))):
+                break
+
+            for end_point in self.__timers.popDue(now):
+                end_point.on_timer(now)
+                self._reschedule(end_point)
+
+            next_time = self.__timers.nextTime()
+            if (end_time is not None) and ((next_time is None) or (end_time < next_time)):
+                next_time = end_time
+            poll_timeout_ms = None
+            if next_time is not None:
+                poll_timeout_ms = max(0, (next_time - now) * 1000)
+
+            active = set()
+            for (fd, events) in self.__poller.poll(poll_timeout_ms):
+                proxy = self.__owners.get(fd)
+                if proxy is None:
+                    continue
+                end_point = proxy.end_point
+                if events & coapy.poller.WRITE:
+                    end_point.on_writable()
+                if (events & coapy.poller.READ) and ((max_messages is None) or (len(rx_records) < max_messages)):
+                    limit = None
+                    if max_messages is not None:
+                        limit = max_messages - len(rx_records)
+                    rx_records.extend(end_point.on_readable(fd, limit))
+                active.add(end_point)
+            for end_point in active:
+                self._reschedule(end_point)
+            did_pass = True
+        return rx_records
+
+    def run (self, handler):
+        """Process activity indefinitely, passing each received
+        :class:`coapy.connection.ReceptionRecord` to *handler*."""
+        while True:
+            for rx_record in self.process(None):
+                handler(rx_record)
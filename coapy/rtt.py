@@ -0,0 +1,181 @@
+# Copyright (c) 2010 People Power Co.
+# All rights reserved.
+# 
+# This open source code was developed with funding from People Power Company
+# 
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+# - Redistributions of source code must retain the above copyright
+#   notice, this list of conditions and the following disclaimer.
+# - Redistributions in binary form must reproduce the above copyright
+#   notice, this list of conditions and the following disclaimer in the
+#   documentation and/or other materials provided with the
+#   distribution.
+# - Neither the name of the People Power Corporation nor the names of
+#   its contributors may be used to endorse or promote products derived
+#   from this software without specific prior written permission.
+# 
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# ``AS IS'' AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED.  IN NO EVENT SHALL THE
+# PEOPLE POWER CO. OR ITS CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT,
+# STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED
+# OF THE POSSIBILITY OF SUCH DAMAGE
+# 
+
+"""Round-trip time estimation for retransmission timeouts.
+
+The time an :class:`coapy.connection.EndPoint` waits for an
+acknowledgement before retransmitting a confirmable message is
+derived from round-trip times measured to each remote, following the
+CoAP Simple Congestion Control/Advanced (CoCoA) proposal:
+
+- A *strong* estimate is fed from exchanges acknowledged after a
+  single transmission, where the measured time is unambiguous.
+
+- A *weak* estimate is fed from exchanges acknowledged after one or
+  two retransmissions, measured from the first transmission.
+
+Each estimate is maintained as in :rfc:`6298`; the overall timeout is
+a moving blend of the two.  Until an acknowledgement has been
+received, :attr:`coapy.RESPONSE_TIMEOUT` is used.
+"""
+
+import coapy
+import random
+
+class RttEstimator (object):
+    """A smoothed round-trip time and variance, as in :rfc:`6298`."""
+
+    ALPHA = 0.125
+    """The gain applied to new samples when updating :attr:`srtt`."""
+
+    BETA = 0.25
+    """The gain applied to new samples when updating :attr:`rttvar`."""
+
+    __k = None
+
+    def __init__ (self, k=4):
+        """
+        :param k: The multiple of :attr:`rttvar` added to
+          :attr:`srtt` to produce :attr:`rto`.
+        """
+        self.__k = k
+
+    __srtt = None
+    def _get_srtt (self):
+        """The smoothed round-trip time, in seconds, or ``None`` if no
+        sample has been provided."""
+        return self.__srtt
+    srtt = property(_get_srtt)
+
+    __rttvar = None
+    def _get_rttvar (self):
+        """The round-trip time variation, in seconds, or ``None`` if no
+        sample has been provided."""
+        return self.__rttvar
+    rttvar = property(_get_rttvar)
+
+    def _get_rto (self):
+        """The retransmission timeout implied by the estimate, or
+        ``None`` if no sample has been provided."""
+        if self.__srtt is None:
+            return None
+        return self.__srtt + self.__k * self.__rttvar
+    rto = property(_get_rto)
+
+    def update (self, rtt):
+        """Incorporate a new round-trip time sample, in seconds."""
+        if self.__srtt is None:
+            self.__srtt = rtt
+            self.__rttvar = rtt / 2.0
+        else:
+            self.__rttvar = (1 - self.BETA) * self.__rttvar + self.BETA * abs(self.__srtt - rtt)
+            self.__srtt = (1 - self.ALPHA) * self.__srtt + self.ALPHA * rtt
+        return self.rto
+
+class AdaptiveTimeout (object):
+    """The retransmission timeout for confirmable messages sent to a
+    single remote."""
+
+    MIN_TIMEOUT = 0.010
+    """The lower bound, in seconds, on the estimated timeout."""
+
+    MAX_TIMEOUT = 60
+    """The upper bound, in seconds, on the estimated timeout."""
+
+    MAX_WEAK_TRANSMISSIONS = 3
+    """Exchanges acknowledged after more than this many transmissions
+    do not contribute to the weak estimate."""
+
+    def __init__ (self):
+        self.__strong = RttEstimator(k=4)
+        self.__weak = RttEstimator(k=1)
+
+    __strong = None
+    strong = property(lambda _s: _s.__strong, None, None, "The :class:`RttEstimator` fed by unambiguous samples.")
+
+    __weak = None
+    weak = property(lambda _s: _s.__weak, None, None, "The :class:`RttEstimator` fed by samples from retransmitted exchanges.")
+
+    __rto = None
+    def _get_rto (self):
+        """The estimated retransmission timeout, in seconds.
+
+        This is :attr:`coapy.RESPONSE_TIMEOUT` until a sample has been
+        provided."""
+        if self.__rto is None:
+            return coapy.RESPONSE_TIMEOUT
+        return self.__rto
+    rto = property(_get_rto)
+
+    def _get_backoff_factor (self):
+        """The factor by which the timeout is multiplied on each
+        retransmission.
+
+        Short timeouts back off faster and long ones more slowly.
+        Until a sample has been provided, the timeout doubles."""
+        if self.__rto is None:
+            return 2
+        if self.__rto < 1:
+            return 3
+        if self.__rto > 3:
+            return 1.5
+        return 2
+    backoff_factor = property(_get_backoff_factor)
+
+    def initialTimeout (self):
+        """Return the time to wait for an acknowledgement of the first
+        transmission of a message.
+
+        This is :attr:`rto` scaled by a random factor between 1 and
+        :attr:`coapy.RESPONSE_RANDOM_FACTOR`, so that messages sent
+        together do not retransmit together."""
+        return self.rto * random.uniform(1, coapy.RESPONSE_RANDOM_FACTOR)
+
+    def update (self, rtt, transmissions):
+        """Incorporate the round-trip time measured for an
+        acknowledged exchange.
+
+        :param rtt: The time, in seconds, from the first transmission
+          of the message to receipt of the acknowledgement.
+
+        :param transmissions: The number of times the message was
+          transmitted.
+        """
+        rto = self.rto
+        if 1 == transmissions:
+            rto = 0.5 * self.__strong.update(rtt) + 0.5 * rto
+        elif transmissions <= self.MAX_WEAK_TRANSMISSIONS:
+            rto = 0.25 * self.__weak.update(rtt) + 0.75 * rto
+        else:
+            return self.rto
+        self.__rto = min(max(rto, self.MIN_TIMEOUT), self.MAX_TIMEOUT)
+        return self.__rto
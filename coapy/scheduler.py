@@ -0,0 +1,140 @@
+# Copyright (c) 2010 People Power Co.
+# All rights reserved.
+# 
+# This open source code was developed with funding from People Power Company
+# 
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+# - Redistributions of source code must retain the above copyright
+#   notice, this list of conditions and the following disclaimer.
+# - Redistributions in binary form must reproduce the above copyright
+#   notice, this list of conditions and the following disclaimer in the
+#   documentation and/or other materials provided with the
+#   distribution.
+# - Neither the name of the People Power Corporation nor the names of
+#   its contributors may be used to endorse or promote products derived
+#   from this software without specific prior written permission.
+# 
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# ``AS IS'' AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED.  IN NO EVENT SHALL THE
+# PEOPLE POWER CO. OR ITS CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT,
+# STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED
+# OF THE POSSIBILITY OF SUCH DAMAGE
+# 
+
+"""Time-ordered event queues used to schedule CoAP transaction activity.
+
+An :class:`coapy.connection.EndPoint` may have tens of thousands of
+transmissions in flight.  Rather than examine every one of them on
+each pass through its processing loop, the end-point records the time
+at which each transmission next requires attention in a
+:class:`Scheduler`, and retrieves only those that are due.
+"""
+
+import heapq
+import itertools
+
+class Scheduler (object):
+    """A priority queue of items keyed by the time at which they are due.
+
+    Each item may be scheduled at most once; scheduling an item that
+    is already present moves it to the new time.  Cancelled and
+    rescheduled entries are left in the underlying heap and discarded
+    when they reach the front, so all operations are logarithmic in
+    the number of scheduled items.
+
+    Items must be hashable.
+    """
+
+    __heap = None
+    __entries = None
+    __counter = None
+
+    __REMOVED = object()
+    """Placeholder marking a heap entry whose item has been cancelled
+    or rescheduled."""
+
+    def __init__ (self):
+        self.__heap = []
+        self.__entries = {}
+        self.__counter = itertools.count()
+
+    def __len__ (self):
+        return len(self.__entries)
+
+    def __contains__ (self, item):
+        return item in self.__entries
+
+    def schedule (self, when, item):
+        """Arrange for *item* to become due at time *when*.
+
+        If *item* is already scheduled, its previous due time is
+        discarded.
+
+        :param when: A :meth:`time.time` value.
+        :param item: The object to be returned by :meth:`popDue`.
+        """
+        self.cancel(item)
+        entry = [when, self.__counter.next(), item]
+        self.__entries[item] = entry
+        heapq.heappush(self.__heap, entry)
+
+    def cancel (self, item):
+        """Remove *item* from the schedule.
+
+        Returns ``True`` iff the item was scheduled."""
+        entry = self.__entries.pop(item, None)
+        if entry is None:
+            return False
+        entry[2] = self.__REMOVED
+        return True
+
+    def dueTime (self, item):
+        """Return the time at which *item* is due, or ``None`` if it
+        is not scheduled."""
+        entry = self.__entries.get(item)
+        if entry is None:
+            return None
+        return entry[0]
+
+    def _prune (self):
+        heap = self.__heap
+        while heap and (heap[0][2] is self.__REMOVED):
+            heapq.heappop(heap)
+
+    def nextTime (self):
+        """Return the earliest time at which any item is due, or
+        ``None`` if nothing is scheduled."""
+        self._prune()
+        if self.__heap:
+            return self.__heap[0][0]
+        return None
+
+    def popDue (self, now):
+        """Remove and return, in order of due time, all items due at
+        or before *now*.
+
+        :rtype: :class:`list`
+        """
+        heap = self.__heap
+        due = []
+        while heap:
+            entry = heap[0]
+            if entry[2] is self.__REMOVED:
+                heapq.heappop(heap)
+                continue
+            if entry[0] > now:
+                break
+            heapq.heappop(heap)
+            item = entry[2]
+            del self.__entries[item]
+            due.append(item)
+        return due
@@ -27,31 +27,29 @@ remote = (host, port)
 ep = coapy.connection.EndPoint()
 ep.socket.bind(('', coapy.COAP_PORT))
 
-def wait_for_response (ep, txr):
+def wait_for_response (ep, future):
     global verbose
-    
-    while True:
-        rxr = ep.process(1000)
-        if rxr is None:
-            print 'No message received; waiting'
-            continue
-        if verbose:
-            print rxr.message
-            print "\n".join(['  %s' % (str(_o),) for _o in rxr.message.options])
-            print '  %s' % (rxr.message.payload,)
-        if rxr.pertains_to != txr:
-            print 'Irrelevant; waiting'
-            continue
-        return rxr.message
+
+    while not future.done():
+        for rxr in ep.wait([future], 1000):
+            print 'Irrelevant message from %s' % (rxr.remote,)
+        if not future.done():
+            print 'No response received; waiting'
+    rxr = future.result()
+    if verbose:
+        print rxr.message
+        print "\n".join(['  %s' % (str(_o),) for _o in rxr.message.options])
+        print '  %s' % (rxr.message.payload,)
+    return rxr.message
 
 def getResource (ep, uri_path, remote):
     msg = coapy.connection.Message(code=coapy.GET, uri_path=uri_path)
-    resp = wait_for_response(ep, ep.send(msg, remote))
+    resp = wait_for_response(ep, ep.request(msg, remote))
     return resp.payload
 
 def putResource (ep, uri_path, remote, value):
     msg = coapy.connection.Message(code=coapy.PUT, payload=value, uri_path=uri_path)
-    resp = wait_for_response(ep, ep.send(msg, remote))
+    resp = wait_for_response(ep, ep.request(msg, remote))
     return resp.payload
 
 data = getResource(ep, uri_path, remote)
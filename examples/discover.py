@@ -14,8 +14,8 @@
 #  End-point response from ('192.168.66.14', 61616)
 #  End-point response from ('192.168.66.174', 53262)
 #
-# A future version of this demonstration will follow-up by retrieving
-# the resources from each endpoint.
+# Responses are collected for the window given by -w (in milliseconds),
+# after which the resources are retrieved from each end-point.
 
 import sys
 import getopt
@@ -23,15 +23,17 @@ import coapy.connection
 import coapy.options
 import coapy.link
 import socket
+import binascii
 
 uri_path = '.well-known/r'
 port = coapy.COAP_PORT
 interface_address = socket.gethostname()
+window_ms = 2000
 verbose = False
 address_family = socket.AF_INET
 
 try:
-    opts, args = getopt.getopt(sys.argv[1:], 'p:v46i:', [ 'port=', 'verbose', '--ipv4', '--ipv6', '--interface-address='])
+    opts, args = getopt.getopt(sys.argv[1:], 'p:v46i:w:', [ 'port=', 'window=', 'verbose', '--ipv4', '--ipv6', '--interface-address='])
     for (o, a) in opts:
         if o in ('-v', '--verbose'):
             verbose = True
@@ -43,6 +45,8 @@ try:
             address_family = socket.AF_INET6
         elif o in ('-i', '--interface-address'):
             interface_address = a
+        elif o in ('-w', '--window'):
+            window_ms = int(a)
 except getopt.GetoptError, e:
     print 'Option error: %s' % (e,)
     sys.exit(1)
@@ -54,17 +58,23 @@ elif socket.AF_INET6 == address_family:
 ep = coapy.connection.EndPoint(address_family=address_family)
 ep.bind(bind_addr)
 
-sap_addresses = set()
-
 (if_sockaddr, mc_sockaddr) = coapy.connection.join_discovery(ep.socket, interface_address)
 discovery_msg = coapy.connection.Message()
 
-discovery_tx_rec = ep.send(discovery_msg, mc_sockaddr)
-tx_rec = discovery_tx_rec
+# Collect the responding end-points first: acknowledgements to
+# requests sent while the window is open would be consumed by the
+# group request rather than reaching the loop below.
+remotes = []
+for rv in ep.groupRequest(discovery_msg, mc_sockaddr, window_ms):
+    print 'End-point response from %s' % (rv.remote,)
+    remotes.append(rv.remote)
 
 resource_txr = set()
+for remote in remotes:
+    msg = coapy.connection.Message(code=coapy.GET, uri_path=".well-known/r")
+    resource_txr.add(ep.send(msg, remote))
 
-while True:
+while resource_txr:
     rv = ep.process(1000)
     if rv is None:
         print 'No message received; waiting'
@@ -77,28 +87,19 @@ while True:
         print ' %s' % (msg.payload,)
 
     tx_rec = rv.pertains_to
-    if tx_rec is None:
+    if tx_rec not in resource_txr:
         if msg.CON == msg.transaction_type:
-            # TODO: improve this check
-            if rv.transaction_id == discovery_tx_rec.transaction_id:
-                print 'Probably loopback discovery message'
-                continue
             rv.reset()
         print 'Response not pertinent; waiting'
         continue
-    if tx_rec == discovery_tx_rec:
-        print 'End-point response from %s' % (rv.remote,)
-        sap_addresses.add(rv.remote)
-        msg = coapy.connection.Message(code=coapy.GET, uri_path=".well-known/r")
-        resource_txr.add(ep.send(msg, rv.remote))
-        continue
+    resource_txr.discard(tx_rec)
     if msg.RST == tx_rec.response_type:
         print 'Server %s responded with reset' % (rv.remote,)
-        break
+        continue
     if coapy.OK != msg.code:
         if 0 != msg.code:
             print 'Pertinent response code not OK: %d (%s)' % (msg.code, coapy.codes.get(msg.code, 'UNDEFINED'))
-            break
+            continue
         print 'Ack for async response'
         tx_rec = None
         continue
@@ -6,14 +6,23 @@
 #  python coapget.py -h localhost -u uptime
 #  python coapget.py -h localhost -u counter
 #  python coapget.py -h localhost -u unknown
+#
+# To serve from one process per processor:
+#  python server.py -w 0 --pin-cpus
+#
+# To run handlers in a pool of eight threads:
+#  python server.py -t 8
 
 import sys
 import coapy.connection
 import coapy.options
 import coapy.link
+import coapy.prefork
+import coapy.dispatch
 import time
 import socket
 import getopt
+import traceback
 
 # --verbose (-v): Print all message metadata
 verbose = False
@@ -23,9 +32,19 @@ address_family = socket.AF_INET
 #   host names for local interfaces on which CoAP service discovery
 #   should be supported.
 discovery_addresses = None
+# --leisure sec (-L): Spread responses to discovery messages over a
+#   random delay of up to sec seconds.
+leisure = None
+# --workers n (-w): Serve from n processes sharing the port; 0 means one
+#   per processor.
+workers = None
+# --pin-cpus: Restrict each worker process to one processor.
+pin_cpus = False
+# --threads n (-t): Run handlers in a pool of n threads.
+threads = None
 
 try:
-    opts, args = getopt.getopt(sys.argv[1:], 'vp:46D:', [ 'verbose', '--port=', '--ipv4', '--ipv6', '--discovery-addresses=' ])
+    opts, args = getopt.getopt(sys.argv[1:], 'vp:46D:L:w:t:', [ 'verbose', '--port=', '--ipv4', '--ipv6', '--discovery-addresses=', 'leisure=', 'workers=', 'pin-cpus', 'threads=' ])
     for (o, a) in opts:
         if o in ('-v', '--verbose'):
             verbose = True
@@ -37,6 +56,14 @@ try:
             address_family = socket.AF_INET6
         elif o in ('-D', '--discovery_addresses'):
             discovery_addresses = a
+        elif o in ('-L', '--leisure'):
+            leisure = float(a)
+        elif o in ('-w', '--workers'):
+            workers = int(a) or coapy.prefork.cpu_count()
+        elif o in ('--pin-cpus',):
+            pin_cpus = True
+        elif o in ('-t', '--threads'):
+            threads = int(a)
 except getopt.GetoptError, e:
     print 'Option error: %s' % (e,)
     sys.exit(1)
@@ -45,11 +72,12 @@ if socket.AF_INET == address_family:
     bind_addr = ('', port)
 elif socket.AF_INET6 == address_family:
     bind_addr = ('::', port, 0, 0)
-ep = coapy.connection.EndPoint(address_family=address_family)
-ep.bind(bind_addr)
-if discovery_addresses is not None:
-    for da_fqdn in discovery_addresses.split(','):
-        ep.bindDiscovery(da_fqdn)
+if (workers is not None) and (discovery_addresses is not None):
+    print 'Discovery is not supported with multiple workers'
+    sys.exit(1)
+if (workers is not None) and (threads is not None):
+    print 'Handler threads are not supported with multiple workers'
+    sys.exit(1)
 
 class CounterService (coapy.link.LinkValue):
     __counter = 0
@@ -104,22 +132,48 @@ services.add_service(CounterService('counter'))
 services.add_service(UptimeService('uptime'))
 services.add_service(AsyncCounterService('async'))
 
-while True:
-    rxr = ep.process(10000)
-    if rxr is None:
-        print 'No activity'
-        continue
+def handle (rxr):
     print '%s: %s' % (rxr.remote, rxr.message)
     msg = rxr.message
     if coapy.GET != msg.code:
         rxr.reset()
-        continue
+        return
     uri = msg.findOption(coapy.options.UriPath)
     if uri is None:
-        continue
+        return
     service = services.lookup(uri.value)
     print 'Lookup %s got %s' % (uri, service)
     if service is None:
         rxr.reset()
-        continue
+        return
     service.process(rxr)
+
+if workers is not None:
+    supervisor = coapy.prefork.Supervisor(handle, bind_addr, workers=workers,
+                                          address_family=address_family, pin_cpus=pin_cpus)
+    try:
+        supervisor.run()
+    except KeyboardInterrupt:
+        pass
+    print 'Statistics: %s' % (supervisor.statistics,)
+    sys.exit(0)
+
+ep = coapy.connection.EndPoint(address_family=address_family)
+ep.bind(bind_addr)
+if discovery_addresses is not None:
+    for da_fqdn in discovery_addresses.split(','):
+        ep.bindDiscovery(da_fqdn)
+if leisure is not None:
+    ep.discovery_leisure = leisure
+if threads is not None:
+    def report_error (rx_record, exc_info):
+        print 'Handler failed for %s' % (rx_record,)
+        traceback.print_exception(*exc_info)
+    handle = coapy.dispatch.Dispatcher(ep, handle, workers=threads, on_error=report_error).dispatch
+
+while True:
+    rxr = ep.process(10000)
+    if rxr is None:
+        print 'No activity'
+        continue
+    handle(rxr)
@@ -0,0 +1,33 @@
+import unittest
+from coapy.buffers import *
+
+class TestBufferPool (unittest.TestCase):
+    def testReuse (self):
+        pool = BufferPool(16, 2)
+        self.assertEqual(16, pool.buffer_size)
+        b1 = pool.acquire()
+        self.assertTrue(isinstance(b1, bytearray))
+        self.assertEqual(16, len(b1))
+        self.assertEqual(1, pool.allocated)
+        pool.release(b1)
+        self.assertEqual(1, len(pool))
+        self.assertTrue(b1 is pool.acquire())
+        self.assertEqual(1, pool.reused)
+        self.assertEqual(0, len(pool))
+
+    def testCapacity (self):
+        pool = BufferPool(16, 2)
+        buffers = [ pool.acquire() for _i in xrange(3) ]
+        self.assertEqual(3, pool.allocated)
+        for b in buffers:
+            pool.release(b)
+        self.assertEqual(2, len(pool))
+
+    def testForeign (self):
+        pool = BufferPool(16)
+        pool.release(bytearray(8))
+        self.assertEqual(0, len(pool))
+        self.assertRaises(ValueError, BufferPool, 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+import unittest
+from coapy.cache import *
+
+class TestLRUCache (unittest.TestCase):
+
+    now = 0
+    def clock (self):
+        return self.now
+
+    def testBasic (self):
+        cache = LRUCache(4)
+        self.assertEqual(0, len(cache))
+        self.assertTrue(cache.get('a') is None)
+        self.assertEqual(1, cache.misses)
+        cache.put('a', 1)
+        self.assertTrue('a' in cache)
+        self.assertEqual(1, cache.get('a'))
+        self.assertEqual(1, cache.hits)
+        cache.put('a', 2)
+        self.assertEqual(1, len(cache))
+        self.assertEqual(2, cache.get('a'))
+        self.assertEqual(2, cache.pop('a'))
+        self.assertFalse('a' in cache)
+        self.assertEqual('x', cache.pop('a', 'x'))
+
+    def testDefault (self):
+        cache = LRUCache(4)
+        cache.put('a', None)
+        marker = object()
+        self.assertTrue(cache.get('a', marker) is None)
+        self.assertTrue(cache.get('b', marker) is marker)
+
+    def testEviction (self):
+        cache = LRUCache(3)
+        for k in 'abc':
+            cache.put(k, k)
+        self.assertEqual('a', cache.get('a'))
+        cache.put('d', 'd')
+        self.assertEqual(3, len(cache))
+        self.assertEqual(1, cache.evictions)
+        self.assertFalse('b' in cache)
+        for k in 'acd':
+            self.assertTrue(k in cache)
+
+    def testExpiry (self):
+        self.now = 100
+        cache = LRUCache(3, ttl=10, clock=self.clock)
+        cache.put('a', 1)
+        self.now = 105
+        cache.put('b', 2)
+        self.assertEqual(1, cache.get('a'))
+        self.now = 110
+        self.assertTrue(cache.get('a') is None)
+        self.assertEqual(2, cache.get('b'))
+        cache.put('c', 3)
+        cache.put('d', 4)
+        self.now = 115
+        cache.put('e', 5)
+        self.assertEqual(0, cache.evictions)
+        cache.purge()
+        self.assertEqual(3, len(cache))
+        self.assertFalse('b' in cache)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,8 +1,12 @@
 import unittest
 import coapy.options
+import coapy.mmsg
+import coapy.poller
 from coapy.connection import *
 import time
+import select
 import binascii
+import threading
 
 class Test_is_multicast (unittest.TestCase):
     def testIpv4 (self):
@@ -20,6 +24,75 @@ class Test_is_multicast (unittest.TestCase):
         # Unix-domain socket addresses are file system paths.
         self.assertFalse(is_multicast('/dev/null'))
 
+class Test_normalize_address (unittest.TestCase):
+    def testIpv4 (self):
+        self.assertEqual(('127.0.0.1', 1234), normalize_address(('localhost', 1234)))
+        self.assertEqual(('224.0.0.1', 0), normalize_address(('224.0.0.1', 0)))
+
+    def testIpv6 (self):
+        self.assertEqual(('::1', 1234, 0, 0), normalize_address(('::1', 1234, 0, 0)))
+        self.assertEqual(('fe80::1', 1234, 0, 3), normalize_address(('fe80:0::1', 1234, 0, 3)))
+
+    def testUnix (self):
+        self.assertEqual('/dev/null', normalize_address('/dev/null'))
+
+class Test_classify_address (unittest.TestCase):
+    def setUp (self):
+        address_cache.clear()
+        self.__getaddrinfo = socket.getaddrinfo
+        self.lookups = []
+        def getaddrinfo (*args):
+            self.lookups.append(args[0])
+            return self.__getaddrinfo(*args)
+        socket.getaddrinfo = getaddrinfo
+
+    def tearDown (self):
+        socket.getaddrinfo = self.__getaddrinfo
+        address_cache.clear()
+
+    def testNumeric (self):
+        self.assertEqual((('127.0.0.1', 1234), False), classify_address(('127.0.0.1', 1234)))
+        self.assertEqual((('224.0.0.1', 0), True), classify_address(('224.0.0.1', 0)))
+        self.assertEqual((('fe80::1', 1234, 0, 3), False), classify_address(('fe80:0::1', 1234, 0, 3)))
+        self.assertEqual((('ff02::1', 1234, 0, 0), True), classify_address(('ff02::1', 1234, 0, 0)))
+        self.assertEqual([], self.lookups)
+
+    def testName (self):
+        misses = address_cache.misses
+        self.assertEqual((('127.0.0.1', 1234), False), classify_address(('localhost', 1234)))
+        self.assertEqual(['localhost'], self.lookups)
+        self.assertEqual(('127.0.0.1', 1234), normalize_address(('localhost', 1234)))
+        self.assertFalse(is_multicast(('localhost', 1234)))
+        self.assertEqual(['localhost'], self.lookups)
+        # The normalized form is cached as well
+        self.assertEqual(('127.0.0.1', 1234), normalize_address(('127.0.0.1', 1234)))
+        self.assertEqual(1 + misses, address_cache.misses)
+
+    def testExpiry (self):
+        classify_address(('localhost', 1234))
+        address_cache.purge(time.time() + ADDRESS_CACHE_TTL)
+        classify_address(('localhost', 1234))
+        self.assertEqual(['localhost', 'localhost'], self.lookups)
+
+    def testInvalid (self):
+        self.assertRaises(ValueError, classify_address, ('127.0.0.1', 1234, 0))
+
+    def testThreads (self):
+        errors = []
+        def classify (base):
+            try:
+                for port in xrange(2000):
+                    classify_address(('127.0.0.1', base + port))
+            except Exception, e:
+                errors.append(e)
+        threads = [ threading.Thread(target=classify, args=(1000 * _i,)) for _i in xrange(8) ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual([], errors)
+        self.assertTrue(ADDRESS_CACHE_SIZE >= len(address_cache))
+
 class TestMessage (unittest.TestCase):
 
     def testConstants (self):
@@ -61,6 +134,103 @@ class TestMessage (unittest.TestCase):
         self.assertEqual(o.value, up.value)
         self.assertEqual(payload, msg.payload)
 
+    def testDecodeView (self):
+        packed = Message(Message.ACK, code=coapy.OK, payload='data', uri_path='s')._pack(0x4321)
+        buffer = bytearray(64)
+        buffer[:len(packed)] = packed
+        (txid, msg) = Message.decode(memoryview(buffer)[:len(packed)])
+        self.assertEqual(0x4321, txid)
+        self.assertEqual('s', msg.findOption(coapy.options.UriPath).value)
+        view = msg.payload_view
+        self.assertTrue(isinstance(view, memoryview))
+        self.assertEqual('data', view.tobytes())
+        buffer[len(packed)-4] = 'D'
+        self.assertEqual('Data', msg.payload)
+        buffer[len(packed)-4] = 'd'
+        self.assertEqual('Data', msg.payload)
+        self.assertEqual(packed.replace('data', 'Data'), msg._pack(0x4321))
+
+    def testDecodeLazy (self):
+        msg = Message(Message.CON, code=coapy.GET, uri_path='s', uri_host='host', etag='abcd')
+        # An over-long entity tag that is only detected when decoded
+        packed = msg._pack(0x4321).replace('\x44abcd', '\x45abcde')
+        self.assertRaises(ValueError, Message.decode, packed)
+        (txid, msg) = Message.decode(packed, lazy=True)
+        self.assertEqual(0x4321, txid)
+        self.assertEqual('s', msg.findOption(coapy.options.UriPath).value)
+        self.assertEqual('host', msg.findOption(coapy.options.UriHost.Type).value)
+        self.assertEqual(None, msg.findOption(coapy.options.MaxAge))
+        self.assertRaises(ValueError, msg.findOption, coapy.options.Etag)
+        msg.deleteOption(coapy.options.Etag)
+        self.assertEqual([coapy.options.UriHost.Type, coapy.options.UriPath.Type],
+                         [ _o.Type for _o in msg.options ])
+
+    def testDecodeLazyView (self):
+        packed = Message(Message.ACK, code=coapy.OK, payload='data', uri_path='s', etag='tag')._pack(0x4321)
+        buffer = bytearray(packed)
+        (txid, msg) = Message.decode(memoryview(buffer), lazy=True)
+        msg.replaceOption(coapy.options.Etag('new'))
+        msg._detach()
+        buffer[:] = '\0' * len(buffer)
+        self.assertEqual('s', msg.findOption(coapy.options.UriPath).value)
+        self.assertEqual('new', msg.findOption(coapy.options.Etag).value)
+        self.assertEqual('data', msg.payload)
+
+    def testCachedEncoding (self):
+        encode = coapy.options.encode
+        calls = []
+        def counting_encode (options, *args, **kw):
+            calls.append(None)
+            return encode(options, *args, **kw)
+        coapy.options.encode = counting_encode
+        try:
+            msg = Message(Message.CON, code=coapy.GET, uri_path='a', max_age=30)
+            p1 = msg._pack(1)
+            p2 = msg._pack(2)
+            self.assertEqual(1, len(calls))
+            self.assertEqual(p1[:2], p2[:2])
+            self.assertEqual(p1[4:], p2[4:])
+            self.assertEqual(2, Message.decode(p2)[0])
+            msg.addOption(coapy.options.UriHost('host'))
+            self.assertTrue('host' in msg._pack(3))
+            self.assertEqual(2, len(calls))
+            msg.payload = 'body'
+            self.assertTrue(msg._pack(4).endswith('body'))
+            msg.deleteOption(coapy.options.UriHost)
+            self.assertFalse('host' in msg._pack(5))
+            self.assertEqual(4, len(calls))
+            # Changing an option value in place is noticed
+            msg.findOption(coapy.options.UriPath).value = 'b'
+            (_, decoded) = Message.decode(msg._pack(6))
+            self.assertEqual('b', decoded.findOption(coapy.options.UriPath).value)
+            self.assertEqual(5, len(calls))
+        finally:
+            coapy.options.encode = encode
+
+    def testRepeatedOptions (self):
+        msg = Message(Message.CON, code=coapy.GET, uri_host='host', uri_path='a')
+        msg.addOption(coapy.options.UriPath('b'))
+        msg.addOption(coapy.options.UriQuery('x=1'))
+        msg.addOption(coapy.options.UriQuery('y=2'))
+        msg.addOption(coapy.options.MaxAge(30))
+        msg.addOption(coapy.options.MaxAge(40))
+        self.assertEqual(['a', 'b'], [ _o.value for _o in msg.findOptions(coapy.options.UriPath) ])
+        self.assertEqual(40, msg.findOption(coapy.options.MaxAge).value)
+        self.assertTrue(msg.build_uri().endswith('/a/b?x=1&y=2'))
+        packed = msg._pack(0x1234)
+        for lazy in (False, True):
+            (_, decoded) = Message.decode(packed, lazy)
+            self.assertEqual(['x=1', 'y=2'], [ _o.value for _o in decoded.findOptions(coapy.options.UriQuery.Type) ])
+            decoded.addOption(coapy.options.UriPath('c'))
+            self.assertEqual(['a', 'b', 'c'], [ _o.value for _o in decoded.findOptions(coapy.options.UriPath) ])
+            self.assertEqual([ _o.Type for _o in decoded.options ], sorted([ _o.Type for _o in decoded.options ]))
+        for segment in xrange(12):
+            msg.addOption(coapy.options.UriPath('s%d' % (segment,)))
+        self.assertRaises(ValueError, msg._pack, 0x1234)
+        msg.deleteOption(coapy.options.UriPath)
+        self.assertEqual([], msg.findOptions(coapy.options.UriPath))
+        self.assertRaises(KeyError, msg.deleteOption, coapy.options.UriPath)
+
     def testMultiOpt (self):
         msg = Message(Message.NON, uri_path='sense', uri_host='host', etag='sth',
         uri_port=5678)
@@ -74,6 +244,74 @@ class TestMessage (unittest.TestCase):
         self.assertEqual(coapy.options.UriPort.Type, opts[2].Type) #7
         self.assertEqual(coapy.options.UriPath.Type, opts[3].Type) # 9
 
+class TestRequestTemplate (unittest.TestCase):
+    def testUri (self):
+        template = RequestTemplate('coap://sensor.example.com:1234/a/b?x=1')
+        msg = template.message
+        self.assertEqual(Message.CON, msg.transaction_type)
+        self.assertEqual(coapy.GET, msg.code)
+        self.assertEqual('sensor.example.com', msg.findOption(coapy.options.UriHost).value)
+        self.assertEqual(1234, msg.findOption(coapy.options.UriPort).value)
+        self.assertEqual('a/b', msg.findOption(coapy.options.UriPath).value)
+        self.assertEqual('x=1', msg.findOption(coapy.options.UriQuery).value)
+        self.assertEqual(('sensor.example.com', 1234), template.remote)
+        self.assertEqual('coap://sensor.example.com:1234/a/b?x=1', msg.build_uri())
+
+    def testSegments (self):
+        uri = 'coap://host:5683/sensors/t%20h/1?rt=temp&if=core%20s&x'
+        msg = RequestTemplate(uri).message
+        self.assertEqual(['sensors/t h/1'], [ _o.value for _o in msg.findOptions(coapy.options.UriPath) ])
+        self.assertEqual(['rt=temp&if=core s&x'], [ _o.value for _o in msg.findOptions(coapy.options.UriQuery) ])
+        uri = 'coap://host:5683/sensors/temp/1?rt=temp&if=core&x'
+        self.assertEqual(uri, RequestTemplate(uri).message.build_uri())
+
+    def testMatchesMessage (self):
+        options = { 'uri_host' : 'sensor.example.com',
+                    'uri_port' : 61616,
+                    'uri_path' : 'building/3/floor/2/temperature',
+                    'uri_query' : 'unit=C&avg=60' }
+        template = RequestTemplate('coap://sensor.example.com:61616/building/3/floor/2/temperature?unit=C&avg=60')
+        for xid in (0, 7, 0xFFFF):
+            self.assertEqual(Message(Message.CON, code=coapy.GET, **options)._pack(xid), template.packet(xid))
+
+    def testDefaults (self):
+        template = RequestTemplate('coap://host')
+        self.assertEqual(('host', coapy.COAP_PORT), template.remote)
+        msg = template.message
+        self.assertEqual(None, msg.findOption(coapy.options.UriPort))
+        self.assertEqual(None, msg.findOption(coapy.options.UriPath))
+
+    def testPacket (self):
+        template = RequestTemplate('coap://[::1]:61616/r%20s', code=coapy.PUT, transaction_type=Message.NON,
+                                   payload='on', options=[ coapy.options.ContentType('text/csv') ])
+        self.assertEqual(('::1', 61616, 0, 0), template.remote)
+        expected = Message(Message.NON, code=coapy.PUT, payload='on', uri_host='::1', uri_port=61616,
+                           uri_path='r s', content_type='text/csv')
+        for xid in (0, 0x1234, 0xFFFF):
+            self.assertEqual(expected._pack(xid), template.packet(xid))
+
+    def testSend (self):
+        for (family, host, uri_host) in ( (socket.AF_INET, '127.0.0.1', '127.0.0.1'),
+                                          (socket.AF_INET6, '::1', '[::1]') ):
+            sfd = socket.socket(family, socket.SOCK_DGRAM)
+            ep = EndPoint(address_family=family)
+            try:
+                sfd.bind((host, 0))
+                sfd.settimeout(1)
+                ep.bind((host, 0))
+                template = RequestTemplate('coap://%s:%d/x' % (uri_host, sfd.getsockname()[1]), transaction_type=Message.NON)
+                tx_record = ep.send(template.message, template.remote)
+                ep.process(0)
+                (packed, _) = sfd.recvfrom(64)
+                self.assertEqual(template.packet(tx_record.transaction_id), packed)
+            finally:
+                sfd.close()
+                ep.socket.close()
+
+    def testInvalid (self):
+        self.assertRaises(ValueError, RequestTemplate, 'http://host/path')
+        self.assertRaises(ValueError, RequestTemplate, 'coap:///path')
+
 class TestEndPoint (unittest.TestCase):
 
     __endpoint = None
@@ -82,6 +320,7 @@ class TestEndPoint (unittest.TestCase):
 
     __RESPONSE_TIMEOUT = coapy.RESPONSE_TIMEOUT
     __MAX_RETRANSMIT = coapy.MAX_RETRANSMIT
+    __RESPONSE_RANDOM_FACTOR = coapy.RESPONSE_RANDOM_FACTOR
 
     __send_history = None
 
@@ -114,6 +353,7 @@ class TestEndPoint (unittest.TestCase):
         os.unlink(self.__address)
         coapy.RESPONSE_TIMEOUT = self.__RESPONSE_TIMEOUT
         coapy.MAX_RETRANSMIT = self.__MAX_RETRANSMIT
+        coapy.RESPONSE_RANDOM_FACTOR = self.__RESPONSE_RANDOM_FACTOR
 
     def testPoll (self):
         ep = self.__endpoint
@@ -126,6 +366,7 @@ class TestEndPoint (unittest.TestCase):
 
     def testReTransmit (self):
         coapy.RESPONSE_TIMEOUT = 0.010
+        coapy.RESPONSE_RANDOM_FACTOR = 1.0
         m = Message()
         ep = self.__endpoint
         xr = ep.send(m, self.__address)
@@ -162,6 +403,247 @@ class TestEndPoint (unittest.TestCase):
         rv = ep.process(0)
         self.assertEqual(xr.response_type, Message.ACK)
 
+    def testInitialTimeout (self):
+        coapy.RESPONSE_TIMEOUT = 0.010
+        ep = self.__endpoint
+        for i in xrange(20):
+            xr = ep.send(Message(), '%s.%d' % (self.__address, i))
+            ep.process(0)
+            delay = xr.next_event_time - xr.last_event_time
+            self.assertTrue(delay >= coapy.RESPONSE_TIMEOUT)
+            self.assertTrue(delay <= coapy.RESPONSE_TIMEOUT * coapy.RESPONSE_RANDOM_FACTOR)
+
+    def testRoundTrip (self):
+        coapy.RESPONSE_TIMEOUT = 0.5
+        ep = self.__endpoint
+        timeout = ep.peer(self.__address).timeout
+        self.assertEqual(coapy.RESPONSE_TIMEOUT, timeout.rto)
+        xr = ep.send(Message(), self.__address)
+        ep.process(0)
+        self.assertEqual(1, xr.transmission_count)
+        self._real_sendto(Message(Message.ACK)._pack(xr.transaction_id), self.__address)
+        rv = ep.process(0)
+        self.assertEqual(xr, rv.pertains_to)
+        self.assertTrue(timeout.strong.srtt is not None)
+        self.assertTrue(timeout.weak.srtt is None)
+        self.assertTrue(timeout.rto < coapy.RESPONSE_TIMEOUT)
+
+    def testNstart (self):
+        ep = self.__endpoint
+        peer = ep.peer(self.__address)
+        records = [ ep.send(Message(), self.__address) for _ in xrange(3) ]
+        records.append(ep.send(Message(Message.NON), self.__address))
+        self.assertEqual(1, peer.in_flight)
+        self.assertEqual(2, peer.queue_depth)
+        stats = ep.statistics
+        self.assertEqual(2, stats['queued'])
+        self.assertEqual(2, stats['queue_depth'])
+        ep.process(0)
+        self.assertEqual(2, len(self.__send_history))
+        self.assertEqual(records[0].packed, self.__send_history[0][1])
+        self.assertEqual(records[3].packed, self.__send_history[1][1])
+        for n in xrange(1, 3):
+            self._real_sendto(Message(Message.ACK)._pack(records[n-1].transaction_id), self.__address)
+            rv = ep.process(0)
+            self.assertEqual(records[n-1], rv.pertains_to)
+            ep.process(0)
+            self.assertEqual(2 + n, len(self.__send_history))
+            self.assertEqual(records[n].packed, self.__send_history[-1][1])
+        self.assertEqual(1, peer.in_flight)
+        self.assertEqual(0, peer.queue_depth)
+        stats = ep.statistics
+        self.assertEqual(2, stats['released'])
+        self.assertEqual(0, stats['queue_depth'])
+        self.assertEqual(2, stats['max_queue_depth'])
+        self.assertTrue(stats['max_queue_wait'] <= stats['total_queue_wait'])
+
+    def testNstartSetting (self):
+        self.assertEqual(coapy.NSTART, self.__endpoint.nstart)
+        ep = EndPoint(nstart=2)
+        self.assertEqual(2, ep.nstart)
+        self.assertRaises(ValueError, EndPoint, nstart=0)
+        self.assertRaises(ValueError, setattr, ep, 'nstart', 0)
+        ep.socket.close()
+        ep = self.__endpoint
+        other = self.__address + '.other'
+        peer = ep.peer(self.__address)
+        self.assertTrue(peer.nstart is None)
+        self.assertRaises(ValueError, setattr, peer, 'nstart', 0)
+        peer.nstart = 3
+        for _ in xrange(3):
+            ep.send(Message(), self.__address)
+            ep.send(Message(), other)
+        self.assertEqual(3, peer.in_flight)
+        self.assertEqual(0, peer.queue_depth)
+        self.assertEqual(1, ep.peer(other).in_flight)
+        self.assertEqual(2, ep.peer(other).queue_depth)
+        # The end-point limit applies to peers without an override
+        ep.nstart = 2
+        third = self.__address + '.third'
+        for _ in xrange(3):
+            ep.send(Message(), self.__address)
+            ep.send(Message(), third)
+        self.assertEqual(3, peer.queue_depth)
+        self.assertEqual(2, ep.peer(third).in_flight)
+        self.assertEqual(1, ep.peer(third).queue_depth)
+
+    def testMulticastTransactionId (self):
+        ep = self.__endpoint
+        group = normalize_address(('224.0.0.1', coapy.COAP_PORT))
+        tx_record = ep.send(Message(Message.NON), group)
+        # Responses to the multicast may come from any remote, so no
+        # unicast transmission may use its identifier
+        allocated = set([ ep._nextTransactionId(self.__address) for _ in xrange(0x10000) ])
+        self.assertEqual(0xFFFF, len(allocated))
+        self.assertFalse(tx_record.transaction_id in allocated)
+
+    def testRequest (self):
+        ep = self.__endpoint
+        self.assertRaises(ValueError, ep.request, Message(Message.NON), self.__address)
+        future = ep.request(Message(code=coapy.GET), self.__address)
+        self.assertFalse(future.done())
+        self.assertRaises(Exception, future.result)
+        completed = []
+        future.add_done_callback(completed.append)
+        ep.process(0)
+        tx_record = future.tx_record
+        self.assertEqual(tx_record.future, future)
+        # An unrelated message arrives before the response
+        self._real_sendto(Message()._pack(0x1234), self.__address)
+        self._real_sendto(Message(Message.ACK, code=coapy.OK)._pack(tx_record.transaction_id), self.__address)
+        unrelated = ep.wait([future], 1000)
+        self.assertTrue(future.done())
+        self.assertEqual([future], completed)
+        self.assertEqual(1, len(unrelated))
+        self.assertEqual(0x1234, unrelated[0].transaction_id)
+        rx_record = future.result()
+        self.assertEqual(coapy.OK, rx_record.message.code)
+        self.assertTrue(future.exception() is None)
+
+    def testRequestReset (self):
+        ep = self.__endpoint
+        future = ep.request(Message(code=coapy.GET), self.__address)
+        ep.process(0)
+        self._real_sendto(Message(Message.RST)._pack(future.tx_record.transaction_id), self.__address)
+        ep.wait([future], 1000)
+        self.assertTrue(isinstance(future.exception(), ResetError))
+        self.assertRaises(ResetError, future.result)
+
+    def testRequestTimeout (self):
+        coapy.RESPONSE_TIMEOUT = 0.001
+        coapy.MAX_RETRANSMIT = 2
+        ep = self.__endpoint
+        future = ep.request(Message(code=coapy.GET), self.__address)
+        ep.wait([future], 1000)
+        self.assertTrue(future.done())
+        self.assertTrue(isinstance(future.exception(), ResponseTimeout))
+        self.assertTrue(future.tx_record.is_unacknowledged)
+        self.assertEqual(2, len(self.__send_history))
+
+    def testCallbacks (self):
+        coapy.RESPONSE_TIMEOUT = 0.001
+        coapy.MAX_RETRANSMIT = 2
+        ep = self.__endpoint
+        ep.nstart = 3
+        ep.MAX_TX_HISTORY_SEC = 0.05
+        events = []
+        def on_response (tx_record, rx_record):
+            events.append(('response', tx_record, rx_record.message.transaction_type))
+        def on_reset (tx_record, rx_record):
+            events.append(('reset', tx_record, rx_record.message.transaction_type))
+        def on_timeout (tx_record):
+            events.append(('timeout', tx_record))
+        def on_expire (tx_record):
+            events.append(('expire', tx_record))
+        callbacks = dict(on_response=on_response, on_reset=on_reset, on_timeout=on_timeout, on_expire=on_expire)
+        acked = ep.send(Message(code=coapy.GET), self.__address, **callbacks)
+        reset = ep.send(Message(code=coapy.GET), self.__address, **callbacks)
+        lost = ep.send(Message(code=coapy.GET), self.__address, **callbacks)
+        self.assertTrue(on_expire is lost.on_expire)
+        ep.process(0)
+        self._real_sendto(Message(Message.ACK)._pack(acked.transaction_id), self.__address)
+        self._real_sendto(Message(Message.RST)._pack(reset.transaction_id), self.__address)
+        ep.process(0)
+        ep.process(0)
+        self.assertEqual([('response', acked, Message.ACK), ('reset', reset, Message.RST)], events)
+        del events[:]
+        end_time = time.time() + 1
+        while (3 > len([ _e for _e in events if 'expire' == _e[0] ])) and (time.time() < end_time):
+            ep.process(10)
+        self.assertEqual([('timeout', lost)], [ _e for _e in events if 'timeout' == _e[0] ])
+        self.assertEqual(set([acked, reset, lost]), set([ _e[1] for _e in events if 'expire' == _e[0] ]))
+
+    def testCallbackError (self):
+        ep = self.__endpoint
+        def on_response (tx_record, rx_record):
+            raise ValueError('application failure')
+        first = ep.send(Message(code=coapy.GET), self.__address, on_response=on_response)
+        second = ep.send(Message(code=coapy.GET), self.__address)
+        ep.process(0)
+        self.assertEqual(1, len(self.__send_history))
+        self._real_sendto(Message(Message.ACK)._pack(first.transaction_id), self.__address)
+        self.assertRaises(ValueError, ep.process, 0)
+        self.assertEqual(Message.ACK, first.response_type)
+        peer = ep.peer(self.__address)
+        self.assertEqual(1, peer.in_flight)
+        self.assertEqual(0, peer.queue_depth)
+        ep.process(0)
+        self.assertEqual(2, len(self.__send_history))
+        self.assertEqual(second.transaction_id, Message.decode(self.__send_history[-1][1])[0])
+
+    def testTransmittedStatistics (self):
+        ep = self.__endpoint
+        self._real_sendto(Message(code=coapy.GET)._pack(1), self.__address)
+        ep.process(0).ack()
+        ep.send(Message(Message.NON), self.__address)
+        ep.process(0)
+        self.assertEqual(2, len(self.__send_history))
+        stats = ep.statistics
+        self.assertEqual(1, stats['responses'])
+        self.assertEqual(1, stats['transmitted'])
+
+    def testPeerExpiry (self):
+        ep = self.__endpoint
+        other = self.__address + '.other'
+        busy = ep.peer(self.__address)
+        idle = ep.peer(other)
+        ep.send(Message(code=coapy.GET), self.__address)
+        now = time.time()
+        ep._runTimers(now)
+        # A peer used since the previous examination is retained
+        self.assertTrue(idle is ep.peer(other))
+        ep._runTimers(now + ep.MAX_PEER_IDLE_SEC)
+        ep._runTimers(now + 2 * ep.MAX_PEER_IDLE_SEC)
+        self.assertFalse(idle is ep.peer(other))
+        self.assertTrue(busy is ep.peer(self.__address))
+        self.assertEqual(1, busy.in_flight)
+
+    def testTransactionIdSpace (self):
+        ep = self.__endpoint
+        other = self.__address + '.other'
+        xids = set()
+        for _ in xrange(0x10000):
+            xids.add(ep.send(Message(), self.__address).transaction_id)
+        self.assertEqual(0x10000, len(xids))
+        self.assertRaises(Exception, ep.send, Message(), self.__address)
+        xr = ep.send(Message(), other)
+        self.assertEqual(other, xr.remote)
+
+    def testAckFromOtherRemote (self):
+        m = Message()
+        ep = self.__endpoint
+        xr = ep.send(m, self.__address)
+        ep.process(0)
+        ack = Message(Message.ACK)._pack(xr.transaction_id)
+        rx_record = ReceptionRecord(ep, ack, self.__address + '.other')
+        self.assertTrue(ep._findTransmission(rx_record) is None)
+        rx_record = ReceptionRecord(ep, ack, self.__address)
+        self.assertEqual(xr, ep._findTransmission(rx_record))
+        self._real_sendto(ack, self.__address)
+        rv = ep.process(0)
+        self.assertEqual(xr, rv.pertains_to)
+        self.assertEqual(Message.ACK, xr.response_type)
+
     def testReceive (self):
         m = Message()
         ep = self.__endpoint
@@ -182,7 +664,609 @@ class TestEndPoint (unittest.TestCase):
         (xid, ack) = Message.decode(packed)
         self.assertEqual(Message.ACK, ack.transaction_type)
         self.assertEqual(xid, transaction_id)
+
+    def testReceiveCopy (self):
+        ep = self.__endpoint
+        self.assertFalse(ep.zero_copy)
+        pool = ep.buffer_pool
+        ep.lazy_options = True
+        for xid in xrange(3):
+            self._real_sendto(Message(Message.NON, code=coapy.OK, payload='data', uri_path='p%d' % (xid,))._pack(xid), self.__address)
+        rxrs = [ ep.process(0) for _ in xrange(3) ]
+        self.assertEqual(1, len(pool))
+        self.assertEqual(2, pool.reused)
+        for (xid, rxr) in enumerate(rxrs):
+            self.assertEqual('data', rxr.message.payload)
+            self.assertEqual('p%d' % (xid,), rxr.message.findOption(coapy.options.UriPath).value)
+
+    def testReceiveBuffer (self):
+        ep = self.__endpoint
+        ep.zero_copy = True
+        pool = ep.buffer_pool
+        m = Message(Message.NON, code=coapy.OK, payload='data')
+        self._real_sendto(m._pack(1), self.__address)
+        rxr = ep.process(0)
+        self.assertEqual('data', rxr.message.payload_view.tobytes())
+        self.assertEqual(0, len(pool))
+        rxr.release()
+        self.assertEqual(1, len(pool))
+        self.assertEqual('data', rxr.message.payload)
+        rxr.release()
+        self.assertEqual(1, len(pool))
+        self._real_sendto(Message(Message.NON)._pack(2), self.__address)
+        rxr2 = ep.process(0)
+        self.assertEqual(1, pool.reused)
+        self.assertEqual('data', rxr.message.payload)
+
+    def testLazyOptions (self):
+        ep = self.__endpoint
+        self.assertFalse(ep.lazy_options)
+        ep.lazy_options = True
+        ep.zero_copy = True
+        m = Message(Message.NON, code=coapy.GET, uri_path='path', uri_query='q')
+        self._real_sendto(m._pack(1), self.__address)
+        rxr = ep.process(0)
+        self.assertEqual('path', rxr.message.findOption(coapy.options.UriPath).value)
+        rxr.release()
+        self._real_sendto(Message(Message.NON, code=coapy.GET, uri_path='x', uri_query='y')._pack(2), self.__address)
+        rxr2 = ep.process(0)
+        self.assertEqual('q', rxr.message.findOption(coapy.options.UriQuery).value)
+        self.assertEqual('y', rxr2.message.findOption(coapy.options.UriQuery).value)
+
+    def testProcessBatch (self):
+        ep = self.__endpoint
+        for xid in xrange(5):
+            self._real_sendto(Message(Message.NON)._pack(xid), self.__address)
+        rxrs = ep.process_batch(0, 2)
+        self.assertEqual([0, 1], [ _r.transaction_id for _r in rxrs ])
+        rxrs = ep.process_batch(0)
+        self.assertEqual([2, 3, 4], [ _r.transaction_id for _r in rxrs ])
+        self.assertEqual([], ep.process_batch(0))
+
+    def testMalformed (self):
+        ep = self.__endpoint
+        pool = ep.buffer_pool
+        truncated = Message(Message.NON, code=coapy.GET, uri_path='path')._pack(2)[:-2]
+        self._real_sendto(Message(Message.NON)._pack(1), self.__address)
+        self._real_sendto(truncated, self.__address)
+        self._real_sendto('\xc0\x00\x00\x03', self.__address)
+        self._real_sendto('', self.__address)
+        self._real_sendto(Message(Message.NON)._pack(5), self.__address)
+        rxrs = ep.process_batch(0)
+        self.assertEqual([1, 5], [ _r.transaction_id for _r in rxrs ])
+        self.assertEqual(3, ep.statistics['malformed'])
+        self.assertEqual(1, len(pool))
+
+    def testProcessBatchAcks (self):
+        ep = self.__endpoint
+        ep.nstart = 3
+        records = [ ep.send(Message(), self.__address) for _i in xrange(3) ]
+        ep.process(0)
+        self.assertEqual(3, len(self.__send_history))
+        for xr in records:
+            ack = Message(Message.ACK)._pack(xr.transaction_id)
+            self._real_sendto(ack, self.__address)
+        rxrs = ep.process_batch(0)
+        self.assertEqual(records, [ _r.pertains_to for _r in rxrs ])
+        self.assertEqual(0, ep.peer(self.__address).in_flight)
+
+    __sendError = None
+    def _failing_sendto (self, message, address):
+        if self.__sendError is not None:
+            raise socket.error(self.__sendError, os.strerror(self.__sendError))
+        return self._faked_sendto(message, address)
+
+    def testSendBlocked (self):
+        ep = self.__endpoint
+        ep.nstart = 3
+        self.__socket.sendto = self._failing_sendto
+        self.__sendError = errno.EAGAIN
+        records = [ ep.send(Message(), self.__address) for _i in xrange(3) ]
+        ep.process(0)
+        self.assertEqual(3, ep.outbound_depth)
+        self.assertTrue(0 < ep.statistics['blocked'])
+        self.assertEqual([0, 0, 0], [ _r.transmission_count for _r in records ])
+
+        # A response queued while blocked goes out first
+        self._real_sendto(Message()._pack(0x4321), self.__address)
+        rxr = ep.process(0)
+        rxr.ack()
+        self.assertEqual(4, ep.outbound_depth)
+
+        self.__sendError = None
+        ep.process(0)
+        self.assertEqual(0, ep.outbound_depth)
+        sent = [ Message.decode(_h[1]) for _h in self.__send_history ]
+        self.assertEqual((0x4321, Message.ACK), (sent[0][0], sent[0][1].transaction_type))
+        self.assertEqual([ _r.transaction_id for _r in records ], [ _s[0] for _s in sent[1:] ])
+        self.assertEqual([1, 1, 1], [ _r.transmission_count for _r in records ])
+
+    def testSendError (self):
+        ep = self.__endpoint
+        self.__socket.sendto = self._failing_sendto
+        self.__sendError = errno.ECONNREFUSED
+        xr = ep.send(Message(), self.__address)
+        ep.process(0)
+        self.assertEqual(0, ep.outbound_depth)
+        self.assertEqual(1, ep.statistics['send_errors'])
+        # Treated as a lost transmission, so it will be retried
+        self.assertEqual(1, xr.transmission_count)
+        self.assertTrue(0 < xr.transmissions_left)
+
+    def testAnsweredWhileQueued (self):
+        ep = self.__endpoint
+        self.__socket.sendto = self._failing_sendto
+        coapy.RESPONSE_TIMEOUT = 0.01
+        xr = ep.send(Message(), self.__address)
+        ep.process(0)
+        self.__sendError = errno.EAGAIN
+        time.sleep(0.05)
+        ep.process(0)
+        self.assertEqual(1, ep.outbound_depth)
+        self._real_sendto(Message(Message.ACK)._pack(xr.transaction_id), self.__address)
+        ep.process(0)
+        self.__sendError = None
+        ep.process(0)
+        self.assertEqual(0, ep.outbound_depth)
+        self.assertEqual(1, len(self.__send_history))
+
+    def testDuplicate (self):
+        ep = self.__endpoint
+        packed = Message(code=coapy.GET, uri_path='counter')._pack(0x1234)
+        self._real_sendto(packed, self.__address)
+        rxr = ep.process(0)
+        self.assertTrue(isinstance(rxr, ReceptionRecord))
+        self.assertEqual(0, ep.response_cache.hits)
+        self.assertEqual(1, ep.response_cache.misses)
+
+        # A retransmission before the response is sent is discarded
+        self._real_sendto(packed, self.__address)
+        self.assertTrue(ep.process(0) is None)
+        self.assertEqual(0, len(self.__send_history))
+        self.assertEqual(1, ep.response_cache.hits)
+
+        rxr.ack(Message(Message.ACK, code=coapy.OK, payload='42'))
+        self.assertEqual(1, len(self.__send_history))
+        response = self.__send_history[0][1]
+
+        # A retransmission after the response is sent gets the same response
+        self._real_sendto(packed, self.__address)
+        self.assertTrue(ep.process(0) is None)
+        self.assertEqual(2, len(self.__send_history))
+        self.assertEqual(response, self.__send_history[1][1])
+        self.assertEqual(2, ep.response_cache.hits)
+
+        # A new transaction is delivered
+        self._real_sendto(Message()._pack(0x1235), self.__address)
+        rxr = ep.process(0)
+        self.assertEqual(0x1235, rxr.transaction_id)
+        self.assertEqual(2, ep.response_cache.misses)
         
+class TestBatchEndPoint (unittest.TestCase):
+
+    def setUp (self):
+        if not coapy.mmsg.available:
+            self.skipTest('recvmmsg/sendmmsg not available')
+        self.client = EndPoint(batch_io=True)
+        self.client.bind(('127.0.0.1', 0))
+        self.server = EndPoint(batch_io=True)
+        self.server.bind(('127.0.0.1', 0))
+
+    def tearDown (self):
+        self.client.socket.close()
+        self.server.socket.close()
+
+    def testExchange (self):
+        client = self.client
+        server = self.server
+        self.assertTrue(client.batch_io)
+        remote = server.socket.getsockname()
+        records = [ client.send(Message(Message.NON, code=coapy.GET, uri_path='n%d' % (_i,)), remote) for _i in xrange(100) ]
+        future = client.request(Message(code=coapy.GET, uri_path='c'), remote)
+        client.process(0)
+        rxrs = []
+        while len(rxrs) < 101:
+            batch = server.process_batch(1000)
+            self.assertTrue(0 < len(batch))
+            rxrs.extend(batch)
+        self.assertEqual(set([ _r.transaction_id for _r in records ] + [ future.tx_record.transaction_id ]),
+                         set([ _r.transaction_id for _r in rxrs ]))
+        for rxr in rxrs:
+            if Message.CON == rxr.message.transaction_type:
+                rxr.ack(Message(Message.ACK, code=coapy.OK))
+        client.wait([future], 1000)
+        self.assertEqual(coapy.OK, future.result().message.code)
+
+class TestForeignLoop (unittest.TestCase):
+
+    __RESPONSE_TIMEOUT = coapy.RESPONSE_TIMEOUT
+    __MAX_RETRANSMIT = coapy.MAX_RETRANSMIT
+
+    def setUp (self):
+        self.client = EndPoint()
+        self.client.bind(('127.0.0.1', 0))
+        self.server = EndPoint()
+        self.server.bind(('127.0.0.1', 0))
+
+    def tearDown (self):
+        self.client.socket.close()
+        self.server.socket.close()
+        coapy.RESPONSE_TIMEOUT = self.__RESPONSE_TIMEOUT
+        coapy.MAX_RETRANSMIT = self.__MAX_RETRANSMIT
+
+    def drive (self, until, timeout=5.0):
+        """Drive both end-points with select until *until* returns
+        true, returning the records received."""
+        end_points = (self.client, self.server)
+        rx_records = []
+        end_time = time.time() + timeout
+        while not until():
+            now = time.time()
+            self.assertTrue(now < end_time)
+            readers = { }
+            for ep in end_points:
+                for fd in ep.filenos():
+                    readers[fd] = ep
+            writers = dict([ (_ep.fileno(), _ep) for _ep in end_points if _ep.wants_write ])
+            wait = end_time - now
+            for ep in end_points:
+                if ep.next_deadline is not None:
+                    wait = min(wait, max(0, ep.next_deadline - now))
+            (readable, writable, _) = select.select(readers.keys(), writers.keys(), [], wait)
+            for fd in writable:
+                writers[fd].on_writable()
+            for fd in readable:
+                rx_records.extend(readers[fd].on_readable(fd))
+            now = time.time()
+            for ep in end_points:
+                if (ep.next_deadline is not None) and (ep.next_deadline <= now):
+                    ep.on_timer(now)
+        return rx_records
+
+    def testExchange (self):
+        client = self.client
+        self.assertEqual(client.socket.fileno(), client.fileno())
+        self.assertEqual([client.fileno()], client.filenos())
+        self.assertTrue(client.next_deadline is None)
+        future = client.request(Message(code=coapy.GET), self.server.socket.getsockname())
+        self.assertTrue(client.next_deadline <= time.time())
+        self.assertFalse(client.wants_write)
+        client.on_timer()
+        self.assertTrue(client.wants_write)
+        self.assertTrue(client.on_writable())
+        self.assertFalse(client.wants_write)
+        def serve ():
+            for rx_record in self.server.on_readable():
+                rx_record.ack(Message(Message.ACK, code=coapy.OK))
+            return future.done()
+        self.drive(serve)
+        self.assertEqual(coapy.OK, future.result().message.code)
+        # Only the expiry of the record remains
+        self.assertTrue(client.next_deadline > time.time() + 1)
+
+    def testTimeout (self):
+        coapy.RESPONSE_TIMEOUT = 0.01
+        coapy.MAX_RETRANSMIT = 3
+        timeouts = []
+        self.client.send(Message(code=coapy.GET), self.server.socket.getsockname(),
+                         on_timeout=timeouts.append)
+        rx_records = self.drive(lambda: timeouts)
+        # The server recognizes the retransmissions as duplicates
+        self.assertEqual(1, len([ _r for _r in rx_records if _r.end_point is self.server ]))
+        self.assertEqual(2, self.server.statistics['duplicates'])
+        self.assertEqual(3, timeouts[0].transmission_count)
+
+    def testWakeupListener (self):
+        changed = []
+        self.client.setWakeupListener(changed.append)
+        self.client.send(Message(Message.NON, code=coapy.GET), self.server.socket.getsockname())
+        self.assertEqual([self.client], changed)
+
+class Test_interface_index (unittest.TestCase):
+    def testLoopback (self):
+        index = interface_index(socket.AF_INET, '127.0.0.1')
+        self.assertTrue(isinstance(index, int))
+        self.assertEqual(index, interface_index(socket.AF_INET, '127.0.0.1'))
+        self.assertEqual(None, interface_index(socket.AF_INET, '192.0.2.254'))
+
+class TestDiscovery (unittest.TestCase):
+    def setUp (self):
+        self.ep = EndPoint()
+        self.ep.bind(('127.0.0.1', 0))
+        self.client = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.client.bind(('127.0.0.1', 0))
+        self.client.setsockopt(socket.SOL_IP, socket.IP_MULTICAST_IF, socket.inet_aton('127.0.0.1'))
+        self.client.settimeout(2)
+
+    def tearDown (self):
+        self.client.close()
+        if self.ep.discovery_socket is not None:
+            self.ep.discovery_socket.close()
+        self.ep.socket.close()
+
+    def testSingleSocket (self):
+        self.assertTrue(self.ep.discovery_socket is None)
+        filenos = self.ep.filenos()
+        self.ep.bindDiscovery('127.0.0.1')
+        dfd = self.ep.discovery_socket
+        self.assertEqual(socket.AF_INET, dfd.family)
+        self.assertEqual(coapy.COAP_PORT, dfd.getsockname()[1])
+        self.assertEqual(1 + len(filenos), len(self.ep.filenos()))
+        self.client.sendto(Message()._pack(4321), ('224.0.0.1', coapy.COAP_PORT))
+        self.assertTrue(self.ep.process(200) is None)
+        (packed, remote) = self.client.recvfrom(1024)
+        self.assertEqual(self.ep.socket.getsockname(), remote)
+        (transaction_id, msg) = Message.decode(packed)
+        self.assertEqual(4321, transaction_id)
+        self.assertEqual(Message.RST, msg.transaction_type)
+        stats = self.ep.statistics
+        self.assertEqual(1, stats['discovery_received'])
+        self.assertEqual(0, stats['discovery_filtered'])
+
+    def testFilter (self):
+        if not coapy.mmsg.pktinfo_available:
+            self.skipTest('recvmsg not available')
+        interface_index(socket.AF_INET, '127.0.0.1')
+        others = [ socket.inet_ntop(_f, _a) for (_f, _a) in coapy.connection._interfaceIndexes
+                   if (socket.AF_INET == _f) and not _a.startswith('\x7f') ]
+        if not others:
+            self.skipTest('no non-loopback interface')
+        # Join through another interface, then send through the
+        # loopback interface.
+        self.ep.bindDiscovery(others[0])
+        self.client.sendto(Message()._pack(4321), ('224.0.0.1', coapy.COAP_PORT))
+        self.assertTrue(self.ep.process(200) is None)
+        stats = self.ep.statistics
+        self.assertEqual(1, stats['discovery_filtered'])
+        self.assertEqual(0, stats['discovery_received'])
+
+    def testFilterUnicast (self):
+        if not coapy.mmsg.pktinfo_available:
+            self.skipTest('recvmsg not available')
+        ep = EndPoint(socket.AF_INET6)
+        client = socket.socket(socket.AF_INET6, socket.SOCK_DGRAM)
+        try:
+            try:
+                ep.bind(('::1', 0))
+                client.bind(('::1', 0))
+            except socket.error:
+                self.skipTest('IPv6 loopback not available')
+            # The IPv6 discovery socket is bound to the unspecified
+            # address, so receives unicast to the CoAP port as well
+            ep.bindDiscovery('::1')
+            client.sendto(Message()._pack(4321), ('::1', coapy.COAP_PORT))
+            self.assertTrue(ep.process(200) is None)
+            stats = ep.statistics
+            self.assertEqual(1, stats['discovery_filtered'])
+            self.assertEqual(0, stats['discovery_received'])
+        finally:
+            client.close()
+            if ep.discovery_socket is not None:
+                ep.discovery_socket.close()
+            ep.socket.close()
+
+class TestDiscoveryLeisure (unittest.TestCase):
+    def setUp (self):
+        self.ep = EndPoint()
+        self.ep.bind(('127.0.0.1', 0))
+        self.client = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.client.bind(('127.0.0.1', 0))
+        self.client.settimeout(2)
+        self.remote = self.client.getsockname()
+        self.packed = Message()._pack(1234)
+
+    def tearDown (self):
+        self.client.close()
+        self.ep.socket.close()
+
+    def testImmediate (self):
+        self.assertEqual(0, self.ep.discovery_leisure)
+        # The same message received through two interfaces
+        self.assertTrue(self.ep._handleDatagram(self.packed, self.remote, True) is None)
+        self.assertTrue(self.ep._handleDatagram(self.packed, self.remote, True) is None)
+        (transaction_id, msg) = Message.decode(self.client.recv(1024))
+        self.assertEqual(1234, transaction_id)
+        self.assertEqual(Message.RST, msg.transaction_type)
+        self.assertEqual(0, self.ep.outbound_depth)
+        stats = self.ep.statistics
+        self.assertEqual(2, stats['discovery_received'])
+        self.assertEqual(1, stats['discovery_suppressed'])
+        self.assertEqual(1, stats['discovery_responses'])
+        self.assertEqual(0, stats['duplicates'])
+
+    def testNonConfirmable (self):
+        self.ep.discovery_leisure = 0.05
+        packed = Message(Message.NON)._pack(1234)
+        self.ep._handleDatagram(packed, self.remote, True)
+        self.ep._handleDatagram(packed, self.remote, True)
+        stats = self.ep.statistics
+        self.assertEqual(0, stats['discovery_delayed'])
+        self.assertEqual(1, stats['discovery_suppressed'])
+        self.ep._handleDatagram(Message(Message.RST)._pack(1235), self.remote, True)
+        self.assertEqual(0, self.ep.statistics['discovery_delayed'])
+        self.assertTrue(self.ep.next_deadline is None)
+
+    def testImmediateNonConfirmable (self):
+        self.assertEqual(0, self.ep.discovery_leisure)
+        for tt in (Message.NON, Message.ACK, Message.RST):
+            self.assertTrue(self.ep._handleDatagram(Message(tt)._pack(1234 + tt), self.remote, True) is None)
+        stats = self.ep.statistics
+        self.assertEqual(3, stats['discovery_received'])
+        self.assertEqual(0, stats['discovery_responses'])
+        self.assertEqual(0, self.ep.outbound_depth)
+        self.client.settimeout(0.1)
+        self.assertRaises(socket.timeout, self.client.recv, 1024)
+
+    def testLeisure (self):
+        self.assertRaises(ValueError, setattr, self.ep, 'discovery_leisure', -1)
+        self.ep.discovery_leisure = 0.2
+        then = time.time()
+        self.ep._handleDatagram(self.packed, self.remote, True)
+        self.ep._handleDatagram(self.packed, self.remote, True)
+        self.assertEqual(1, self.ep.statistics['discovery_delayed'])
+        self.assertEqual(0, self.ep.statistics['discovery_responses'])
+        deadline = self.ep.next_deadline
+        self.assertTrue(then <= deadline <= (then + 0.25))
+        while 0 == self.ep.statistics['discovery_responses']:
+            self.assertTrue(self.ep.process(500) is None)
+            self.assertTrue(2 > (time.time() - then))
+        self.assertTrue(time.time() >= deadline)
+        (transaction_id, msg) = Message.decode(self.client.recv(1024))
+        self.assertEqual(1234, transaction_id)
+        self.assertEqual(Message.RST, msg.transaction_type)
+        self.assertEqual(1, self.ep.statistics['discovery_suppressed'])
+        self.assertTrue(self.ep.next_deadline is None)
+
+class TestGroupRequest (unittest.TestCase):
+    GROUP = '224.0.0.1'
+
+    def setUp (self):
+        self.group_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.group_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.group_socket.bind((self.GROUP, 0))
+        self.group_port = self.group_socket.getsockname()[1]
+        mreq = socket.inet_aton(self.GROUP) + socket.inet_aton('127.0.0.1')
+        self.group_socket.setsockopt(socket.SOL_IP, socket.IP_ADD_MEMBERSHIP, mreq)
+        self.responders = []
+        for _ in xrange(3):
+            sfd = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            sfd.bind(('127.0.0.1', 0))
+            self.responders.append(sfd)
+        self.ep = EndPoint()
+        self.ep.bind(('127.0.0.1', 0))
+        self.ep.socket.setsockopt(socket.SOL_IP, socket.IP_MULTICAST_IF, socket.inet_aton('127.0.0.1'))
+
+    def tearDown (self):
+        self.group_socket.close()
+        for sfd in self.responders:
+            sfd.close()
+        self.ep.socket.close()
+
+    def respond (self, repeat_first=False, reset=False):
+        """Answer the next group message from each responder."""
+        (packed, remote) = self.group_socket.recvfrom(1024)
+        (transaction_id,) = struct.unpack('!H', packed[2:4])
+        if reset:
+            ack = Message(Message.RST)._pack(transaction_id)
+        else:
+            ack = Message(Message.ACK, code=coapy.OK)._pack(transaction_id)
+        for sfd in self.responders:
+            sfd.sendto(ack, remote)
+        if repeat_first:
+            self.responders[0].sendto(ack, remote)
+
+    def start (self, **kw):
+        thread = threading.Thread(target=self.respond, kwargs=kw)
+        thread.start()
+        return thread
+
+    def testUnicast (self):
+        self.assertRaises(ValueError, self.ep.groupRequest, Message(), ('127.0.0.1', self.group_port))
+
+    def testWindow (self):
+        remote = (self.GROUP, self.group_port)
+        too_long = 1000 * self.ep.MAX_TX_HISTORY_SEC + 1
+        self.assertRaises(ValueError, self.ep.groupRequest, Message(), remote, too_long)
+
+    def testCloseThreaded (self):
+        self.ep.enableThreading()
+        group = self.ep.groupRequest(Message(), (self.GROUP, self.group_port), 300)
+        group.close()
+        self.assertTrue(group.closed)
+        self.assertEqual([], list(group))
+
+    def testCollect (self):
+        thread = self.start(repeat_first=True)
+        group = self.ep.groupRequest(Message(), (self.GROUP, self.group_port), 300)
+        rx_records = list(group)
+        thread.join()
+        self.assertTrue(group.closed)
+        self.assertEqual(3, len(rx_records))
+        remotes = set([ _sfd.getsockname() for _sfd in self.responders ])
+        self.assertEqual(remotes, set([ _rx.remote for _rx in rx_records ]))
+        self.assertEqual(remotes, group.remotes)
+        self.assertEqual(1, group.duplicates)
+        for rx_record in rx_records:
+            self.assertTrue(rx_record.pertains_to is group.tx_record)
+        self.assertEqual(1, len(group.tx_record.responses))
+        # Late responses are no longer matched
+        self.assertTrue(self.ep._findTransmission(rx_records[0]) is None)
+
+    def testReset (self):
+        thread = self.start(reset=True)
+        group = self.ep.groupRequest(Message(), (self.GROUP, self.group_port), 300)
+        rx_records = list(group)
+        thread.join()
+        self.assertEqual(3, len(rx_records))
+        self.assertEqual([Message.RST] * 3, [ _rx.message.transaction_type for _rx in rx_records ])
+
+    def testLimit (self):
+        thread = self.start()
+        group = self.ep.groupRequest(Message(), (self.GROUP, self.group_port), 10000, max_responses=2)
+        then = time.time()
+        rx_records = list(group)
+        thread.join()
+        self.assertTrue(5 > (time.time() - then))
+        self.assertEqual(2, len(rx_records))
+        self.assertTrue(group.closed)
+
+    def testUnrelated (self):
+        thread = self.start()
+        saved = GroupRequest.MAX_UNRELATED
+        GroupRequest.MAX_UNRELATED = 2
+        try:
+            group = self.ep.groupRequest(Message(), (self.GROUP, self.group_port), 300)
+        finally:
+            GroupRequest.MAX_UNRELATED = saved
+        for xid in xrange(5):
+            self.responders[0].sendto(Message(Message.NON)._pack(xid), self.ep.socket.getsockname())
+        rx_records = list(group)
+        thread.join()
+        self.assertEqual(3, len(rx_records))
+        self.assertEqual([3, 4], [ _rx.transaction_id for _rx in group.unrelated ])
+        self.assertEqual(3, group.unrelated_discarded)
+
+class _CountingPoller (coapy.poller.PollPoller):
+    def __init__ (self):
+        super(_CountingPoller, self).__init__()
+        self.calls = []
+    def register (self, fd, events):
+        self.calls.append(('register', events))
+        super(_CountingPoller, self).register(fd, events)
+    def modify (self, fd, events):
+        self.calls.append(('modify', events))
+        super(_CountingPoller, self).modify(fd, events)
+
+class TestPoller (unittest.TestCase):
+
+    def setUp (self):
+        self.poller = _CountingPoller()
+        self.client = EndPoint(poller=self.poller)
+        self.client.bind(('127.0.0.1', 0))
+        self.server = EndPoint()
+        self.server.bind(('127.0.0.1', 0))
+
+    def tearDown (self):
+        self.client.socket.close()
+        self.server.socket.close()
+
+    def testWriteInterest (self):
+        client = self.client
+        remote = self.server.socket.getsockname()
+        self.assertEqual([('register', coapy.poller.READ)], self.poller.calls)
+        del self.poller.calls[:]
+        for i in xrange(3):
+            client.process(0)
+        self.assertEqual([], self.poller.calls)
+        for i in xrange(3):
+            client.send(Message(Message.NON, code=coapy.GET), remote)
+        client.process(0)
+        self.assertEqual([('modify', coapy.poller.READ | coapy.poller.WRITE)], self.poller.calls)
+        self.assertEqual(3, len(self.server.process_batch(1000)))
+        client.process(0)
+        client.process(0)
+        self.assertEqual([('modify', coapy.poller.READ | coapy.poller.WRITE),
+                          ('modify', coapy.poller.READ)], self.poller.calls)
 
 if __name__ == '__main__':
     unittest.main()
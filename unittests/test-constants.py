@@ -6,6 +6,8 @@ class TestConstants (unittest.TestCase):
         self.assertEqual(61616, COAP_PORT)
         self.assertEqual(1, RESPONSE_TIMEOUT)
         self.assertEqual(5, MAX_RETRANSMIT)
+        self.assertEqual(1.5, RESPONSE_RANDOM_FACTOR)
+        self.assertEqual(1, NSTART)
                          
 
 if __name__ == '__main__':
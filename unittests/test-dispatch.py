@@ -0,0 +1,109 @@
+import unittest
+import threading
+import time
+import coapy
+from coapy.connection import *
+from coapy.dispatch import *
+
+class TestDispatcher (unittest.TestCase):
+
+    def setUp (self):
+        self.server = EndPoint()
+        self.server.bind(('127.0.0.1', 0))
+        # Allow several requests to the server at once
+        self.client = EndPoint(nstart=4)
+        self.client.bind(('127.0.0.1', 0))
+        self.remote = self.server.socket.getsockname()
+        self.dispatcher = None
+        self.running = False
+
+    def tearDown (self):
+        self.running = False
+        if self.dispatcher is not None:
+            self.loop.join()
+            self.dispatcher.stop()
+        self.server.socket.close()
+        self.client.socket.close()
+
+    def start (self, handler, timeout_ms=50, **kw):
+        self.dispatcher = Dispatcher(self.server, handler, **kw)
+        self.running = True
+        def loop ():
+            while self.running:
+                self.dispatcher.process(timeout_ms)
+        self.loop = threading.Thread(target=loop)
+        self.loop.start()
+        return self.dispatcher
+
+    def testHandle (self):
+        def handler (rx_record):
+            time.sleep(0.1)
+            rx_record.ack(Message(Message.ACK, code=coapy.OK, payload=threading.current_thread().name))
+        dispatcher = self.start(handler, workers=4)
+        self.assertTrue(self.server.threading_enabled)
+        futures = [ self.client.request(Message(code=coapy.GET), self.remote) for _i in xrange(4) ]
+        start = time.time()
+        self.client.wait(futures, 5000)
+        # Handlers ran concurrently
+        self.assertTrue(0.35 > (time.time() - start))
+        names = set()
+        for future in futures:
+            self.assertEqual(coapy.OK, future.result().message.code)
+            names.add(future.result().message.payload)
+        self.assertTrue(1 < len(names))
+        dispatcher.join()
+        stats = dispatcher.statistics
+        self.assertEqual(4, stats['dispatched'])
+        self.assertEqual(4, stats['handled'])
+        self.assertEqual(0, stats['queue_depth'])
+        self.assertTrue(0.1 <= stats['max_handler_time'])
+        self.assertTrue(0.4 <= stats['total_handler_time'])
+
+    def testSendFromWorker (self):
+        def handler (rx_record):
+            rx_record.end_point.send(Message(Message.NON, code=coapy.OK), rx_record.remote)
+        self.start(handler, timeout_ms=10000)
+        # Let the loop settle into a long wait
+        time.sleep(0.1)
+        self.client.send(Message(Message.NON, code=coapy.GET), self.remote)
+        start = time.time()
+        rx_record = self.client.process(2000)
+        self.assertTrue(rx_record is not None)
+        self.assertEqual(coapy.OK, rx_record.message.code)
+        self.assertTrue(1.0 > (time.time() - start))
+        # Wake the loop so it can notice it should stop
+        self.running = False
+        self.client.send(Message(Message.NON, code=coapy.GET), self.remote)
+        self.client.process(0)
+
+    def testRejected (self):
+        release = threading.Event()
+        def handler (rx_record):
+            release.wait(5)
+            rx_record.ack()
+        dispatcher = self.start(handler, workers=1, max_queue=1)
+        futures = [ self.client.request(Message(code=coapy.GET), self.remote) for _i in xrange(3) ]
+        end_time = time.time() + 5
+        while (0 == dispatcher.statistics['rejected']) and (time.time() < end_time):
+            self.client.process(10)
+        self.assertTrue(0 < dispatcher.statistics['rejected'])
+        release.set()
+        self.client.wait(futures, 5000)
+        self.assertTrue([ _f for _f in futures if isinstance(_f.exception(), ResetError) ])
+
+    def testError (self):
+        def handler (rx_record):
+            raise Exception('handler failure')
+        errors = []
+        def on_error (rx_record, exc_info):
+            errors.append((rx_record.message.code, str(exc_info[1])))
+        dispatcher = self.start(handler, on_error=on_error)
+        future = self.client.request(Message(code=coapy.GET), self.remote)
+        self.client.wait([future], 5000)
+        self.assertTrue(isinstance(future.exception(), ResetError))
+        dispatcher.join()
+        self.assertEqual(1, dispatcher.statistics['errors'])
+        self.assertEqual([(coapy.GET, 'handler failure')], errors)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,128 @@
+import unittest
+import socket
+import struct
+import os
+from coapy.mmsg import *
+
+class Test_sockaddr (unittest.TestCase):
+    def testIpv4 (self):
+        addr = ('127.0.0.1', 5683)
+        raw = encode_sockaddr(socket.AF_INET, addr)
+        self.assertEqual(16, len(raw))
+        self.assertEqual(addr, decode_sockaddr(raw, len(raw)))
+
+    def testIpv6 (self):
+        addr = ('fe80::1', 5683, 7, 2)
+        raw = encode_sockaddr(socket.AF_INET6, addr)
+        self.assertEqual(28, len(raw))
+        self.assertEqual(addr, decode_sockaddr(raw, len(raw)))
+
+    def testUnix (self):
+        raw = encode_sockaddr(socket.AF_UNIX, '/tmp/sock')
+        self.assertEqual('/tmp/sock', decode_sockaddr(raw + '\0\0', len(raw) + 1))
+
+class TestBatch (unittest.TestCase):
+
+    def setUp (self):
+        if not available:
+            self.skipTest('recvmmsg/sendmmsg not available')
+        self.rfd = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.rfd.bind(('127.0.0.1', 0))
+        self.rfd.setblocking(0)
+        self.sfd = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sfd.bind(('127.0.0.1', 0))
+
+    def tearDown (self):
+        self.rfd.close()
+        self.sfd.close()
+
+    def testRoundTrip (self):
+        sender = BatchSender(self.sfd, 4)
+        receiver = BatchReceiver(self.rfd, 8)
+        self.assertEqual([], receiver.receive())
+        packets = [ ('packet %d' % (_i,), self.rfd.getsockname()) for _i in xrange(10) ]
+        self.assertEqual(10, sender.send(packets))
+        received = receiver.receive()
+        self.assertEqual(8, len(received))
+        received.extend(receiver.receive(5))
+        self.assertEqual(10, len(received))
+        self.assertEqual([ _p[0] for _p in packets ], [ _r[0] for _r in received ])
+        for (_, address) in received:
+            self.assertEqual(self.sfd.getsockname(), address)
+        self.assertEqual([], receiver.receive())
+
+    def testLimit (self):
+        sender = BatchSender(self.sfd)
+        receiver = BatchReceiver(self.rfd)
+        sender.send([ ('x', self.rfd.getsockname()) ] * 3)
+        self.assertEqual(2, len(receiver.receive(2)))
+        self.assertEqual(1, len(receiver.receive(2)))
+
+    def testNameEviction (self):
+        others = [ socket.socket(socket.AF_INET, socket.SOCK_DGRAM) for _ in xrange(2) ]
+        try:
+            for sfd in others:
+                sfd.bind(('127.0.0.1', 0))
+            sender = BatchSender(self.sfd, 4)
+            for port in xrange(1022):
+                sender._encodeName(('127.0.0.2', 1 + port))
+            destinations = [ self.rfd ] + others
+            packets = [ ('to %d' % (_i,), _s.getsockname()) for (_i, _s) in enumerate(destinations) ]
+            self.assertEqual(3, sender.send(packets))
+            for (i, sfd) in enumerate(destinations):
+                self.assertEqual(('to %d' % (i,), self.sfd.getsockname()), sfd.recvfrom(64))
+        finally:
+            for sfd in others:
+                sfd.close()
+
+class TestPacketInfo (unittest.TestCase):
+
+    def setUp (self):
+        if not pktinfo_available:
+            self.skipTest('recvmsg not available')
+        self.rfd = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.rfd.bind(('127.0.0.1', 0))
+        self.sfd = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sfd.bind(('127.0.0.1', 0))
+
+    def tearDown (self):
+        self.rfd.close()
+        self.sfd.close()
+
+    def testReceive (self):
+        receiver = PacketInfoReceiver(self.rfd, 64)
+        self.assertEqual(None, receiver.receive())
+        self.sfd.sendto('first', self.rfd.getsockname())
+        self.sfd.sendto('second', self.rfd.getsockname())
+        (data, address, if_index, destination) = receiver.receive()
+        self.assertEqual('first', data)
+        self.assertEqual(self.sfd.getsockname(), address)
+        # The loopback interface
+        self.assertTrue(isinstance(if_index, int))
+        self.assertTrue(0 < if_index)
+        self.assertEqual('127.0.0.1', destination)
+        self.assertEqual(('second', address, if_index, destination), receiver.receive())
+        self.assertEqual(None, receiver.receive())
+
+    def testDecodeAligned (self):
+        import coapy.mmsg
+        header = coapy.mmsg._CMSGHDR
+        # CMSG_ALIGN rounds to the size of size_t
+        alignment = struct.calcsize('@P')
+        first_len = header.size + 20
+        control = header.pack(first_len, socket.IPPROTO_IPV6, 99) + '\0' * 20
+        control += '\0' * (-first_len % alignment)
+        destination = socket.inet_pton(socket.AF_INET6, 'ff02::1')
+        control += header.pack(header.size + 20, socket.IPPROTO_IPV6, IPV6_PKTINFO) + destination + struct.pack('=I', 7)
+        self.assertEqual((7, 'ff02::1'), decode_pktinfo(control, len(control)))
+
+    def testDecodeIPv4 (self):
+        import coapy.mmsg
+        header = coapy.mmsg._CMSGHDR
+        pktinfo = struct.pack('=i', 3) + socket.inet_aton('192.0.2.1') + socket.inet_aton('224.0.0.1')
+        control = header.pack(header.size + len(pktinfo), socket.SOL_IP, IP_PKTINFO) + pktinfo
+        self.assertEqual((3, '224.0.0.1'), decode_pktinfo(control, len(control)))
+        self.assertEqual(None, decode_pktinfo('', 0))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -265,6 +265,34 @@ class TestEncode (unittest.TestCase):
         self.assertEqual(3, num_options)
         self.assertEqual('\x11\x28\x11\x1e\x71\x73', packed)
 
+    def testRepeated (self):
+        options = [ UriPath('a'), MaxAge(30), UriPath('b') ]
+        self.assertEqual((3, '\x21\x1e\x71a\x01b'), encode(options))
+        self.assertEqual((3, '\x21\x1e\x71a\x01b'), encode(options[1:2] + options[0:1] + options[2:], presorted=True))
+
+    def testFencepost (self):
+        self.assertEqual((2, '\xe0\x13x=1'), encode([ UriQuery('x=1') ]))
+        self.assertEqual((2, '\x91a\x63x=1'), encode([ UriPath('a'), UriQuery('x=1') ]))
+
+class TestOptionList (unittest.TestCase):
+    def testOrder (self):
+        ol = OptionList([ UriPath('a'), MaxAge(30), ContentType('video/raw'), UriPath('b') ])
+        self.assertEqual(4, len(ol))
+        self.assertEqual([1, 2, 9, 9], [ _o.Type for _o in ol ])
+        self.assertEqual(['a', 'b'], [ _o.value for _o in ol.findAll(UriPath.Type) ])
+        self.assertEqual('a', ol.find(UriPath.Type).value)
+        self.assertEqual(encode(ol), encode(ol, presorted=True))
+
+    def testReplaceRemove (self):
+        ol = OptionList([ UriPath('a'), UriPath('b'), MaxAge(30) ])
+        ol.replace(UriPath('c'))
+        self.assertEqual(['c'], [ _o.value for _o in ol.findAll(UriPath.Type) ])
+        self.assertEqual(1, ol.remove(MaxAge.Type))
+        self.assertEqual(0, ol.remove(MaxAge.Type))
+        self.assertTrue(ol.find(MaxAge.Type) is None)
+        self.assertEqual([], ol.findAll(Etag.Type))
+        self.assertEqual(1, len(ol))
+
 class TestDecode (unittest.TestCase):
     def testEmpty (self):
         packed = 'any string'
@@ -339,6 +367,33 @@ class TestDecode (unittest.TestCase):
         self.assertTrue(isinstance(opt, UriPath))
         self.assertEqual('s', opt.value)
 
+    def testView (self):
+        packed = 'XY\x11\x28\x11\x1e\x71\x73'
+        payload = 'something'
+        (options, remainder) = decode(3, memoryview(packed + payload), 2)
+        self.assertEqual(3, len(options))
+        self.assertTrue(isinstance(remainder, memoryview))
+        self.assertEqual(payload, remainder.tobytes())
+        values = sorted([ (_o.Type, _o.value) for _o in options ])
+        self.assertEqual([(1, 40), (2, 30), (9, 's')], values)
+
+    def testFencepost (self):
+        (options, remainder) = decode(2, '\xe0\x13x=1body')
+        self.assertEqual([(UriQuery.Type, 'x=1')], [ (_o.Type, _o.value) for _o in options ])
+        self.assertEqual('body', remainder)
+
+    def testTruncated (self):
+        self.assertRaises(ValueError, decode, 2, '\x11\x28')
+        self.assertRaises(ValueError, decode, 1, '\x9f')
+        self.assertRaises(ValueError, scan, 1, 'XY\x93ab', 2)
+
+    def testScan (self):
+        packed = 'XY\x11\x28\x11\x1e\x71\x73\x32AB'
+        (spans, offset) = scan(4, packed + 'body', 2)
+        self.assertEqual([(1, 3, 1), (2, 5, 1), (9, 7, 1)], spans)
+        self.assertEqual(len(packed), offset)
+        self.assertRaises(UnrecognizedOptionError, scan, 1, '\xb2AB')
+
 class TestBlock (unittest.TestCase):
     def test_ctor (self):
         i = Block(0, True, 7)
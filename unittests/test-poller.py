@@ -0,0 +1,53 @@
+import unittest
+import socket
+import select
+from coapy.poller import *
+
+class _PollerTests (object):
+    def setUp (self):
+        self.poller = self.PollerClass()
+        (self.a, self.b) = socket.socketpair(socket.AF_UNIX, socket.SOCK_DGRAM)
+
+    def tearDown (self):
+        self.poller.close()
+        self.a.close()
+        self.b.close()
+
+    def testRead (self):
+        self.poller.register(self.a, READ)
+        self.assertEqual([], self.poller.poll(0))
+        self.b.send('x')
+        self.assertEqual([(self.a.fileno(), READ)], self.poller.poll(0))
+        # Level-triggered: still readable until drained
+        self.assertEqual([(self.a.fileno(), READ)], self.poller.poll(0))
+        self.a.recv(16)
+        self.assertEqual([], self.poller.poll(0))
+
+    def testModify (self):
+        self.poller.register(self.a, READ)
+        self.poller.modify(self.a, READ | WRITE)
+        self.assertEqual([(self.a.fileno(), WRITE)], self.poller.poll(0))
+        self.poller.modify(self.a, READ)
+        self.assertEqual([], self.poller.poll(0))
+        self.poller.register(self.a, WRITE)
+        self.assertEqual([(self.a.fileno(), WRITE)], self.poller.poll(0))
+        self.poller.unregister(self.a)
+        self.assertEqual([], self.poller.poll(0))
+
+class TestPollPoller (_PollerTests, unittest.TestCase):
+    PollerClass = PollPoller
+
+if hasattr(select, 'epoll'):
+    class TestEpollPoller (_PollerTests, unittest.TestCase):
+        PollerClass = EpollPoller
+
+class Test_create_poller (unittest.TestCase):
+    def test (self):
+        poller = create_poller()
+        if hasattr(select, 'epoll'):
+            self.assertTrue(isinstance(poller, EpollPoller))
+        else:
+            self.assertTrue(isinstance(poller, PollPoller))
+
+if __name__ == '__main__':
+    unittest.main()
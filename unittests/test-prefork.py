@@ -0,0 +1,87 @@
+import unittest
+import socket
+import time
+import os
+import signal
+import coapy
+from coapy.prefork import *
+from coapy.connection import EndPoint, Message
+
+class Test_aggregate_statistics (unittest.TestCase):
+    def test (self):
+        total = aggregate_statistics([ { 'received' : 3, 'max_queue_wait' : 0.5 },
+                                       { 'received' : 4, 'max_queue_wait' : 0.25 },
+                                       { } ])
+        self.assertEqual({ 'received' : 7, 'max_queue_wait' : 0.5 }, total)
+        self.assertEqual({ }, aggregate_statistics([]))
+
+class TestSupervisor (unittest.TestCase):
+
+    def setUp (self):
+        sfd = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sfd.bind(('127.0.0.1', 0))
+        self.address = sfd.getsockname()
+        sfd.close()
+        self.supervisor = Supervisor(self.handle, self.address, workers=2, pin_cpus=True)
+        self.supervisor.REPORT_INTERVAL_MS = 20
+        self.supervisor.RESTART_DELAY = 0
+
+    def tearDown (self):
+        self.supervisor.stop()
+
+    def handle (self, rx_record):
+        rx_record.ack(Message(Message.ACK, code=coapy.OK, payload=str(os.getpid())))
+
+    def waitFor (self, condition, timeout=5.0):
+        end_time = time.time() + timeout
+        while not condition() and (time.time() < end_time):
+            self.supervisor.poll(20)
+        return condition()
+
+    def testServe (self):
+        supervisor = self.supervisor
+        supervisor.start()
+        self.assertEqual(2, len(supervisor.workers))
+        clients = []
+        futures = []
+        for i in xrange(8):
+            ep = EndPoint()
+            ep.bind(('127.0.0.1', 0))
+            clients.append(ep)
+            futures.append(ep.request(Message(code=coapy.GET, uri_path='x'), self.address))
+        for (ep, future) in zip(clients, futures):
+            ep.wait([future], 5000)
+            self.assertEqual(coapy.OK, future.result().message.code)
+            ep.socket.close()
+        self.assertTrue(self.waitFor(lambda: 8 <= supervisor.statistics.get('responses', 0)))
+        self.assertEqual(8, supervisor.statistics['received'])
+
+    def testUnavailable (self):
+        import coapy.prefork
+        saved = coapy.prefork.SO_REUSEPORT
+        coapy.prefork.SO_REUSEPORT = None
+        try:
+            self.assertRaises(Exception, Supervisor, self.handle, self.address)
+        finally:
+            coapy.prefork.SO_REUSEPORT = saved
+
+    def testRestart (self):
+        supervisor = self.supervisor
+        supervisor.start()
+        pids = set([ _w.pid for _w in supervisor.workers ])
+        os.kill(pids.pop(), signal.SIGKILL)
+        self.assertTrue(self.waitFor(lambda: 1 == supervisor.restarts))
+        self.assertEqual(2, len(supervisor.workers))
+        self.assertEqual(sorted([0, 1]), sorted([ _w.index for _w in supervisor.workers ]))
+
+    def testStopReaped (self):
+        supervisor = self.supervisor
+        supervisor.start()
+        for worker in supervisor.workers:
+            os.kill(worker.pid, signal.SIGKILL)
+            os.waitpid(worker.pid, 0)
+        supervisor.stop()
+        self.assertEqual([], supervisor.workers)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+import unittest
+import time
+import coapy
+from coapy.connection import *
+from coapy.reactor import *
+
+class TestReactor (unittest.TestCase):
+
+    __RESPONSE_TIMEOUT = coapy.RESPONSE_TIMEOUT
+    __MAX_RETRANSMIT = coapy.MAX_RETRANSMIT
+
+    def setUp (self):
+        self.reactor = Reactor()
+        self.servers = []
+        for i in xrange(3):
+            ep = self.reactor.createEndPoint()
+            ep.bind(('127.0.0.1', 0))
+            self.servers.append(ep)
+        self.client = self.reactor.createEndPoint()
+        self.client.bind(('127.0.0.1', 0))
+
+    def tearDown (self):
+        for ep in self.reactor.end_points:
+            ep.socket.close()
+        coapy.RESPONSE_TIMEOUT = self.__RESPONSE_TIMEOUT
+        coapy.MAX_RETRANSMIT = self.__MAX_RETRANSMIT
+
+    def testExchange (self):
+        reactor = self.reactor
+        self.assertEqual(4, len(reactor.end_points))
+        futures = [ self.client.request(Message(code=coapy.GET), _s.socket.getsockname()) for _s in self.servers ]
+        served = set()
+        end_time = time.time() + 5
+        while [ _f for _f in futures if not _f.done() ] and (time.time() < end_time):
+            for rx_record in reactor.process(1000):
+                if rx_record.end_point is self.client:
+                    self.assertTrue(rx_record.pertains_to is not None)
+                    continue
+                self.assertTrue(rx_record.end_point in self.servers)
+                served.add(rx_record.end_point)
+                rx_record.ack(Message(Message.ACK, code=coapy.OK, payload=str(rx_record.end_point.socket.getsockname()[1])))
+        self.assertEqual(set(self.servers), served)
+        for (server, future) in zip(self.servers, futures):
+            self.assertEqual(str(server.socket.getsockname()[1]), future.result().message.payload)
+
+    def testTimers (self):
+        coapy.RESPONSE_TIMEOUT = 0.01
+        coapy.MAX_RETRANSMIT = 2
+        # The server receives the request but does not acknowledge
+        # it, so the request times out
+        timeouts = []
+        self.client.send(Message(code=coapy.GET), self.servers[0].socket.getsockname(),
+                         on_timeout=timeouts.append)
+        start = time.time()
+        rx_records = []
+        while (not timeouts) and (time.time() < start + 2):
+            rx_records.extend(self.reactor.process(100))
+        self.assertEqual(1, len(timeouts))
+        # The server saw both transmissions, and nothing acknowledged them
+        self.assertEqual(2, timeouts[0].transmission_count)
+        self.assertTrue(1 <= len(rx_records))
+
+    def testDirectProcess (self):
+        self.assertRaises(Exception, self.client.process, 0)
+
+    def testRemove (self):
+        server = self.servers[0]
+        self.reactor.remove(server)
+        self.assertFalse(server in self.reactor.end_points)
+        self.assertEqual(3, len(self.reactor.end_points))
+        server.socket.close()
+
+if __name__ == '__main__':
+    unittest.main()
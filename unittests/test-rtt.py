@@ -0,0 +1,75 @@
+import unittest
+import coapy
+from coapy.rtt import *
+
+class TestRttEstimator (unittest.TestCase):
+    def testInitial (self):
+        est = RttEstimator()
+        self.assertTrue(est.srtt is None)
+        self.assertTrue(est.rto is None)
+        self.assertAlmostEqual(0.3, est.update(0.1))
+        self.assertAlmostEqual(0.1, est.srtt)
+        self.assertAlmostEqual(0.05, est.rttvar)
+
+    def testUpdate (self):
+        est = RttEstimator(k=1)
+        est.update(0.1)
+        est.update(0.2)
+        self.assertAlmostEqual(0.1125, est.srtt)
+        self.assertAlmostEqual(0.0625, est.rttvar)
+        self.assertAlmostEqual(0.175, est.rto)
+
+class TestAdaptiveTimeout (unittest.TestCase):
+
+    __RESPONSE_TIMEOUT = coapy.RESPONSE_TIMEOUT
+    __RESPONSE_RANDOM_FACTOR = coapy.RESPONSE_RANDOM_FACTOR
+
+    def tearDown (self):
+        coapy.RESPONSE_TIMEOUT = self.__RESPONSE_TIMEOUT
+        coapy.RESPONSE_RANDOM_FACTOR = self.__RESPONSE_RANDOM_FACTOR
+
+    def testDefault (self):
+        to = AdaptiveTimeout()
+        self.assertEqual(coapy.RESPONSE_TIMEOUT, to.rto)
+        self.assertEqual(2, to.backoff_factor)
+        coapy.RESPONSE_TIMEOUT = 3
+        self.assertEqual(3, to.rto)
+
+    def testInitialTimeout (self):
+        to = AdaptiveTimeout()
+        for _ in xrange(100):
+            it = to.initialTimeout()
+            self.assertTrue(to.rto <= it)
+            self.assertTrue(it <= to.rto * coapy.RESPONSE_RANDOM_FACTOR)
+        coapy.RESPONSE_RANDOM_FACTOR = 1.0
+        self.assertEqual(to.rto, to.initialTimeout())
+
+    def testStrong (self):
+        to = AdaptiveTimeout()
+        # strong rto = 0.01 + 4 * 0.005; overall = 0.5 * 0.03 + 0.5 * 1
+        self.assertAlmostEqual(0.515, to.update(0.01, 1))
+        self.assertEqual(3, to.backoff_factor)
+        for _ in xrange(20):
+            to.update(0.01, 1)
+        self.assertTrue(to.rto < 0.05)
+        self.assertTrue(to.weak.srtt is None)
+
+    def testWeak (self):
+        to = AdaptiveTimeout()
+        # weak rto = 2 + 1 * 1; overall = 0.25 * 3 + 0.75 * 1
+        self.assertAlmostEqual(1.5, to.update(2, 2))
+        self.assertTrue(to.strong.srtt is None)
+        self.assertEqual(1.5, to.update(2, 1 + to.MAX_WEAK_TRANSMISSIONS))
+
+    def testLimits (self):
+        to = AdaptiveTimeout()
+        for _ in xrange(50):
+            to.update(0, 1)
+        self.assertEqual(to.MIN_TIMEOUT, to.rto)
+        for _ in xrange(50):
+            to.update(1000, 1)
+        self.assertEqual(to.MAX_TIMEOUT, to.rto)
+        self.assertEqual(1.5, to.backoff_factor)
+
+if __name__ == '__main__':
+    unittest.main()
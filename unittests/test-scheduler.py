@@ -0,0 +1,50 @@
+import unittest
+from coapy.scheduler import *
+
+class TestScheduler (unittest.TestCase):
+
+    def testEmpty (self):
+        sch = Scheduler()
+        self.assertEqual(0, len(sch))
+        self.assertTrue(sch.nextTime() is None)
+        self.assertEqual([], sch.popDue(100))
+
+    def testOrder (self):
+        sch = Scheduler()
+        sch.schedule(3, 'c')
+        sch.schedule(1, 'a')
+        sch.schedule(2, 'b')
+        self.assertEqual(3, len(sch))
+        self.assertEqual(1, sch.nextTime())
+        self.assertEqual(['a', 'b'], sch.popDue(2))
+        self.assertEqual(1, len(sch))
+        self.assertFalse('a' in sch)
+        self.assertTrue('c' in sch)
+        self.assertEqual(3, sch.nextTime())
+        self.assertEqual(['c'], sch.popDue(5))
+        self.assertTrue(sch.nextTime() is None)
+
+    def testReschedule (self):
+        sch = Scheduler()
+        sch.schedule(1, 'a')
+        sch.schedule(2, 'b')
+        sch.schedule(5, 'a')
+        self.assertEqual(2, len(sch))
+        self.assertEqual(5, sch.dueTime('a'))
+        self.assertEqual(2, sch.nextTime())
+        self.assertEqual(['b'], sch.popDue(4))
+        self.assertEqual(['a'], sch.popDue(5))
+
+    def testCancel (self):
+        sch = Scheduler()
+        sch.schedule(1, 'a')
+        sch.schedule(2, 'b')
+        self.assertTrue(sch.cancel('a'))
+        self.assertFalse(sch.cancel('a'))
+        self.assertTrue(sch.dueTime('a') is None)
+        self.assertEqual(2, sch.nextTime())
+        self.assertEqual(['b'], sch.popDue(10))
+        self.assertEqual(0, len(sch))
+
+if __name__ == '__main__':
+    unittest.main()